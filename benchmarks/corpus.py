@@ -0,0 +1,45 @@
+"""
+Corpus de requêtes et jeux de données synthétiques pour les microbenchmarks
+"""
+
+from typing import Any, Dict, List
+
+from benchmarks.standins import generate_records
+
+# Requêtes réalistes (français/anglais, avec et sans restriction de champs)
+QUERY_CORPUS: List[str] = [
+    "récupère 5 posts avec title et id",
+    "obtiens 10 utilisateurs et sauvegarde dans une feuille",
+    "prends 3 posts avec seulement le contenu",
+    "récupère 15 posts et exporte tout",
+    "je veux uniquement le titre et le texte des 20 premiers posts",
+    "exporte 50 posts de l'utilisateur 3 avec juste title et body",
+    "donne-moi les posts avec identifiant et titre",
+    "get 25 posts with title and body only",
+    "fetch posts for user 7",
+    "liste 100 posts avec userid, id, title et body dans un google sheet",
+    "sauvegarde les 8 derniers posts",
+    "récupère des posts",
+    "posts avec le contenu complet et l'identifiant de l'utilisateur",
+    "Récupère 12 POSTS avec TITRE seulement",
+    "exporte tous les titres",
+    "je souhaite obtenir 30 éléments avec juste le body",
+]
+
+# Paramètres bruts plausibles renvoyés par le LLM
+RAW_LLM_PARAMS: List[Dict[str, Any]] = [
+    {"limit": 5, "fields": ["title", "id"], "filters": {}, "description": "posts"},
+    {"limit": "10", "fields": "title", "filters": None},
+    {"fields": ["title", "unknown_field"], "filters": {"userId": 3}},
+    {},
+]
+
+
+def synthetic_posts(size: int) -> List[Dict[str, Any]]:
+    """Collection de posts au format JSONPlaceholder"""
+    return generate_records("posts", size)
+
+
+def synthetic_users(size: int) -> List[Dict[str, Any]]:
+    """Collection d'utilisateurs (charge utile imbriquée)"""
+    return generate_records("users", size)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout hors-ligne
+
+Exécute le vrai `graph` LangGraph contre des doublures locales (serveur HTTP
+JSONPlaceholder, faux clients gspread/Drive, LLM de substitution) et mesure le
+débit (runs/s), la latence p50/p95 de chaque nœud et le nombre d'appels API
+par run, pour plusieurs tailles de données et niveaux de concurrence.
+
+Usage :
+    python benchmarks/e2e.py
+    python benchmarks/e2e.py --sizes 100 1000 10000 --concurrency 1 4 16 --runs 32
+    python benchmarks/e2e.py --quota-error-rate 0.05 --json bench_output.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from agent.http_cache import HTTPCache  # noqa: E402
+from agent.snapshots import SnapshotStore  # noqa: E402
+from benchmarks.standins import (  # noqa: E402
+    CallRecorder,
+    FakeDriveService,
+    FakeGspreadClient,
+    FakeJSONPlaceholderServer,
+    QuotaSimulator,
+    StubLLM,
+)
+
+# Nœuds instrumentés (nom de la fonction dans agent.graph)
+NODE_FUNCTIONS = [
+    "parse_user_query",
+    "fetch_api_data",
+    "process_data",
+    "aggregate_data",
+    "provision_google_sheet",
+    "create_google_sheet",
+    "stream_export",
+    "generate_response",
+]
+
+DEFAULT_QUERY = "récupère 50 posts avec title et id"
+
+# =============================================================================
+# CHARGEMENT DE L'AGENT SANS RÉSEAU
+# =============================================================================
+
+def load_agent():
+    """Importe agent.graph avec un environnement neutralisé (ni OpenAI, ni Google, ni LangSmith)"""
+    os.environ.update({
+        "OPENAI_API_KEY": "",
+        "LANGSMITH_API_KEY": "",
+        "LANGCHAIN_TRACING_V2": "false",
+        "GOOGLE_CREDENTIALS_PATH": str(PROJECT_ROOT / "benchmarks" / "__no_credentials__.json"),
+        "DEBUG": "false",
+        "HTTP_CACHE_ENABLED": "false",
+        "PREFETCH_ENABLED": "false",
+        "SHEET_POOL_SIZE": "0",
+        # Points de reprise actifs (comme par défaut), dans une base jetable
+        "CHECKPOINT_DB": os.path.join(tempfile.mkdtemp(prefix="e2e-checkpoints-"), "checkpoints.sqlite"),
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        from agent import graph as agent_module
+    return agent_module
+
+
+class NodeTimings:
+    """Durées collectées par nœud, partagées entre threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+
+    def add(self, node: str, duration: float):
+        with self._lock:
+            self.durations[node].append(duration)
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+
+
+def install_standins(agent, server, recorder, timings, args):
+    """Branche les doublures sur le module agent et recompile un graphe instrumenté"""
+    quota = QuotaSimulator(error_rate=args.quota_error_rate, seed=args.seed)
+    originals = {name: getattr(agent, name) for name in
+                 ["llm", "gc", "setup_drive_service", "DEFAULT_API_URL", "SORT_PUSHDOWN_HOSTS", "HTTP_CACHE",
+                  "SNAPSHOTS_ENABLED", "SNAPSHOT_STORE", "PREFETCHER", "SHEET_POOL", "graph", "DURABLE_GRAPH",
+                  *NODE_FUNCTIONS]
+                 if hasattr(agent, name)}
+
+    drive = FakeDriveService(recorder, args.google_latency, quota)
+    agent.llm = StubLLM(recorder, args.llm_latency).runnable
+    agent.gc = FakeGspreadClient(recorder, args.google_latency, quota, row_latency=args.google_row_latency)
+    agent.setup_drive_service = lambda: drive
+    agent.DEFAULT_API_URL = server.url("posts")
+    # Le serveur local émule json-server : tri et limite peuvent lui être délégués
+    agent.SORT_PUSHDOWN_HOSTS = [*agent.SORT_PUSHDOWN_HOSTS, urlparse(server.url("posts")).hostname]
+    # Cache HTTP isolé par taille (répertoire temporaire), désactivé par défaut
+    agent.HTTP_CACHE = HTTPCache(tempfile.mkdtemp(prefix="e2e-http-cache-")) if args.http_cache else None
+    agent.SNAPSHOTS_ENABLED = args.snapshots
+    agent.SNAPSHOT_STORE = SnapshotStore(tempfile.mkdtemp(prefix="e2e-snapshots-")) if args.snapshots else None
+    # Préchargement : historique vierge, appris pendant le scénario
+    prefetcher = None
+    if args.prefetch_interval > 0:
+        history_path = os.path.join(tempfile.mkdtemp(prefix="e2e-prefetch-"), "history.json")
+        prefetcher = agent.create_prefetcher(history_path, interval=args.prefetch_interval).start()
+    agent.PREFETCHER = prefetcher
+    # Pool de sheets pré-provisionnés, rempli avant le scénario puis complété en arrière-plan
+    sheet_pool = None
+    if args.sheet_pool > 0:
+        ledger_path = os.path.join(tempfile.mkdtemp(prefix="e2e-sheet-pool-"), "ledger.json")
+        sheet_pool = agent.create_sheet_pool(args.sheet_pool, ledger_path)
+    agent.SHEET_POOL = sheet_pool
+
+    for name in NODE_FUNCTIONS:
+        if name not in originals:
+            continue
+        func = originals[name]
+
+        def timed(state, _func=func, _name=name):
+            start = time.perf_counter()
+            try:
+                return _func(state)
+            finally:
+                timings.add(_name, time.perf_counter() - start)
+
+        setattr(agent, name, timed)
+
+    agent.graph = agent.build_graph()
+    agent.DURABLE_GRAPH = agent.build_graph(agent.CHECKPOINTER) if agent.CHECKPOINTER is not None else agent.graph
+    if sheet_pool is not None:
+        sheet_pool.refill()
+        sheet_pool.start()
+
+    def restore():
+        if prefetcher is not None:
+            prefetcher.stop()
+        if sheet_pool is not None:
+            sheet_pool.stop()
+        for name, value in originals.items():
+            setattr(agent, name, value)
+
+    return restore
+
+
+# =============================================================================
+# EXÉCUTION DES SCÉNARIOS
+# =============================================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par rang le plus proche (valeurs en secondes)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def run_scenario(agent, recorder, timings, size, concurrency, runs, query) -> Dict[str, Any]:
+    """Exécute `runs` runs complets avec `concurrency` threads"""
+    recorder.reset()
+    timings.reset()
+    errors = []
+
+    def one_run(index):
+        result = agent.run_agent_with_tracing(query, run_name=f"bench_{size}_{concurrency}_{index}")
+        if result.get("error"):
+            errors.append(result["error"])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one_run, range(runs)))
+        wall = time.perf_counter() - start
+
+    calls = recorder.snapshot()
+    return {
+        "size": size,
+        "concurrency": concurrency,
+        "runs": runs,
+        "wall_s": wall,
+        "runs_per_s": runs / wall if wall else 0.0,
+        "errors": len(errors),
+        "nodes": {
+            node: {
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+            }
+            for node, values in timings.durations.items()
+        },
+        "calls_per_run": {name: count / runs for name, count in sorted(calls.items())},
+    }
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    lines = []
+    for result in results:
+        lines.append(
+            f"\n📊 size={result['size']} concurrency={result['concurrency']} runs={result['runs']} "
+            f"→ {result['runs_per_s']:.2f} runs/s ({result['wall_s']:.2f}s, erreurs: {result['errors']})"
+        )
+        lines.append(f"   {'nœud':<22} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+        for node in NODE_FUNCTIONS:
+            stats = result["nodes"].get(node)
+            if stats:
+                lines.append(f"   {node:<22} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f}")
+        lines.append("   appels API par run:")
+        for name, count in result["calls_per_run"].items():
+            lines.append(f"     - {name:<36} {count:>8.2f}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout hors-ligne de l'agent")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Tailles de la collection upstream")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="Nombre de runs simultanés")
+    parser.add_argument("--runs", type=int, default=16, help="Runs par scénario")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="Requête utilisateur")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Latence du serveur HTTP (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Latence du LLM simulé (s)")
+    parser.add_argument("--google-latency", type=float, default=0.05, help="Latence par appel Google (s)")
+    parser.add_argument("--api-row-latency", type=float, default=0.0,
+                        help="Temps de transfert par enregistrement renvoyé par l'API (s)")
+    parser.add_argument("--google-row-latency", type=float, default=0.0,
+                        help="Temps d'écriture par ligne envoyée à Google Sheets (s)")
+    parser.add_argument("--http-cache", action="store_true",
+                        help="Active le cache HTTP disque (ETag/304, max-age) entre les runs")
+    parser.add_argument("--snapshots", action="store_true",
+                        help="Sert les requêtes depuis un instantané local indexé de la collection")
+    parser.add_argument("--api-max-age", type=int, default=0,
+                        help="Cache-Control max-age (s) des réponses du serveur HTTP")
+    parser.add_argument("--prefetch-interval", type=float, default=0.0,
+                        help="Active le préchargement des cibles chaudes toutes les N secondes (0 = désactivé)")
+    parser.add_argument("--sheet-pool", type=int, default=0,
+                        help="Taille du pool de sheets pré-provisionnés (0 = désactivé)")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0,
+                        help="Probabilité d'une erreur 429 par appel Google")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="Écrire les résultats bruts dans ce fichier")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    agent = load_agent()
+    recorder = CallRecorder()
+    timings = NodeTimings()
+    results = []
+
+    for size in args.sizes:
+        with FakeJSONPlaceholderServer(size=size, latency=args.api_latency, recorder=recorder,
+                                       row_latency=args.api_row_latency, max_age=args.api_max_age) as server:
+            restore = install_standins(agent, server, recorder, timings, args)
+            try:
+                for concurrency in args.concurrency:
+                    result = run_scenario(agent, recorder, timings, size, concurrency, args.runs, args.query)
+                    results.append(result)
+                    print(format_report([result]), flush=True)
+            finally:
+                restore()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Résultats écrits dans {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
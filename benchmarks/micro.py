@@ -0,0 +1,664 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks des chemins critiques (parsing, traitement, dispatch MCP)
+
+Chaque benchmark mesure le temps médian d'une opération. Les références
+sont stockées dans `benchmarks/baselines.json` ; la comparaison signale toute
+régression au-delà d'un seuil relatif.
+
+Usage :
+    python benchmarks/micro.py                    # exécuter et afficher
+    python benchmarks/micro.py --save             # enregistrer les références des nouveaux benchmarks
+    python benchmarks/micro.py --save --overwrite -k nom   # remplacer une référence existante (explicite)
+    python benchmarks/micro.py --compare          # comparer aux références (code 1 si régression)
+    python benchmarks/micro.py -k process_data    # filtrer par nom
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.corpus import QUERY_CORPUS, RAW_LLM_PARAMS, synthetic_posts, synthetic_users  # noqa: E402
+from benchmarks.e2e import load_agent  # noqa: E402
+
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_THRESHOLD = 0.25
+
+# Registre : nom -> fabrique(agent) retournant l'opération à chronométrer
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    """Enregistre une fabrique de benchmark"""
+    def decorator(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+@benchmark("validate_extracted_params[corpus]")
+def bench_validate(agent):
+    cases = [(params, query) for query in QUERY_CORPUS for params in RAW_LLM_PARAMS]
+
+    def op():
+        for params, query in cases:
+            agent.validate_extracted_params(dict(params), query)
+    return op
+
+
+@benchmark("validate_extracted_params[corpus, inferred schema]")
+def bench_validate_schema(agent):
+    from agent.schema import infer_schema
+
+    schema = infer_schema(synthetic_posts(50))
+    cases = [(params, query) for query in QUERY_CORPUS for params in RAW_LLM_PARAMS]
+
+    def op():
+        for params, query in cases:
+            agent.validate_extracted_params(dict(params), query, schema)
+    return op
+
+
+@benchmark("infer_schema[50 users sample, nested paths]")
+def bench_infer_schema(agent):
+    from agent.schema import infer_schema
+
+    users = synthetic_users(50)
+
+    def op():
+        infer_schema(users)
+    return op
+
+
+@benchmark("create_fallback_params[corpus]")
+def bench_fallback(agent):
+    def op():
+        for query in QUERY_CORPUS:
+            agent.create_fallback_params(query)
+    return op
+
+
+def _synthetic_vocabulary(size: int):
+    """Vocabulaire de `size` mots-clés répartis sur des champs fictifs"""
+    return {f"field_{i}": [f"motcle{i}", f"keyword {i}", f"champ{i}x"] for i in range(size // 3)}
+
+
+@benchmark("KeywordMatcher.match[1.5k keywords, corpus]")
+def bench_matcher_large(agent):
+    from agent.matching import KeywordMatcher
+
+    matcher = KeywordMatcher(_synthetic_vocabulary(1_500))
+    matcher.add("_restriction", agent.RESTRICTION_KEYWORDS, prefix=True)
+
+    def op():
+        for query in QUERY_CORPUS:
+            matcher.match(query)
+    return op
+
+
+@benchmark("naive substring scan[1.5k keywords, corpus]")
+def bench_naive_large(agent):
+    vocabulary = _synthetic_vocabulary(1_500)
+
+    def op():
+        for query in QUERY_CORPUS:
+            padded = f" {query.lower()} "
+            [field for field, keywords in vocabulary.items()
+             if any(f" {keyword} " in padded for keyword in keywords)]
+    return op
+
+
+def _process_data_factory(size: int, fields: List[str]):
+    def factory(agent):
+        base_state = agent.get_initial_state()
+        base_state["api_data"] = synthetic_posts(size)
+        base_state["extracted_params"] = {"limit": size, "fields": fields, "filters": {}}
+
+        def op():
+            state = copy.copy(base_state)
+            agent.process_data(state)
+        return op
+    return factory
+
+
+benchmark("process_data[1k rows, 2 fields]")(_process_data_factory(1_000, ["title", "id"]))
+benchmark("process_data[10k rows, 4 fields]")(_process_data_factory(10_000, ["userId", "id", "title", "body"]))
+
+
+@benchmark("legacy dict loop[100k rows, 3 fields]")
+def bench_legacy_projection(agent):
+    items = synthetic_posts(100_000)
+    fields = ["id", "title", "userId"]
+
+    def op():
+        processed = []
+        for item in items:
+            filtered_item = {}
+            for field in fields:
+                if field in item:
+                    filtered_item[field] = item[field]
+            processed.append(filtered_item)
+        [[row.get(header, "") for header in fields] for row in processed]
+    return op
+
+
+@benchmark("Projection.rows[100k rows, 3 fields]")
+def bench_projection(agent):
+    from agent.projection import compile_projection
+
+    items = synthetic_posts(100_000)
+
+    def op():
+        compile_projection(["id", "title", "userId"], sample=items[0]).rows(items)
+    return op
+
+
+@benchmark("Projection.rows[10k users, nested paths]")
+def bench_projection_nested(agent):
+    from agent.projection import compile_projection
+
+    items = synthetic_users(10_000)
+    fields = ["id", "name", "address.geo.lat", "address.city", "company.name"]
+
+    def op():
+        compile_projection(fields, sample=items[0]).rows(items)
+    return op
+
+
+@benchmark("ColumnarBatch filter+project[100k rows, 3 fields]")
+def bench_columnar(agent):
+    from agent.columnar import ColumnarBatch
+
+    batch = ColumnarBatch.from_records(synthetic_posts(100_000))
+
+    def op():
+        selected = batch.where(batch.equal_mask("userId", 3))
+        selected.project(["id", "title", "userId"]).to_values()
+    return op
+
+
+@benchmark("list filter+project[100k rows, 3 fields]")
+def bench_list_filter(agent):
+    from agent.projection import compile_projection
+
+    items = synthetic_posts(100_000)
+
+    def op():
+        selected = [item for item in items if item.get("userId") == 3]
+        compile_projection(["id", "title", "userId"], sample=items[0]).rows(selected)
+    return op
+
+
+FILTER_SPEC = {"or": [{"userId": {"in": [1, 3, 5]}, "id": {"gte": 20}}, {"title": {"contains": "dolor"}}]}
+
+
+@benchmark("CompiledFilter.apply[100k rows, and/or/in/range/contains]")
+def bench_filter_rows(agent):
+    from agent.filters import compile_filter
+
+    items = synthetic_posts(100_000)
+
+    def op():
+        compile_filter(FILTER_SPEC, known_fields=items[0].keys()).apply(items)
+    return op
+
+
+@benchmark("CompiledFilter.apply[100k columnar rows, userId in + id range]")
+def bench_filter_columnar(agent):
+    from agent.columnar import ColumnarBatch
+    from agent.filters import compile_filter
+
+    batch = ColumnarBatch.from_records(synthetic_posts(100_000))
+    spec = {"userId": {"in": [1, 3, 5]}, "id": {"gte": 20, "lt": 90_000}}
+
+    def op():
+        compile_filter(spec, known_fields=batch.schema).apply(batch)
+    return op
+
+
+def _shuffled_posts(size: int):
+    """Posts synthétiques dans un ordre aléatoire (graine fixe)"""
+    items = synthetic_posts(size)
+    random.Random(0).shuffle(items)
+    return items
+
+
+@benchmark("top_k[100k rows, title desc, k=10]")
+def bench_top_k(agent):
+    from agent.sorting import top_k
+
+    items = _shuffled_posts(100_000)
+
+    def op():
+        top_k(items, {"field": "title", "order": "desc"}, 10)
+    return op
+
+
+@benchmark("full sort[100k rows, title desc, k=10]")
+def bench_full_sort(agent):
+    items = _shuffled_posts(100_000)
+
+    def op():
+        sorted(items, key=lambda item: item.get("title"), reverse=True)[:10]
+    return op
+
+
+@benchmark("top_k[100k columnar rows, id desc, k=10]")
+def bench_top_k_columnar(agent):
+    from agent.columnar import ColumnarBatch
+    from agent.sorting import top_k
+
+    batch = ColumnarBatch.from_records(_shuffled_posts(100_000))
+
+    def op():
+        top_k(batch, {"field": "id", "order": "desc"}, 10)
+    return op
+
+
+@benchmark("hash_join[100k posts x 1k users]")
+def bench_hash_join(agent):
+    from agent.joins import hash_join
+
+    posts = synthetic_posts(100_000)
+    users = synthetic_users(1_000)
+
+    def op():
+        hash_join(posts, users, "userId", "id", "users")
+    return op
+
+
+@benchmark("hash_join[100 posts x 10k users]")
+def bench_hash_join_small_left(agent):
+    from agent.joins import hash_join
+
+    posts = synthetic_posts(100)
+    users = synthetic_users(10_000)
+
+    def op():
+        hash_join(posts, users, "userId", "id", "users")
+    return op
+
+
+AGGREGATE_SPEC = {"group_by": ["userId"], "metrics": ["count", {"op": "avg", "field": "id"}, {"op": "max", "field": "id"}]}
+
+
+@benchmark("aggregate[100k rows, group by userId, 3 metrics]")
+def bench_aggregate_rows(agent):
+    from agent.aggregation import aggregate, normalize_aggregate
+    from agent.columnar import ColumnarBatch
+
+    rows = [(item["userId"], item["id"]) for item in synthetic_posts(100_000)]
+    spec = normalize_aggregate(AGGREGATE_SPEC)
+
+    def op():
+        aggregate(ColumnarBatch.from_rows(["userId", "id"], rows), spec)
+    return op
+
+
+@benchmark("aggregate[100k columnar rows, group by userId, 3 metrics]")
+def bench_aggregate_columnar(agent):
+    from agent.aggregation import aggregate, normalize_aggregate
+    from agent.columnar import ColumnarBatch
+
+    batch = ColumnarBatch.from_records(synthetic_posts(100_000)).project(["userId", "id"])
+    spec = normalize_aggregate(AGGREGATE_SPEC)
+
+    def op():
+        aggregate(batch, spec)
+    return op
+
+
+@benchmark("run_pipeline[100 pages x 1k rows, projection]")
+def bench_pipeline(agent):
+    from agent.projection import compile_projection
+    from agent.streaming import run_pipeline
+
+    posts = synthetic_posts(1_000)
+    projection = compile_projection(["userId", "id", "title"], sample=posts[0])
+
+    def op():
+        sink = []
+        run_pipeline((posts for _ in range(100)), projection.rows, sink.append)
+    return op
+
+
+@benchmark("Deduplicator.unique[100k rows x2 overlap, 3 fields]")
+def bench_dedup_rows(agent):
+    from agent.dedup import Deduplicator
+    from agent.projection import compile_projection
+
+    posts = synthetic_posts(50_000)
+    rows = compile_projection(["userId", "id", "title"]).rows(posts + posts)
+
+    def op():
+        list(Deduplicator(["userId", "id", "title"]).unique(rows))
+    return op
+
+
+@benchmark("dedup_records[100k rows x2 overlap, key id]")
+def bench_dedup_key(agent):
+    from agent.dedup import dedup_records
+
+    posts = synthetic_posts(50_000)
+    records = posts + posts
+
+    def op():
+        list(dedup_records(records, ["id"]))
+    return op
+
+
+def _json_chunks(records, chunk_size: int = 64 * 1024):
+    body = json.dumps(records).encode("utf-8")
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+@benchmark("json.loads[100k posts response, first 100]")
+def bench_json_loads(agent):
+    chunks = _json_chunks(synthetic_posts(100_000))
+
+    def op():
+        json.loads(b"".join(chunks))[:100]
+    return op
+
+
+@benchmark("iter_json_items[100k posts response, first 100]")
+def bench_json_stream_head(agent):
+    from agent.jsonstream import iter_json_items
+
+    chunks = _json_chunks(synthetic_posts(100_000))
+
+    def op():
+        list(islice(iter_json_items(chunks), 100))
+    return op
+
+
+@benchmark("iter_json_items[100k posts response, all]")
+def bench_json_stream_all(agent):
+    from agent.jsonstream import iter_json_items
+
+    chunks = _json_chunks(synthetic_posts(100_000))
+
+    def op():
+        for _ in iter_json_items(chunks):
+            pass
+    return op
+
+
+@benchmark("HTTPCache.get[fresh hit, 10k posts body]")
+def bench_http_cache_hit(agent):
+    import tempfile
+
+    import requests
+
+    from agent.http_cache import HTTPCache
+
+    cache = HTTPCache(tempfile.mkdtemp(prefix="micro-http-cache-"))
+    upstream = requests.Response()
+    upstream.status_code = 200
+    upstream.headers.update({"ETag": 'W/"posts"', "Cache-Control": "max-age=3600"})
+    upstream._content = json.dumps(synthetic_posts(10_000)).encode("utf-8")
+    url = "https://api.example.com/posts"
+    cache.get(url, lambda *args, **kwargs: upstream)
+
+    def op():
+        cache.get(url, requests.get)
+    return op
+
+
+def _posts_snapshot(size: int):
+    import tempfile
+
+    from agent.snapshots import SnapshotStore
+
+    store = SnapshotStore(tempfile.mkdtemp(prefix="micro-snapshots-"))
+    return store, store.build("https://api.example.com/posts", synthetic_posts(size))
+
+
+@benchmark("Snapshot.query[100k posts, userId eq via index, limit 10]")
+def bench_snapshot_query(agent):
+    from agent.filters import compile_filter
+
+    _, snapshot = _posts_snapshot(100_000)
+    predicate = compile_filter({"userId": 42})
+
+    def op():
+        list(islice(snapshot.query(predicate), 10))
+    return op
+
+
+@benchmark("SnapshotStore.build[10k posts, 4 indexes]")
+def bench_snapshot_build(agent):
+    store, _ = _posts_snapshot(10)
+    posts = synthetic_posts(10_000)
+
+    def op():
+        store.build("https://api.example.com/posts", posts)
+    return op
+
+
+@benchmark("AccessHistory.record[1k targets, filter shape]")
+def bench_prefetch_record(agent):
+    from agent.prefetch import AccessHistory, filter_shape
+
+    history = AccessHistory()
+    targets = [{"kind": "http", "url": f"https://api.example.com/posts/{i}", "params": {"_sort": "id"}}
+               for i in range(1_000)]
+    filters = {"userId": 3, "id": {"gte": 10}}
+
+    def op():
+        for target in targets:
+            history.record(target, filter_shape(filters))
+    return op
+
+
+def _tool_result_message(rows: int) -> dict:
+    """Réponse JSON-RPC tools/call portant un gros résultat structuré"""
+    posts = synthetic_posts(rows)
+    return {"jsonrpc": "2.0", "id": 7, "result": {
+        "content": [{"type": "text", "text": f"✅ {rows} lignes exportées"}],
+        "structuredContent": {"rows": posts},
+    }}
+
+
+@benchmark("stdlib json framing[tools/call, 10k-row tool result]")
+def bench_stdlib_framing(agent):
+    message = _tool_result_message(10_000)
+    devnull = open(os.devnull, "w", encoding="utf-8")
+
+    def op():
+        print(json.dumps(message), file=devnull, flush=True)
+    return op
+
+
+@benchmark("send_message[tools/call, 10k-row tool result]")
+def bench_send_message(agent):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        from agent.mcp import server
+    message = _tool_result_message(10_000)
+    devnull = io.TextIOWrapper(open(os.devnull, "wb"), encoding="utf-8")
+
+    def op():
+        with contextlib.redirect_stdout(devnull):
+            server.send_message(message)
+    return op
+
+
+@benchmark("codec.loads[100k posts response]")
+def bench_codec_loads(agent):
+    from agent import codec
+
+    body = b"".join(_json_chunks(synthetic_posts(100_000)))
+
+    def op():
+        codec.loads(body)
+    return op
+
+
+def _handle_request_factory(request: dict):
+    def factory(agent):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            from agent.mcp import server
+        loop = asyncio.new_event_loop()
+        devnull = open(os.devnull, "w")
+
+        def op():
+            with contextlib.redirect_stderr(devnull):
+                loop.run_until_complete(server.handle_request(request))
+        return op
+    return factory
+
+
+benchmark("handle_request[initialize]")(_handle_request_factory(
+    {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}))
+benchmark("handle_request[tools/list]")(_handle_request_factory(
+    {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}))
+benchmark("handle_request[unknown]")(_handle_request_factory(
+    {"jsonrpc": "2.0", "id": 3, "method": "does/not/exist"}))
+
+
+# =============================================================================
+# EXÉCUTION ET COMPARAISON
+# =============================================================================
+
+def measure(op: Callable, repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Calibre le nombre d'itérations puis retourne médiane/min par opération (µs)"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "number": number,
+    }
+
+
+def run_benchmarks(pattern: str = None, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    agent = load_agent()
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        op = factory(agent)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = measure(op, repeat=repeat)
+        print(f"⏱️  {name:<45} {results[name]['median_us']:>14.2f} µs", flush=True)
+    return results
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Dict[str, Dict[str, float]]:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baselines(results: Dict[str, Dict[str, float]], path: Path = BASELINES_PATH,
+                   overwrite: bool = False) -> List[str]:
+    """Ajoute les références des nouveaux benchmarks ; retourne les références existantes conservées
+
+    Une référence existante n'est remplacée qu'avec `overwrite` : réenregistrer
+    tout le fichier entérinerait sans le dire les régressions accumulées.
+    """
+    merged = load_baselines(path)
+    kept = [name for name in results if name in merged and not overwrite]
+    merged.update({name: result for name, result in results.items() if name not in kept})
+    payload = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": dict(sorted(merged.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+    return kept
+
+
+def compare(results, baselines, threshold: float) -> List[str]:
+    """Retourne la liste des benchmarks en régression au-delà du seuil"""
+    regressions = []
+    print(f"\n{'benchmark':<45} {'référence':>12} {'actuel':>12} {'écart':>9}")
+    for name, current in results.items():
+        reference = baselines.get(name)
+        if not reference:
+            print(f"{name:<45} {'—':>12} {current['median_us']:>12.2f} {'nouveau':>9}")
+            continue
+        delta = current["median_us"] / reference["median_us"] - 1
+        flag = "❌" if delta > threshold else "✅"
+        print(f"{name:<45} {reference['median_us']:>12.2f} {current['median_us']:>12.2f} {delta:>+8.1%} {flag}")
+        if delta > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks des chemins critiques de l'agent")
+    parser.add_argument("-k", dest="pattern", help="Ne lancer que les benchmarks contenant ce motif")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", action="store_true",
+                        help="Enregistrer les références des benchmarks qui n'en ont pas encore")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Avec --save : remplacer aussi les références existantes (à limiter avec -k)")
+    parser.add_argument("--compare", action="store_true", help="Comparer aux références enregistrées")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Régression relative tolérée (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+    if args.overwrite and not args.pattern:
+        parser.error("--overwrite exige -k : les références se remplacent benchmark par benchmark")
+
+    results = run_benchmarks(args.pattern, args.repeat)
+
+    if args.save:
+        kept = save_baselines(results, overwrite=args.overwrite)
+        print(f"\n💾 Références enregistrées: {BASELINES_PATH}")
+        if kept:
+            print(f"⚠️ {len(kept)} référence(s) existante(s) conservée(s) (--overwrite -k pour les remplacer): "
+                  f"{', '.join(kept)}")
+
+    if args.compare:
+        regressions = compare(results, load_baselines(), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\n✅ Aucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,481 @@
+"""
+Doublures locales des services externes pour les benchmarks hors-ligne
+
+- FakeJSONPlaceholderServer : serveur HTTP local qui émule JSONPlaceholder
+- FakeGspreadClient / FakeDriveService : clients Google qui comptent les appels
+- StubLLM : LLM déterministe compatible avec `prompt | llm | parser`
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# =============================================================================
+# COMPTAGE DES APPELS
+# =============================================================================
+
+class CallRecorder:
+    """Compteur d'appels thread-safe partagé par toutes les doublures"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def record(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+class QuotaSimulator:
+    """Injecte des erreurs de quota (429) de façon déterministe"""
+
+    def __init__(self, error_rate: float = 0.0, seed: int = 42):
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def check(self, name: str, recorder: CallRecorder):
+        if self.error_rate <= 0:
+            return
+        with self._lock:
+            triggered = self._random.random() < self.error_rate
+        if triggered:
+            recorder.record(f"{name}.quota_error")
+            raise FakeQuotaError(name)
+
+
+class _FakeResponse:
+    """Réponse minimale exposant `status_code` (gspread) et `status` (googleapiclient)"""
+
+    def __init__(self, status: int):
+        self.status_code = status
+        self.status = status
+
+
+class FakeQuotaError(Exception):
+    """Erreur 429 imitant gspread.exceptions.APIError et googleapiclient HttpError"""
+
+    def __init__(self, operation: str, status: int = 429):
+        super().__init__(f"Quota exceeded for {operation} ({status})")
+        self.response = _FakeResponse(status)
+        self.resp = self.response
+
+
+# =============================================================================
+# SERVEUR HTTP JSONPLACEHOLDER
+# =============================================================================
+
+def generate_records(resource: str, size: int) -> List[Dict[str, Any]]:
+    """Génère `size` enregistrements déterministes au format JSONPlaceholder"""
+    if resource == "users":
+        return [
+            {
+                "id": i,
+                "name": f"User {i}",
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "address": {
+                    "street": f"{i} Rue de la Paix",
+                    "city": "Paris",
+                    "zipcode": f"{75000 + i % 20:05d}",
+                    "geo": {"lat": f"{48.85 + i / 1000:.4f}", "lng": f"{2.35 + i / 1000:.4f}"},
+                },
+                "phone": f"01-23-45-{i:04d}",
+                "website": f"user{i}.example.com",
+                "company": {"name": f"Company {i % 7}", "catchPhrase": "Synergize", "bs": "e-markets"},
+            }
+            for i in range(1, size + 1)
+        ]
+    if resource == "comments":
+        return [
+            {
+                "postId": (i - 1) // 5 + 1,
+                "id": i,
+                "name": f"comment {i}",
+                "email": f"commenter{i % 50}@example.com",
+                "body": "lorem ipsum dolor sit amet " * 4,
+            }
+            for i in range(1, size + 1)
+        ]
+    # posts (par défaut)
+    return [
+        {
+            "userId": (i - 1) // 10 + 1,
+            "id": i,
+            "title": f"sunt aut facere repellat provident {i}",
+            "body": "quia et suscipit suscipit recusandae consequuntur expedita et cum " * 3,
+        }
+        for i in range(1, size + 1)
+    ]
+
+
+class FakeJSONPlaceholderServer:
+    """Serveur HTTP local émulant JSONPlaceholder (latence et taille configurables)
+
+    Supporte les paramètres json-server `_limit`, `_start`, `_end`, `_page`,
+    `_sort`, `_order` et les filtres d'égalité `champ=valeur`. Chaque réponse
+    porte un ETag (304 sur `If-None-Match`) et, si `max_age` est fixé, un
+    `Cache-Control: max-age`.
+    """
+
+    def __init__(self, size: int = 100, latency: float = 0.0, recorder: Optional[CallRecorder] = None,
+                 sizes: Optional[Dict[str, int]] = None, row_latency: float = 0.0, max_age: int = 0):
+        self.size = size
+        self.latency = latency
+        # Temps de transfert par enregistrement renvoyé (les grosses réponses coûtent plus cher)
+        self.row_latency = row_latency
+        self.max_age = max_age
+        self.recorder = recorder or CallRecorder()
+        self.sizes = sizes or {}
+        self._payload_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._httpd = None
+        self._thread = None
+
+    def records(self, resource: str) -> List[Dict[str, Any]]:
+        if resource not in self._payload_cache:
+            self._payload_cache[resource] = generate_records(resource, self.sizes.get(resource, self.size))
+        return self._payload_cache[resource]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, resource: str = "posts") -> str:
+        return f"{self.base_url}/{resource}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # noqa: A002 - signature imposée
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionError:
+                    # Client qui ferme la connexion dès qu'il a assez de lignes (parsing incrémental)
+                    self.close_connection = True
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                resource = parsed.path.strip("/").split("/")[0] or "posts"
+                server.recorder.record(f"http.GET /{resource}")
+                if server.latency:
+                    time.sleep(server.latency)
+
+                data = server.records(resource)
+                query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+                data = server.apply_query(data, query)
+                body = json.dumps(data).encode("utf-8")
+                etag = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+                cache_headers = [("ETag", etag)]
+                if server.max_age:
+                    cache_headers.append(("Cache-Control", f"max-age={server.max_age}"))
+
+                if self.headers.get("If-None-Match") == etag:
+                    server.recorder.record(f"http.304 /{resource}")
+                    self.send_response(304)
+                    for name, value in cache_headers:
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                if server.row_latency:
+                    time.sleep(server.row_latency * len(data))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in cache_headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    @staticmethod
+    def apply_query(data: List[Dict[str, Any]], query: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Applique les paramètres json-server à une collection"""
+        for key, value in query.items():
+            if not key.startswith("_"):
+                data = [item for item in data if str(item.get(key)) == value]
+
+        if "_sort" in query:
+            reverse = query.get("_order", "asc").lower() == "desc"
+            data = sorted(data, key=lambda item: item.get(query["_sort"]), reverse=reverse)
+
+        start = int(query.get("_start", 0))
+        if "_page" in query:
+            start = (int(query["_page"]) - 1) * int(query.get("_limit", 10))
+        end = None
+        if "_end" in query:
+            end = int(query["_end"])
+        elif "_limit" in query:
+            end = start + int(query["_limit"])
+        return data[start:end]
+
+    def start(self) -> "FakeJSONPlaceholderServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+# =============================================================================
+# FAUX CLIENTS GOOGLE (gspread + Drive v3)
+# =============================================================================
+
+class _GoogleStandIn:
+    """Base commune : latence, quota et comptage des appels"""
+
+    def __init__(self, recorder: CallRecorder, latency: float = 0.0, quota: Optional[QuotaSimulator] = None,
+                 row_latency: float = 0.0):
+        self.recorder = recorder
+        self.latency = latency
+        self.quota = quota or QuotaSimulator()
+        # Temps d'écriture par ligne envoyée (append_rows)
+        self.row_latency = row_latency
+
+    def _call(self, name: str):
+        self.recorder.record(name)
+        if self.latency:
+            time.sleep(self.latency)
+        self.quota.check(name, self.recorder)
+
+
+class FakeWorksheet(_GoogleStandIn):
+    def __init__(self, recorder, latency=0.0, quota=None, row_latency=0.0):
+        super().__init__(recorder, latency, quota, row_latency)
+        self.rows: List[List[Any]] = []
+
+    def append_row(self, values, **kwargs):
+        self._call("sheets.append_row")
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self._call("sheets.append_rows")
+        if self.row_latency:
+            time.sleep(self.row_latency * len(values))
+        self.rows.extend(list(row) for row in values)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._call("sheets.update")
+        self.rows = [list(row) for row in values or []]
+
+
+class FakeSpreadsheet(_GoogleStandIn):
+    def __init__(self, title, recorder, latency=0.0, quota=None, spreadsheet_id=None, row_latency=0.0):
+        super().__init__(recorder, latency, quota, row_latency)
+        self.id = spreadsheet_id or uuid.uuid4().hex
+        self.title = title
+        self.url = f"https://docs.google.com/spreadsheets/d/{self.id}"
+        self.permissions: List[Dict[str, Any]] = []
+        self._worksheet = FakeWorksheet(recorder, latency, self.quota, row_latency)
+
+    def share(self, email_address, perm_type="user", role="writer", **kwargs):
+        self._call("sheets.share")
+        self.permissions.append({"email": email_address, "type": perm_type, "role": role})
+
+    def get_worksheet(self, index):
+        return self._worksheet
+
+    @property
+    def sheet1(self):
+        return self._worksheet
+
+
+class FakeGspreadClient(_GoogleStandIn):
+    """Remplace le client `gspread` autorisé (`gc`)"""
+
+    def __init__(self, recorder, latency=0.0, quota=None, row_latency=0.0):
+        super().__init__(recorder, latency, quota, row_latency)
+        self.spreadsheets: Dict[str, FakeSpreadsheet] = {}
+        self._lock = threading.Lock()
+
+    def create(self, title, folder_id=None):
+        self._call("sheets.create")
+        sheet = FakeSpreadsheet(title, self.recorder, self.latency, self.quota, row_latency=self.row_latency)
+        with self._lock:
+            self.spreadsheets[sheet.id] = sheet
+        return sheet
+
+    def open_by_key(self, key):
+        self._call("sheets.open_by_key")
+        with self._lock:
+            if key not in self.spreadsheets:
+                self.spreadsheets[key] = FakeSpreadsheet(key, self.recorder, self.latency, self.quota, key)
+            return self.spreadsheets[key]
+
+
+class _FakeRequest:
+    """Requête Drive différée : rien n'est compté avant `execute()`"""
+
+    def __init__(self, standin: _GoogleStandIn, name: str, handler):
+        self._standin = standin
+        self._name = name
+        self._handler = handler
+
+    def execute(self):
+        self._standin._call(self._name)
+        return self._handler()
+
+
+class _FakeFiles:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def list(self, q="", fields=None, **kwargs):
+        def handler():
+            name = re.search(r"name='([^']*)'", q or "")
+            files = [f for f in self._drive.stored_files.values()
+                     if not name or f.get("name") == name.group(1)]
+            return {"files": [dict(f) for f in files]}
+        return _FakeRequest(self._drive, "drive.files.list", handler)
+
+    def create(self, body=None, fields=None, **kwargs):
+        def handler():
+            file_id = uuid.uuid4().hex
+            entry = {"id": file_id, "parents": ["root"], **(body or {})}
+            self._drive.stored_files[file_id] = entry
+            return {"id": file_id, "parents": entry["parents"]}
+        return _FakeRequest(self._drive, "drive.files.create", handler)
+
+    def get(self, fileId=None, fields=None, **kwargs):
+        def handler():
+            return dict(self._drive.stored_files.get(fileId, {"id": fileId, "parents": ["root"]}))
+        return _FakeRequest(self._drive, "drive.files.get", handler)
+
+    def update(self, fileId=None, addParents=None, removeParents=None, body=None, fields=None, **kwargs):
+        def handler():
+            entry = self._drive.stored_files.setdefault(fileId, {"id": fileId, "parents": ["root"]})
+            if addParents:
+                entry["parents"] = addParents.split(",")
+            entry.update(body or {})
+            return dict(entry)
+        return _FakeRequest(self._drive, "drive.files.update", handler)
+
+    def delete(self, fileId=None, **kwargs):
+        def handler():
+            self._drive.stored_files.pop(fileId, None)
+            return {}
+        return _FakeRequest(self._drive, "drive.files.delete", handler)
+
+
+class _FakePermissions:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def create(self, fileId=None, body=None, **kwargs):
+        def handler():
+            return {"id": uuid.uuid4().hex, **(body or {})}
+        return _FakeRequest(self._drive, "drive.permissions.create", handler)
+
+
+class _FakeBatch:
+    """Batch Drive : un seul appel compté pour toutes les requêtes ajoutées"""
+
+    def __init__(self, drive: "FakeDriveService", callback=None):
+        self._drive = drive
+        self._callback = callback
+        self._requests: List[Any] = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id if request_id is not None else str(len(self._requests))
+        self._requests.append((request_id, request, callback or self._callback))
+
+    def execute(self):
+        self._drive._call("drive.batch")
+        for request_id, request, callback in self._requests:
+            response = request._handler()
+            if callback is not None:
+                callback(request_id, response, None)
+
+
+class FakeDriveService(_GoogleStandIn):
+    """Remplace le service `googleapiclient` Drive v3"""
+
+    def __init__(self, recorder, latency=0.0, quota=None):
+        super().__init__(recorder, latency, quota)
+        self.stored_files: Dict[str, Dict[str, Any]] = {}
+
+    def files(self):
+        return _FakeFiles(self)
+
+    def permissions(self):
+        return _FakePermissions(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+
+# =============================================================================
+# LLM DE SUBSTITUTION
+# =============================================================================
+
+def default_llm_responder(user_query: str) -> Dict[str, Any]:
+    """Réponse JSON plausible pour une requête utilisateur (sans appel réseau)"""
+    numbers = re.findall(r"\b(\d+)\b", user_query)
+    limit = int(numbers[0]) if numbers else 10
+    user = re.search(r"utilisateur (\d+)", user_query)
+    return {
+        "limit": limit,
+        "fields": ["userId", "id", "title", "body"],
+        "filters": {"userId": int(user.group(1))} if user else {},
+        "description": f"Récupération de {limit} éléments",
+    }
+
+
+class StubLLM:
+    """LLM déterministe utilisable à la place de `ChatOpenAI` dans `prompt | llm | parser`"""
+
+    def __init__(self, recorder: CallRecorder, latency: float = 0.0, responder=None):
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+
+        self.recorder = recorder
+        self.latency = latency
+        self.responder = responder or default_llm_responder
+
+        def _invoke(prompt_value):
+            self.recorder.record("llm.invoke")
+            if self.latency:
+                time.sleep(self.latency)
+            text = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+            match = re.search(r"Requête: (.*)", text)
+            user_query = match.group(1).strip() if match else text
+            return AIMessage(content=json.dumps(self.responder(user_query)))
+
+        self.runnable = RunnableLambda(_invoke)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Enregistrement et rejeu hors-ligne d'un run de l'agent
+
+Usage :
+    python scripts/cassette.py record "récupère 5 posts avec title et id" -o cassettes/run.json
+    python scripts/cassette.py replay cassettes/run.json               # latences d'origine
+    python scripts/cassette.py replay cassettes/run.json --no-latency  # sans latence
+    python scripts/cassette.py replay cassettes/run.json --latency-scale 0.5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(project_root / "src"))
+
+
+def print_summary(cassette, wall: float):
+    """Affiche le détail des interactions de la cassette"""
+    print(f"\n🎞️  Cassette: {cassette.path}")
+    for kind, stats in sorted(cassette.summary().items()):
+        print(f"   - {kind:<8} {stats['count']:>4} interaction(s) | {stats['duration']:.3f}s enregistrées")
+    print(f"⏱️  Durée du run: {wall:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay d'un run de l'agent")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="Exécuter un run réel et l'enregistrer")
+    record.add_argument("query", help="Requête utilisateur")
+    record.add_argument("-o", "--output", default="cassettes/run.json", help="Fichier cassette")
+
+    replay = subparsers.add_parser("replay", help="Rejouer une cassette sans réseau")
+    replay.add_argument("cassette", help="Fichier cassette")
+    replay.add_argument("--query", help="Requête (par défaut celle enregistrée)")
+    replay.add_argument("--no-latency", action="store_true", help="Supprimer les latences enregistrées")
+    replay.add_argument("--latency-scale", type=float, default=1.0, help="Facteur appliqué aux latences")
+
+    args = parser.parse_args()
+
+    from langchain_core.messages import HumanMessage
+    from agent import graph as agent_module
+    from agent.cassette import Cassette
+
+    if args.command == "record":
+        query, path, mode, scale = args.query, args.output, "record", 1.0
+    else:
+        path, mode = args.cassette, "replay"
+        scale = 0.0 if args.no_latency else args.latency_scale
+        query = args.query or Cassette(path, mode="replay").metadata.get("user_query", "")
+
+    state = agent_module.get_initial_state()
+    state["messages"] = [HumanMessage(content=query)]
+
+    start = time.perf_counter()
+    result = agent_module.run_with_cassette(state, path, mode, scale)
+    wall = time.perf_counter() - start
+
+    print_summary(Cassette(path, mode="replay"), wall)
+    if result.get("error"):
+        print(f"❌ Erreur: {result['error']}")
+        return 1
+    print(f"✅ Run terminé: {result.get('sheets_url', '')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Agrégation group-by pour les exports de synthèse
+
+"nombre de posts par utilisateur" n'exporte que quelques lignes de synthèse
+au lieu de toutes les lignes brutes. L'agrégation est une agrégation par
+hachage : les clés de groupe sont factorisées en codes entiers (NumPy
+`unique` pour les colonnes numériques, dictionnaire sinon), puis chaque
+métrique est calculée en une passe (`bincount` / `ufunc.at` quand la
+colonne est numérique).
+
+Spécification (`extracted_params["aggregate"]`) :
+    {"group_by": ["userId"], "metrics": [{"op": "count"}, {"op": "avg", "field": "id"}]}
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agent.columnar import ColumnarBatch, build_column
+from agent.sorting import sortable_value
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+AGGREGATE_OPS = ("count", "count_distinct", "sum", "avg", "min", "max")
+
+OP_ALIASES = {
+    "nombre": "count", "compte": "count", "size": "count",
+    "distinct": "count_distinct", "nunique": "count_distinct", "distinct_count": "count_distinct",
+    "somme": "sum", "total": "sum",
+    "mean": "avg", "average": "avg", "moyenne": "avg",
+    "minimum": "min", "maximum": "max",
+}
+
+
+def _op(name: Any) -> str:
+    op = str(name).strip().lower()
+    op = OP_ALIASES.get(op, op)
+    if op not in AGGREGATE_OPS:
+        raise ValueError(f"Agrégat inconnu: {name!r}")
+    return op
+
+
+def normalize_aggregate(spec: Any) -> Optional[Dict[str, Any]]:
+    """Normalise la spécification d'agrégation (None si absente)"""
+    if not spec:
+        return None
+    if not isinstance(spec, dict):
+        raise ValueError(f"Spécification d'agrégation invalide: {spec!r}")
+
+    group_by = spec.get("group_by") or spec.get("by") or []
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    if not isinstance(group_by, list) or not all(isinstance(f, str) and f for f in group_by):
+        raise ValueError(f"group_by invalide: {group_by!r}")
+
+    metrics = []
+    for metric in spec.get("metrics") or [{"op": "count"}]:
+        if isinstance(metric, str):
+            metric = {"op": metric}
+        if not isinstance(metric, dict):
+            raise ValueError(f"Métrique invalide: {metric!r}")
+        op = _op(metric.get("op") or metric.get("agg"))
+        field = metric.get("field")
+        if op != "count" and not field:
+            raise ValueError(f"L'agrégat {op} nécessite un champ")
+        name = metric.get("name") or metric.get("as") or (f"{op}_{field}" if field else op)
+        metrics.append({"op": op, "field": field, "name": name})
+
+    return {"group_by": list(dict.fromkeys(group_by)), "metrics": metrics}
+
+
+def required_fields(spec: Dict[str, Any]) -> List[str]:
+    """Champs à projeter pour calculer l'agrégation (clés puis champs des métriques)"""
+    fields = list(spec["group_by"])
+    fields += [metric["field"] for metric in spec["metrics"] if metric["field"]]
+    return list(dict.fromkeys(fields))
+
+
+# =============================================================================
+# FACTORISATION DES CLÉS
+# =============================================================================
+
+def _python_values(column) -> List[Any]:
+    return column if isinstance(column, list) else column.tolist()
+
+
+def _is_numeric(column) -> bool:
+    return np is not None and isinstance(column, np.ndarray) and column.dtype.kind in "if"
+
+
+def _factorize(batch: ColumnarBatch, group_by: Sequence[str]) -> Tuple[Any, int, List[Any]]:
+    """Codes de groupe par ligne, nombre de groupes et colonnes de clés triées par clé"""
+    length = len(batch)
+    if not group_by:
+        codes = np.zeros(length, dtype=np.int64) if np is not None else [0] * length
+        return codes, 1 if length else 0, []
+
+    columns = [batch.column(field) if field in batch.columns else [""] * length for field in group_by]
+    if all(_is_numeric(column) for column in columns):
+        # np.unique trie les clés : les codes suivent déjà l'ordre de sortie
+        if len(columns) == 1:
+            uniques, codes = np.unique(columns[0], return_inverse=True)
+            return codes.reshape(-1), len(uniques), [uniques]
+        uniques, codes = np.unique(np.rec.fromarrays(columns), return_inverse=True)
+        return codes.reshape(-1), len(uniques), [uniques[name] for name in uniques.dtype.names]
+
+    index: Dict[tuple, int] = {}
+    codes = []
+    for key in zip(*(_python_values(column) for column in columns)):
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(index)
+        codes.append(code)
+
+    # Renumérotation des codes dans l'ordre trié des clés
+    keys = list(index)
+    order = sorted(range(len(keys)), key=lambda code: tuple(sortable_value(v) for v in keys[code]))
+    rank = [0] * len(keys)
+    for position, code in enumerate(order):
+        rank[code] = position
+    codes = [rank[code] for code in codes]
+    if np is not None:
+        codes = np.asarray(codes, dtype=np.int64)
+    key_columns = [build_column([keys[code][i] for code in order]) for i in range(len(group_by))]
+    return codes, len(keys), key_columns
+
+
+# =============================================================================
+# MÉTRIQUES
+# =============================================================================
+
+def _present(value: Any) -> bool:
+    return value is not None and value != ""
+
+
+def _numeric_metric(op: str, codes, values, groups: int, counts):
+    """Métrique vectorisée sur une colonne NumPy numérique (chaque groupe a au moins une valeur)"""
+    if op in ("sum", "avg"):
+        sums = np.bincount(codes, weights=values, minlength=groups)
+        if op == "avg":
+            return sums / counts
+        return sums.round().astype(np.int64) if values.dtype.kind == "i" else sums
+    if op in ("min", "max"):
+        if values.dtype.kind == "i":
+            info = np.iinfo(values.dtype)
+            initial = info.max if op == "min" else info.min
+        else:
+            initial = np.inf if op == "min" else -np.inf
+        out = np.full(groups, initial, dtype=values.dtype)
+        (np.minimum if op == "min" else np.maximum).at(out, codes, values)
+        return out
+    # count_distinct : paires (groupe, valeur) uniques
+    pairs = np.unique(np.rec.fromarrays([codes, values]))
+    return np.bincount(pairs["f0"], minlength=groups)
+
+
+def _python_metric(op: str, codes: Sequence[int], values: Sequence[Any], groups: int) -> List[Any]:
+    """Métrique en une passe sur une colonne quelconque (valeurs vides ignorées)"""
+    if op == "count_distinct":
+        seen: List[set] = [set() for _ in range(groups)]
+        for code, value in zip(codes, values):
+            if _present(value):
+                seen[code].add(value)
+        return [len(values_seen) for values_seen in seen]
+
+    if op in ("sum", "avg"):
+        sums = [0] * groups
+        counts = [0] * groups
+        for code, value in zip(codes, values):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                sums[code] += value
+                counts[code] += 1
+        if op == "sum":
+            return sums
+        return [s / c if c else None for s, c in zip(sums, counts)]
+
+    best: List[Any] = [None] * groups
+    better = (lambda a, b: a < b) if op == "min" else (lambda a, b: a > b)
+    for code, value in zip(codes, values):
+        if _present(value):
+            current = best[code]
+            if current is None or better(sortable_value(value), sortable_value(current)):
+                best[code] = value
+    return best
+
+
+def aggregate(batch: ColumnarBatch, spec: Dict[str, Any]) -> ColumnarBatch:
+    """Agrège un lot : une ligne par groupe, triée par clé de groupe"""
+    codes, groups, key_columns = _factorize(batch, spec["group_by"])
+    python_codes = None
+    if np is not None:
+        counts = np.bincount(codes, minlength=groups)
+    else:
+        python_codes = codes
+        counts = _python_metric("sum", codes, [1] * len(codes), groups)
+
+    columns: Dict[str, Any] = dict(zip(spec["group_by"], key_columns))
+    for metric in spec["metrics"]:
+        op, field = metric["op"], metric["field"]
+        if op == "count":
+            columns[metric["name"]] = counts
+            continue
+        column = batch.column(field) if field in batch.columns else [""] * len(batch)
+        if _is_numeric(column):
+            columns[metric["name"]] = _numeric_metric(op, codes, column, groups, counts)
+        else:
+            if python_codes is None:
+                python_codes = _python_values(codes)
+            columns[metric["name"]] = build_column(
+                _python_metric(op, python_codes, _python_values(column), groups))
+    return ColumnarBatch(list(columns), columns, groups)
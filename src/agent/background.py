@@ -0,0 +1,181 @@
+"""
+File de tâches d'arrière-plan avec reprises
+
+Les effets de bord post-création (partage du sheet, lien public, droits sur
+le dossier) ne conditionnent pas l'URL rendue à l'utilisateur : ils sont
+soumis à cette file et exécutés par des threads workers après la réponse.
+Une tâche qui échoue sur une erreur transitoire (quota, 5xx, réseau) est
+reprogrammée avec un délai exponentiel ; chaque tâche a un statut
+consultable (pending, running, retrying, done, failed).
+
+La file est vidée à la sortie du processus (dans la limite de
+`drain_timeout`) pour ne pas perdre de partage en mode CLI.
+"""
+
+import atexit
+import heapq
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _no_log(message: str):
+    pass
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """Code HTTP d'une erreur gspread (response.status_code) ou googleapiclient (resp.status)"""
+    for attr in ("response", "resp"):
+        response = getattr(error, attr, None)
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+        try:
+            return int(status)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_transient(error: Exception) -> bool:
+    """Erreur qui mérite une reprise : quota (429), erreur serveur (5xx) ou réseau (sans code)"""
+    status = error_status(error)
+    return status is None or status == 429 or status >= 500
+
+
+class TaskQueue:
+    """Tâches exécutées par `workers` threads, reprises avec backoff exponentiel (avec gigue)"""
+
+    def __init__(self, workers: int = 2, max_attempts: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0, drain_timeout: float = 30.0, history: int = 1000,
+                 log: Callable[[str], None] = _no_log):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.drain_timeout = drain_timeout
+        self.history = history
+        self.log = log
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._active = 0
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    # ----- soumission et statut --------------------------------------------
+
+    def submit(self, name: str, fn: Callable[[], Any],
+               retry_on: Callable[[Exception], bool] = is_transient) -> str:
+        """Programme `fn()` ; retourne l'identifiant de la tâche"""
+        task_id = uuid.uuid4().hex[:12]
+        task = {"id": task_id, "name": name, "status": "pending", "attempts": 0, "error": None,
+                "submitted_at": time.time(), "finished_at": None, "fn": fn, "retry_on": retry_on}
+        with self._condition:
+            self._tasks[task_id] = task
+            self._trim()
+            heapq.heappush(self._heap, (time.time(), next(self._sequence), task_id))
+            self._ensure_workers()
+            self._condition.notify()
+        return task_id
+
+    def status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            task = self._tasks.get(task_id)
+            return {k: v for k, v in task.items() if k not in ("fn", "retry_on")} if task else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            counts: Dict[str, int] = {}
+            for task in self._tasks.values():
+                counts[task["status"]] = counts.get(task["status"], 0) + 1
+            return counts
+
+    def _trim(self):
+        """Borne l'historique : les tâches terminées les plus anciennes sont oubliées"""
+        excess = len(self._tasks) - self.history
+        for task_id in [key for key, task in self._tasks.items() if task["status"] in ("done", "failed")][:excess]:
+            del self._tasks[task_id]
+
+    # ----- exécution ---------------------------------------------------------
+
+    def _ensure_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        if not self._threads:
+            # Premier démarrage : vidage de la file à la sortie du processus
+            atexit.register(self.drain)
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"background-task-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_task(self) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                if self._heap:
+                    due, _, task_id = self._heap[0]
+                    delay = due - time.time()
+                    if delay <= 0:
+                        heapq.heappop(self._heap)
+                        task = self._tasks.get(task_id)
+                        if task is None:
+                            continue
+                        task["status"] = "running"
+                        task["attempts"] += 1
+                        self._active += 1
+                        return task
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            try:
+                task["fn"]()
+            except Exception as task_error:
+                self._failed(task, task_error)
+            else:
+                with self._condition:
+                    task.update(status="done", error=None, finished_at=time.time())
+                self.log(f"✅ Tâche d'arrière-plan terminée: {task['name']} ({task['attempts']} essai(s))")
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+    def _failed(self, task: Dict[str, Any], error: Exception):
+        with self._condition:
+            task["error"] = str(error)
+            if task["attempts"] < self.max_attempts and task["retry_on"](error):
+                delay = min(self.max_delay, self.base_delay * 2 ** (task["attempts"] - 1))
+                delay *= random.uniform(0.5, 1.0)
+                task["status"] = "retrying"
+                heapq.heappush(self._heap, (time.time() + delay, next(self._sequence), task["id"]))
+                self.log(f"🔁 {task['name']}: nouvel essai dans {delay:.1f}s ({error})")
+                return
+            task.update(status="failed", finished_at=time.time())
+        self.log(f"❌ Tâche d'arrière-plan abandonnée: {task['name']} ({error})")
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Attend que toutes les tâches soient terminées (reprises comprises) ; False si délai dépassé"""
+        deadline = time.time() + (self.drain_timeout if timeout is None else timeout)
+        with self._condition:
+            while self._heap or self._active:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
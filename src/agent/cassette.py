@@ -0,0 +1,351 @@
+"""
+Enregistrement / rejeu des interactions sortantes d'un run (cassettes)
+
+Une cassette capture, dans l'ordre, chaque interaction externe d'un run :
+requête/réponse LLM, pages de l'API upstream et appels Drive/Sheets, avec
+leur durée. En mode replay, ces réponses sont substituées de façon
+déterministe, avec les latences d'origine (éventuellement mises à l'échelle)
+ou sans latence, ce qui permet de reproduire hors-ligne un run lent.
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+CASSETTE_VERSION = 1
+
+# Taille maximale des arguments conservés (diagnostic uniquement)
+MAX_ARGS_REPR = 2000
+
+
+class CassetteReplayError(Exception):
+    """Erreur rejouée depuis une cassette (ou interaction absente de la cassette)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        if status is not None:
+            # Même forme que gspread (response.status_code) et googleapiclient (resp.status)
+            self.response = type("CassetteResponse", (), {"status_code": status, "status": status})()
+            self.resp = self.response
+
+
+def _is_plain(value: Any) -> bool:
+    """Vrai si la valeur est sérialisable telle quelle en JSON"""
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _args_repr(args, kwargs) -> str:
+    text = json.dumps({"args": args, "kwargs": kwargs}, default=str, ensure_ascii=False)
+    return text if len(text) <= MAX_ARGS_REPR else text[:MAX_ARGS_REPR] + "…"
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    for attr in ("response", "resp"):
+        response = getattr(error, attr, None)
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+# =============================================================================
+# CASSETTE
+# =============================================================================
+
+class Cassette:
+    """Journal ordonné des interactions d'un run"""
+
+    def __init__(self, path: str, mode: str = "record", latency_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Mode de cassette inconnu: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.metadata: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._handle_counter = 0
+        self._queues: Dict[tuple, deque] = {}
+
+        if mode == "replay":
+            self.load()
+
+    # ----- persistance ---------------------------------------------------
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            payload = json.load(f)
+        self.interactions = payload.get("interactions", [])
+        self.attributes = payload.get("attributes", {})
+        self.metadata = payload.get("metadata", {})
+        queues = defaultdict(deque)
+        for interaction in self.interactions:
+            queues[(interaction["handle"], interaction["method"])].append(interaction)
+        self._queues = dict(queues)
+
+    def save(self):
+        payload = {
+            "version": CASSETTE_VERSION,
+            "metadata": {**self.metadata, "saved_at": datetime.now().isoformat(timespec="seconds")},
+            "interactions": self.interactions,
+            "attributes": self.attributes,
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+
+    # ----- enregistrement ------------------------------------------------
+
+    def new_handle(self) -> str:
+        with self._lock:
+            self._handle_counter += 1
+            return f"h{self._handle_counter}"
+
+    def record(self, kind: str, handle: str, method: str, args_repr: str,
+               duration: float, result: Any = None, error: Optional[Exception] = None):
+        entry = {
+            "kind": kind,
+            "handle": handle,
+            "method": method,
+            "args": args_repr,
+            "duration": round(duration, 6),
+            "result": result,
+        }
+        if error is not None:
+            entry["error"] = {"type": type(error).__name__, "message": str(error), "status": _error_status(error)}
+        with self._lock:
+            self.interactions.append(entry)
+
+    def record_attribute(self, handle: str, name: str, value: Any):
+        with self._lock:
+            self.attributes[f"{handle}.{name}"] = value
+
+    # ----- rejeu ---------------------------------------------------------
+
+    def next_interaction(self, handle: str, method: str, args_repr: Optional[str] = None) -> Dict[str, Any]:
+        """Prochaine interaction enregistrée ; `args_repr` choisit la première aux mêmes arguments
+        (appels concurrents rejoués dans un ordre différent de l'enregistrement)"""
+        with self._lock:
+            queue = self._queues.get((handle, method))
+            if not queue:
+                raise CassetteReplayError(f"Interaction absente de la cassette: {handle}.{method}()")
+            interaction = None
+            if args_repr is not None:
+                for position, candidate in enumerate(queue):
+                    if candidate.get("args") == args_repr:
+                        interaction = candidate
+                        del queue[position]
+                        break
+            if interaction is None:
+                interaction = queue.popleft()
+        if self.latency_scale > 0 and interaction.get("duration"):
+            time.sleep(interaction["duration"] * self.latency_scale)
+        error = interaction.get("error")
+        if error:
+            raise CassetteReplayError(f"{error['type']}: {error['message']}", error.get("status"))
+        return interaction
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Nombre d'interactions et durée cumulée par type"""
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "duration": 0.0})
+        for interaction in self.interactions:
+            totals[interaction["kind"]]["count"] += 1
+            totals[interaction["kind"]]["duration"] += interaction.get("duration", 0.0)
+        return dict(totals)
+
+
+# =============================================================================
+# PROXIES D'ENREGISTREMENT / DE REJEU (clients Google)
+# =============================================================================
+
+class RecordingProxy:
+    """Enveloppe un client (gspread, Drive) et journalise chaque appel"""
+
+    def __init__(self, target: Any, cassette: Cassette, kind: str, handle: str):
+        self._target = target
+        self._cassette = cassette
+        self._kind = kind
+        self._handle = handle
+
+    def __bool__(self):
+        return bool(self._target)
+
+    def _wrap_result(self, value: Any) -> Any:
+        if _is_plain(value):
+            return value, value
+        handle = self._cassette.new_handle()
+        return RecordingProxy(value, self._cassette, self._kind, handle), {"$handle": handle}
+
+    def __getattr__(self, name: str):
+        value = getattr(self._target, name)
+        if not callable(value):
+            wrapped, stored = self._wrap_result(value)
+            self._cassette.record_attribute(self._handle, name, stored)
+            return wrapped
+
+        def method(*args, **kwargs):
+            # Un objet enregistré passé en argument (requête ajoutée à un batch Drive) est déballé
+            args = [_unwrap(arg) for arg in args]
+            kwargs = {key: _unwrap(arg) for key, arg in kwargs.items()}
+            start = time.perf_counter()
+            try:
+                result = value(*args, **kwargs)
+            except Exception as e:
+                self._cassette.record(self._kind, self._handle, name, _args_repr(args, kwargs),
+                                      time.perf_counter() - start, error=e)
+                raise
+            duration = time.perf_counter() - start
+            wrapped, stored = self._wrap_result(result)
+            self._cassette.record(self._kind, self._handle, name, _args_repr(args, kwargs), duration, stored)
+            return wrapped
+
+        return method
+
+
+def _unwrap(value: Any) -> Any:
+    return value._target if isinstance(value, RecordingProxy) else value
+
+
+class ReplayProxy:
+    """Objet factice qui rejoue les appels enregistrés pour un handle"""
+
+    def __init__(self, cassette: Cassette, handle: str):
+        self._cassette = cassette
+        self._handle = handle
+
+    def __bool__(self):
+        return True
+
+    def _materialize(self, stored: Any) -> Any:
+        if isinstance(stored, dict) and set(stored) == {"$handle"}:
+            return ReplayProxy(self._cassette, stored["$handle"])
+        return stored
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        key = f"{self._handle}.{name}"
+        if key in self._cassette.attributes:
+            return self._materialize(self._cassette.attributes[key])
+
+        def method(*args, **kwargs):
+            interaction = self._cassette.next_interaction(self._handle, name)
+            return self._materialize(interaction.get("result"))
+
+        return method
+
+
+# =============================================================================
+# LLM ET HTTP
+# =============================================================================
+
+def wrap_llm(llm: Any, cassette: Cassette):
+    """Retourne un Runnable qui enregistre ou rejoue les réponses du LLM"""
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+
+    def invoke(prompt_value):
+        prompt_text = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+        if cassette.mode == "replay":
+            interaction = cassette.next_interaction("llm", "invoke")
+            return AIMessage(content=interaction["result"]["content"])
+
+        start = time.perf_counter()
+        try:
+            message = llm.invoke(prompt_value)
+        except Exception as e:
+            cassette.record("llm", "llm", "invoke", prompt_text, time.perf_counter() - start, error=e)
+            raise
+        cassette.record("llm", "llm", "invoke", prompt_text, time.perf_counter() - start,
+                        {"content": message.content})
+        return message
+
+    return RunnableLambda(invoke)
+
+
+def wrap_http_get(http_get, cassette: Cassette):
+    """Retourne une fonction `http_get` qui enregistre ou rejoue les réponses upstream"""
+    import requests
+
+    def build_response(url: str, stored: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = stored["status_code"]
+        response.headers.update(stored.get("headers", {}))
+        response.url = stored.get("url", url)
+        response.encoding = stored.get("encoding")
+        response._content = base64.b64decode(stored["body_b64"])
+        response._content_consumed = True  # iter_content() relit le corps rejoué
+        return response
+
+    def recorded_get(url, **kwargs):
+        args_repr = _args_repr([url], {k: v for k, v in kwargs.items() if k not in ("timeout", "stream")})
+        if cassette.mode == "replay":
+            interaction = cassette.next_interaction("http", "get", args_repr)
+            return build_response(url, interaction["result"])
+
+        start = time.perf_counter()
+        try:
+            response = http_get(url, **kwargs)
+            body = response.content  # lit toute la réponse pour l'enregistrer
+        except Exception as e:
+            cassette.record("http", "http", "get", args_repr, time.perf_counter() - start, error=e)
+            raise
+        cassette.record("http", "http", "get", args_repr, time.perf_counter() - start, {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "url": response.url,
+            "encoding": response.encoding,
+            "body_b64": base64.b64encode(body).decode("ascii"),
+        })
+        return response
+
+    return recorded_get
+
+
+# =============================================================================
+# INSTALLATION SUR LE MODULE AGENT
+# =============================================================================
+
+# Un seul run sous cassette à la fois : les substitutions sont globales au module
+_install_lock = threading.Lock()
+
+
+@contextmanager
+def cassette_session(agent_module, cassette: Cassette):
+    """Substitue LLM, HTTP et clients Google du module agent pendant la durée du bloc"""
+    with _install_lock:
+        names = ["llm", "gc", "setup_drive_service", "http_get"]
+        originals = {name: getattr(agent_module, name) for name in names}
+
+        if cassette.mode == "replay" or originals["llm"] is not None:
+            agent_module.llm = wrap_llm(originals["llm"], cassette)
+        agent_module.http_get = wrap_http_get(originals["http_get"], cassette)
+
+        if cassette.mode == "replay":
+            agent_module.gc = ReplayProxy(cassette, "gc")
+            agent_module.setup_drive_service = lambda: ReplayProxy(cassette, "drive")
+        else:
+            if originals["gc"] is not None:
+                agent_module.gc = RecordingProxy(originals["gc"], cassette, "sheets", "gc")
+
+            def setup_drive_service():
+                return RecordingProxy(originals["setup_drive_service"](), cassette, "drive", "drive")
+
+            agent_module.setup_drive_service = setup_drive_service
+
+        try:
+            yield cassette
+        finally:
+            for name, value in originals.items():
+                setattr(agent_module, name, value)
+            if cassette.mode == "record":
+                cassette.save()
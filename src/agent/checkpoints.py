@@ -0,0 +1,330 @@
+"""
+Points de reprise persistants des runs (checkpointer LangGraph SQLite)
+
+Chaque étape du graphe est enregistrée dans une base SQLite locale, par
+run (thread LangGraph) : un run qui échoue à l'écriture du sheet peut être
+repris depuis son dernier nœud réussi, sans nouvel appel LLM ni nouveau
+téléchargement upstream.
+
+Les valeurs des canaux sont stockées à part du point de reprise, et par
+contenu : les nœuds retournent l'état complet, mais les lignes téléchargées
+(api_data, processed_data) inchangées d'une étape à l'autre ne sont écrites
+qu'une fois par run. Les valeurs sont sérialisées en msgpack (pickle pour
+les lots colonnaires) et compressées au-delà de `compress_min_bytes`.
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Suffixe du type des valeurs compressées ("msgpack+zlib")
+ZLIB_SUFFIX = "+zlib"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    digest TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS payloads (
+    digest TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints (created_at);
+"""
+
+
+class CompactSerializer:
+    """msgpack de LangGraph (pickle pour les objets non pris en charge), compressé au-delà d'un seuil"""
+
+    def __init__(self, compress_min_bytes: int = 4096, level: int = 1):
+        self.compress_min_bytes = compress_min_bytes
+        self.level = level
+        self._inner = JsonPlusSerializer(pickle_fallback=True)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self._inner.dumps_typed(obj)
+        if len(data) >= self.compress_min_bytes:
+            return f"{type_}{ZLIB_SUFFIX}", zlib.compress(data, self.level)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(ZLIB_SUFFIX):
+            type_, payload = type_[:-len(ZLIB_SUFFIX)], zlib.decompress(payload)
+        return self._inner.loads_typed((type_, payload))
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """Checkpointer LangGraph sur une base SQLite locale (une connexion par thread)"""
+
+    def __init__(self, path: str, serde: Optional[CompactSerializer] = None):
+        super().__init__(serde=serde or CompactSerializer())
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        return connection
+
+    def _execute_many(self, statements: List[Tuple[str, Sequence[Any]]]):
+        """Exécute les requêtes dans une seule transaction"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, parameters in statements:
+                connection.execute(sql, parameters)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    # ----- lecture ---------------------------------------------------------
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values = {}
+        connection = self._connection()
+        for channel, version in versions.items():
+            row = connection.execute(
+                "SELECT blobs.type, payloads.value FROM blobs LEFT JOIN payloads ON payloads.digest = blobs.digest "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self._connection().execute(
+            "SELECT task_id, idx, channel, type, payloads.value, task_path FROM writes "
+            "JOIN payloads ON payloads.digest = writes.digest "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        rows.sort(key=lambda row: writes_sort_key(row[5], row[0], row[1]))
+        return [(task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, _, channel, type_, value, _ in rows]
+
+    def _tuple(self, row: Tuple[Any, ...]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        checkpoint_ = self.serde.loads_typed((type_, checkpoint))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint_, "channel_values": self._load_blobs(
+                thread_id, checkpoint_ns, checkpoint_["channel_versions"]
+            )},
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                             "checkpoint_id": parent_id}} if parent_id else None),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    _COLUMNS = ("thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                "metadata_type, metadata")
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            row = self._connection().execute(
+                f"SELECT {self._COLUMNS} FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchone()
+        else:
+            row = self._connection().execute(
+                f"SELECT {self._COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns)
+            ).fetchone()
+        return self._tuple(row) if row is not None else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        clauses, parameters = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            parameters.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                parameters.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                parameters.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            parameters.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM checkpoints {where} ORDER BY checkpoint_id DESC", parameters
+        ).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._tuple(row)
+
+    # ----- écriture --------------------------------------------------------
+
+    def _store(self, value: Any, statements: List[Tuple[str, Sequence[Any]]]) -> Tuple[str, str]:
+        """Sérialise `value` et ajoute son contenu à la transaction (ignoré s'il est déjà stocké)"""
+        type_, payload = self.serde.dumps_typed(value)
+        digest = hashlib.blake2b(payload, digest_size=20).hexdigest()
+        statements.append(("INSERT OR IGNORE INTO payloads (digest, value) VALUES (?, ?)", (digest, payload)))
+        return type_, digest
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        statements = []
+        # Canaux modifiés à cette étape ; un contenu déjà stocké n'est pas réécrit
+        for channel, version in new_versions.items():
+            type_, digest = self._store(values[channel], statements) if channel in values else ("empty", None)
+            statements.append((
+                "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, channel, str(version), type_, digest)
+            ))
+        type_, payload = self.serde.dumps_typed(stored)
+        metadata_type, metadata_payload = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        statements.append((
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+             type_, payload, metadata_type, metadata_payload, time.time())
+        ))
+        self._execute_many(statements)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        statements = []
+        for index, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, index)
+            # Écritures ordinaires conservées (reprise), écritures spéciales (erreur, interruption) remplacées
+            verb = "INSERT OR IGNORE" if idx >= 0 else "INSERT OR REPLACE"
+            type_, digest = self._store(value, statements)
+            statements.append((
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, "
+                "digest, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, digest, task_path)
+            ))
+        self._execute_many(statements)
+
+    def delete_thread(self, thread_id: str) -> None:
+        statements = [(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+                      for table in ("checkpoints", "blobs", "writes")]
+        statements.append(("DELETE FROM payloads WHERE digest NOT IN (SELECT digest FROM blobs WHERE digest "
+                           "IS NOT NULL UNION SELECT digest FROM writes)", ()))
+        self._execute_many(statements)
+
+    def purge(self, max_age: float) -> int:
+        """Supprime les runs dont le dernier point de reprise date de plus de `max_age` secondes"""
+        rows = self._connection().execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+            (time.time() - max_age,)
+        ).fetchall()
+        for (thread_id,) in rows:
+            self.delete_thread(thread_id)
+        return len(rows)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ----- variantes asynchrones (LangGraph Studio, ainvoke) ---------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
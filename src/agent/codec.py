@@ -0,0 +1,74 @@
+"""
+Codec JSON interchangeable
+
+orjson (encodeur/décodeur natif, sortie directe en octets UTF-8) s'il est
+installé, sinon le module `json` de la stdlib. Utilisé pour le framing
+JSON-RPC du serveur MCP, le décodage des réponses API et la sérialisation
+des ressources MCP. `JSON_CODEC=stdlib` force le repli.
+
+Les deux backends produisent le même JSON compact ; en repli, la sortie
+octets (framing) reste échappée en ASCII, plus rapide et sans surrogates
+isolés. Ce que orjson refuse (clés non textuelles, entiers > 64 bits à
+l'encodage, littéraux NaN/Infinity au décodage) repasse par la stdlib.
+Différences restantes : NaN est encodé `null` et un entier > 64 bits est
+décodé en float par orjson.
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+BACKEND = "orjson" if orjson is not None and JSON_CODEC != "stdlib" else "stdlib"
+
+# orjson.JSONDecodeError hérite de json.JSONDecodeError : un seul type à intercepter
+JSONDecodeError = json.JSONDecodeError
+
+
+def _stdlib_dumps(obj: Any, indent: bool, sort_keys: bool, default: Optional[Callable[[Any], Any]],
+                  ensure_ascii: bool = False) -> str:
+    return json.dumps(obj, ensure_ascii=ensure_ascii, indent=2 if indent else None,
+                      separators=None if indent else (",", ":"), sort_keys=sort_keys, default=default)
+
+
+def dumps_bytes(obj: Any, indent: bool = False, sort_keys: bool = False,
+                default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Sérialise `obj` en octets UTF-8 (indentation de 2 espaces si `indent`)"""
+    if BACKEND == "orjson":
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            pass
+    return _stdlib_dumps(obj, indent, sort_keys, default, ensure_ascii=True).encode("ascii")
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False,
+          default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Sérialise `obj` en texte JSON"""
+    if BACKEND == "orjson":
+        return dumps_bytes(obj, indent, sort_keys, default).decode("utf-8")
+    return _stdlib_dumps(obj, indent, sort_keys, default)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Désérialise un document JSON (texte ou octets)"""
+    if BACKEND == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Littéraux acceptés par la stdlib seule (NaN, Infinity) ; sinon l'erreur stdlib remonte
+            pass
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
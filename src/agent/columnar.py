@@ -0,0 +1,182 @@
+"""
+Représentation colonnaire optionnelle pour api_data / processed_data
+
+Au lieu d'une liste de dictionnaires (chaque clé répétée à chaque ligne),
+un ColumnarBatch stocke un tableau par champ avec un schéma de noms
+internés. Les colonnes numériques homogènes sont stockées dans des
+tableaux NumPy (ou `array.array` si NumPy n'est pas installé).
+
+Projection et filtrage ne copient pas les données : une projection partage
+les colonnes existantes et un filtre ne conserve qu'un vecteur de sélection
+(indices des lignes retenues).
+"""
+
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from agent.projection import SCALAR_TYPES, flatten_value, is_path, parse_path, resolve_path
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def build_column(values: List[Any]):
+    """Choisit le stockage le plus compact pour une colonne"""
+    if values and all(type(v) is int for v in values):
+        if INT64_MIN <= min(values) and max(values) <= INT64_MAX:
+            return np.array(values, dtype=np.int64) if NUMPY_AVAILABLE else array("q", values)
+    elif values and all(type(v) is float for v in values):
+        return np.array(values, dtype=np.float64) if NUMPY_AVAILABLE else array("d", values)
+    return values
+
+
+def _is_scalar_column(column) -> bool:
+    return not isinstance(column, list) or all(isinstance(v, SCALAR_TYPES) for v in column)
+
+
+def _to_python(column) -> List[Any]:
+    """Convertit une colonne en liste de valeurs Python (sérialisables en JSON)"""
+    if isinstance(column, list):
+        return column
+    return column.tolist()
+
+
+class ColumnarBatch:
+    """Lot de lignes stocké par colonnes, avec sélection de lignes optionnelle"""
+
+    __slots__ = ("schema", "columns", "selection", "_length", "_scalar")
+
+    def __init__(self, schema: Sequence[str], columns: Dict[str, Any], length: int,
+                 selection: Optional[Any] = None, scalar: Optional[frozenset] = None):
+        self.schema = tuple(sys.intern(name) for name in schema)
+        self.columns = columns
+        self._length = length
+        self.selection = selection
+        # Colonnes dont toutes les valeurs sont déjà des cellules (aucun aplatissement)
+        if scalar is None:
+            scalar = frozenset(name for name, column in columns.items() if _is_scalar_column(column))
+        self._scalar = scalar
+
+    # ----- construction --------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> "ColumnarBatch":
+        """Construit un lot à partir d'une liste de dictionnaires (une passe par colonne)"""
+        records = records if isinstance(records, list) else list(records)
+        if fields is None:
+            seen: Dict[str, None] = {}
+            for record in records:
+                for key in record:
+                    if key not in seen:
+                        seen[key] = None
+            fields = list(seen)
+        columns = {
+            sys.intern(field): build_column([record.get(field) for record in records])
+            for field in fields
+        }
+        return cls(list(columns), columns, len(records))
+
+    @classmethod
+    def from_rows(cls, headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> "ColumnarBatch":
+        """Construit un lot à partir de lignes (tuples alignés sur `headers`)"""
+        rows = rows if isinstance(rows, list) else list(rows)
+        columns = {
+            sys.intern(name): build_column([row[position] for row in rows])
+            for position, name in enumerate(headers)
+        }
+        return cls(list(columns), columns, len(rows))
+
+    # ----- accès ---------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._length if self.selection is None else len(self.selection)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def column(self, name: str):
+        """Valeurs sélectionnées d'une colonne (tableau NumPy/array ou liste)"""
+        values = self.columns[name]
+        if self.selection is None:
+            return values
+        if NUMPY_AVAILABLE and isinstance(values, np.ndarray):
+            return values[self.selection]
+        return [values[i] for i in self.selection]
+
+    def rows(self) -> Iterator[tuple]:
+        """Itère sur les lignes sous forme de tuples (ordre du schéma)"""
+        return zip(*(_to_python(self.column(name)) for name in self.schema))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.schema, row)) for row in self.rows()]
+
+    def to_values(self, include_headers: bool = True) -> List[List[Any]]:
+        """Plage de valeurs prête pour Google Sheets (en-têtes en première ligne)"""
+        values = [list(self.schema)] if include_headers else []
+        values.extend(self.rows())
+        return values
+
+    # ----- transformations sans copie ------------------------------------
+
+    def project(self, fields: Sequence[str]) -> "ColumnarBatch":
+        """Projection : partage les colonnes existantes, calcule les chemins imbriqués"""
+        columns = {}
+        for field in fields:
+            if field in self.columns:
+                column = self.columns[field]
+                if field not in self._scalar:
+                    column = [flatten_value(v) for v in column]
+                columns[field] = column
+            elif is_path(field):
+                steps = parse_path(field)
+                root = self.columns.get(steps[0]) if isinstance(steps[0], str) else None
+                if root is None:
+                    columns[field] = [""] * self._length
+                else:
+                    rest = steps[1:]
+                    columns[field] = [flatten_value(resolve_path(value, rest)) for value in _to_python(root)]
+            else:
+                columns[field] = [""] * self._length
+        return ColumnarBatch(list(fields), columns, self._length, self.selection, frozenset(columns))
+
+    def where(self, mask) -> "ColumnarBatch":
+        """Filtre par masque booléen (aligné sur les lignes sélectionnées)"""
+        if NUMPY_AVAILABLE:
+            positions = np.flatnonzero(np.asarray(mask, dtype=bool))
+            base = np.arange(self._length) if self.selection is None else np.asarray(self.selection)
+            selection = base[positions]
+        else:
+            base = range(self._length) if self.selection is None else self.selection
+            selection = [index for index, keep in zip(base, mask) if keep]
+        return ColumnarBatch(self.schema, self.columns, self._length, selection, self._scalar)
+
+    def head(self, n: int) -> "ColumnarBatch":
+        """Garde les `n` premières lignes sélectionnées"""
+        if n >= len(self):
+            return self
+        if self.selection is not None:
+            selection = self.selection[:n]
+        else:
+            selection = np.arange(n) if NUMPY_AVAILABLE else range(n)
+        return ColumnarBatch(self.schema, self.columns, self._length, selection, self._scalar)
+
+    def with_selection(self, selection) -> "ColumnarBatch":
+        """Même lot avec un autre vecteur de sélection (indices dans les colonnes)"""
+        return ColumnarBatch(self.schema, self.columns, self._length, selection, self._scalar)
+
+    def equal_mask(self, name: str, value: Any):
+        """Masque vectorisé `colonne == valeur`"""
+        if name not in self.columns:
+            return [False] * len(self)
+        column = self.column(name)
+        if NUMPY_AVAILABLE and isinstance(column, np.ndarray):
+            return column == value
+        return [v == value for v in column]
+
@@ -0,0 +1,118 @@
+"""
+Déduplication des lignes et empreinte stable de ligne
+
+Les APIs paginées (pages qui se chevauchent, retries) peuvent renvoyer
+plusieurs fois le même enregistrement. L'étape de déduplication de
+process_data calcule pour chaque ligne une empreinte BLAKE2b de 16 octets,
+indépendante de l'ordre des colonnes, et ne conserve que ces empreintes :
+la mémoire est bornée par le nombre de clés distinctes, pas par les lignes.
+
+L'empreinte porte soit sur la ligne projetée complète, soit sur une clé
+déclarée (`DEDUP_KEY=id` ou `extracted_params["dedup"] = ["id"]`).
+"""
+
+import hashlib
+import json
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from agent.columnar import ColumnarBatch
+from agent.projection import SCALAR_TYPES, compile_projection
+
+FINGERPRINT_SIZE = 16
+
+_SCALAR_TYPE_SET = frozenset(SCALAR_TYPES)
+
+
+def _encode(values: tuple) -> bytes:
+    """Encodage canonique d'une ligne (repr des scalaires, JSON trié sinon)"""
+    if _SCALAR_TYPE_SET.issuperset(map(type, values)):
+        return repr(values).encode("utf-8", "surrogatepass")
+    return json.dumps(list(values), sort_keys=True, ensure_ascii=False,
+                      separators=(",", ":"), default=str).encode("utf-8", "surrogatepass")
+
+
+class Fingerprinter:
+    """Empreinte de lignes pour un jeu d'en-têtes donné (ordre des colonnes indifférent)"""
+
+    def __init__(self, headers: Sequence[str]):
+        self.headers = list(headers)
+        # Colonnes lues dans l'ordre alphabétique des en-têtes : (a, b) et (b, a) se confondent
+        order = sorted(range(len(self.headers)), key=lambda i: self.headers[i])
+        self._reorder = itemgetter(*order) if len(order) > 1 else (lambda row: tuple(row[:1]))
+        self._base = hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+        self._base.update(_encode(tuple(self.headers[i] for i in order)))
+
+    def digest(self, row: Sequence[Any]) -> bytes:
+        """Empreinte binaire (16 octets) d'une ligne alignée sur les en-têtes"""
+        hasher = self._base.copy()
+        hasher.update(_encode(self._reorder(row)))
+        return hasher.digest()
+
+    def hexdigest(self, row: Sequence[Any]) -> str:
+        return self.digest(row).hex()
+
+
+def row_fingerprint(row: Sequence[Any], headers: Sequence[str]) -> str:
+    """Empreinte hexadécimale stable d'une ligne (réutilisable hors de la déduplication)"""
+    return Fingerprinter(headers).hexdigest(row)
+
+
+def record_fingerprint(record: Dict[str, Any], fields: Optional[Sequence[str]] = None) -> str:
+    """Empreinte d'un enregistrement brut (tous ses champs ou `fields`, chemins acceptés)"""
+    fields = sorted(record) if fields is None else list(fields)
+    return row_fingerprint(compile_projection(fields).row(record), fields)
+
+
+def normalize_dedup_key(spec: Any) -> Optional[List[str]]:
+    """Normalise la clé de déduplication ("id", "id,userId", ["id"]) ; None = ligne complète"""
+    if not spec or spec is True:
+        return None
+    if isinstance(spec, str):
+        spec = spec.split(",")
+    if not isinstance(spec, (list, tuple)) or not all(isinstance(f, str) for f in spec):
+        raise ValueError(f"Clé de déduplication invalide: {spec!r}")
+    key = [field.strip() for field in spec if field.strip()]
+    return key or None
+
+
+class Deduplicator:
+    """Filtre en flux : ne laisse passer que la première occurrence de chaque empreinte"""
+
+    def __init__(self, headers: Sequence[str]):
+        self.fingerprinter = Fingerprinter(headers)
+        self.seen: Set[bytes] = set()
+        self.duplicates = 0
+
+    def is_new(self, row: Sequence[Any]) -> bool:
+        digest = self.fingerprinter.digest(row)
+        if digest in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen.add(digest)
+        return True
+
+    def unique(self, rows: Iterable[Sequence[Any]]) -> Iterator[Sequence[Any]]:
+        """Générateur des lignes jamais vues (mémoire bornée par les clés distinctes)"""
+        seen, digest = self.seen, self.fingerprinter.digest
+        for row in rows:
+            key = digest(row)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            yield row
+
+
+def dedup_records(records: Iterable[Dict[str, Any]], key: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """Déduplique des enregistrements bruts sur une clé déclarée, en flux"""
+    key_of = compile_projection(key).row
+    dedup = Deduplicator(key)
+    return (record for record in records if dedup.is_new(key_of(record)))
+
+
+def dedup_batch(batch: ColumnarBatch, key: Optional[Sequence[str]] = None) -> ColumnarBatch:
+    """Déduplique un lot colonnaire (ligne complète ou clé) via le vecteur de sélection"""
+    source = batch if key is None else batch.project(key)
+    dedup = Deduplicator(source.schema)
+    return batch.where([dedup.is_new(row) for row in source.rows()])
@@ -0,0 +1,355 @@
+"""
+Moteur de filtres compilé pour fetch_api_data
+
+`extracted_params["filters"]` est compilé une fois par run en un prédicat
+unique, évalué en une seule passe sur les enregistrements, ou en masques
+vectorisés (NumPy) quand les données sont un ColumnarBatch.
+
+Syntaxe (JSON émis par le LLM) :
+- égalité : {"userId": 1}  (la chaîne "1" correspond aussi au nombre 1)
+- opérateurs : {"id": {"gte": 5, "lt": 20}}, {"userId": {"in": [1, 2]}},
+  {"title": {"contains": "qui"}}, {"title": {"regex": "^sunt"}}
+- combinaisons : {"or": [{...}, {...}]}, {"and": [...]}, {"not": {...}}
+- chemins imbriqués : {"address.city": "Paris"} ou {"address": {"city": "Paris"}}
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from agent.columnar import ColumnarBatch
+from agent.projection import is_path, parse_path, resolve_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OPERATORS = ("eq", "ne", "gt", "gte", "lt", "lte", "in", "nin", "contains", "regex", "exists")
+RANGE_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+OPERATOR_ALIASES = {
+    "=": "eq", "==": "eq", "!=": "ne", "<>": "ne",
+    ">": "gt", ">=": "gte", "<": "lt", "<=": "lte",
+    "not_in": "nin", "notin": "nin", "icontains": "contains", "like": "contains",
+    "match": "regex", "regexp": "regex",
+}
+
+NUMERIC_PATTERN = re.compile(r"-?\d+(\.\d+)?")
+NUMBER_TYPES = (int, float)
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+# Documentation de la syntaxe injectée dans le prompt du LLM
+FILTER_SYNTAX_HELP = (
+    'filters est un objet JSON : {"userId": 1} pour une égalité, '
+    '{"id": {"gte": 5, "lt": 20}} pour un intervalle, {"userId": {"in": [1, 2]}} pour une liste, '
+    '{"title": {"contains": "qui"}} ou {"title": {"regex": "^sunt"}} pour du texte, '
+    'et {"or": [...]}, {"and": [...]}, {"not": {...}} pour combiner. '
+    "Opérateurs : " + ", ".join(OPERATORS) + ". "
+    "Utilise {} si la requête ne demande aucun filtre."
+)
+
+
+class FilterError(ValueError):
+    """Spécification de filtre invalide"""
+
+
+# =============================================================================
+# PARSING DE LA SPÉCIFICATION
+# =============================================================================
+
+class Comparison:
+    """Comparaison élémentaire `champ <op> constante`"""
+
+    __slots__ = ("field", "op", "value", "steps")
+
+    def __init__(self, field: str, op: str, value: Any):
+        self.field = field
+        self.op = op
+        self.value = value
+        self.steps = parse_path(field) if is_path(field) else None
+
+    @property
+    def root(self) -> Any:
+        return self.steps[0] if self.steps else self.field
+
+    def __repr__(self):
+        return f"Comparison({self.field!r}, {self.op!r}, {self.value!r})"
+
+
+# Un nœud est une Comparison ou un tuple ("and" | "or", enfants) / ("not", enfant)
+Node = Union[Comparison, tuple]
+
+
+def _operator(name: Any) -> Optional[str]:
+    name = str(name).strip().lower().lstrip("$")
+    name = OPERATOR_ALIASES.get(name, name)
+    return name if name in OPERATORS else None
+
+
+def _number(value: Any) -> Optional[Union[int, float]]:
+    """Forme numérique d'une chaîne ("3", "2.5"), sinon None"""
+    if isinstance(value, str) and NUMERIC_PATTERN.fullmatch(value.strip()):
+        value = value.strip()
+        return float(value) if "." in value else int(value)
+    return None
+
+
+def _literal(value: Any) -> Any:
+    if not isinstance(value, SCALAR_TYPES):
+        raise FilterError(f"Valeur de filtre non scalaire: {value!r}")
+    return value
+
+
+def _text_number(value: str) -> float:
+    """Valeur numérique d'un texte (NaN si non numérique : toute comparaison est fausse)"""
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def _candidates(value: Any) -> tuple:
+    """Valeurs acceptées pour une égalité (la chaîne et sa forme numérique)"""
+    value = _literal(value)
+    number = _number(value)
+    return (value,) if number is None else (value, number)
+
+
+def _comparison(field: str, op: str, value: Any) -> Comparison:
+    if op in ("eq", "ne"):
+        return Comparison(field, op, _candidates(value))
+    if op in ("in", "nin"):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        return Comparison(field, op, frozenset(c for v in values for c in _candidates(v)))
+    if op in RANGE_OPERATORS:
+        number = _number(value)
+        value = number if number is not None else _literal(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise FilterError(f"Borne invalide pour {field} {op}: {value!r}")
+        return Comparison(field, op, value)
+    if op == "contains":
+        return Comparison(field, op, str(_literal(value)).casefold())
+    if op == "regex":
+        try:
+            return Comparison(field, op, re.compile(str(value)))
+        except re.error as e:
+            raise FilterError(f"Expression régulière invalide pour {field}: {e}")
+    return Comparison(field, op, bool(value))
+
+
+def _combine(kind: str, children: Iterable[Optional[Node]]) -> Optional[Node]:
+    children = tuple(child for child in children if child is not None)
+    if not children:
+        return None
+    return children[0] if len(children) == 1 else (kind, children)
+
+
+def _field_clause(field: str, value: Any) -> Optional[Node]:
+    if isinstance(value, dict):
+        operators = [_operator(key) for key in value]
+        if all(operators):
+            return _combine("and", (_comparison(field, op, v) for op, v in zip(operators, value.values())))
+        if any(operators):
+            raise FilterError(f"Opérateur de filtre inconnu pour {field}: {list(value)}")
+        # Objet imbriqué : {"address": {"city": "Paris"}} -> address.city
+        return parse_filter({f"{field}.{key}": v for key, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return _comparison(field, "in", value)
+    return _comparison(field, "eq", value)
+
+
+def parse_filter(spec: Any) -> Optional[Node]:
+    """Convertit une spécification JSON en arbre de filtres (None si aucun filtre)"""
+    if spec is None:
+        return None
+    if isinstance(spec, list):
+        return _combine("and", (parse_filter(item) for item in spec))
+    if not isinstance(spec, dict):
+        raise FilterError(f"Spécification de filtre invalide: {spec!r}")
+
+    clauses = []
+    for key, value in spec.items():
+        name = str(key).strip().lower().lstrip("$")
+        if name in ("and", "or"):
+            if not isinstance(value, list):
+                raise FilterError(f"'{key}' attend une liste de filtres")
+            clauses.append(_combine(name, (parse_filter(item) for item in value)))
+        elif name == "not":
+            child = parse_filter(value)
+            clauses.append(None if child is None else ("not", child))
+        else:
+            clauses.append(_field_clause(str(key), value))
+    return _combine("and", clauses)
+
+
+def _unknown_fields(node: Node, known_fields: set, unknown: List[str]):
+    """Collecte les champs comparés absents de `known_fields` (sans modifier l'arbre)"""
+    if isinstance(node, Comparison):
+        if node.root not in known_fields and node.field not in unknown:
+            unknown.append(node.field)
+        return
+    kind, children = node
+    for child in (children,) if kind == "not" else children:
+        _unknown_fields(child, known_fields, unknown)
+
+
+# =============================================================================
+# COMPILATION
+# =============================================================================
+
+def _test_source(comparison: Comparison, name: str) -> str:
+    """Expression testant `{v}` (le premier `{v}` est toujours évalué en premier)"""
+    op = comparison.op
+    if op == "eq":
+        return f"{{v}} in {name}"
+    if op == "ne":
+        return f"{{v}} not in {name}"
+    if op == "in":
+        return f"type({{v}}) in _SCALARS and {{v}} in {name}"
+    if op == "nin":
+        return f"not (type({{v}}) in _SCALARS and {{v}} in {name})"
+    if op in RANGE_OPERATORS:
+        symbol = RANGE_OPERATORS[op]
+        if isinstance(comparison.value, str):
+            return f"type({{v}}) is str and {{v}} {symbol} {name}"
+        # Borne numérique : les nombres stockés en texte ("48.85") sont aussi comparés
+        return (f"(type({{v}}) in _NUMBERS and {{v}} {symbol} {name}"
+                f" or type({{v}}) is str and _number({{v}}) {symbol} {name})")
+    if op == "contains":
+        return f"type({{v}}) is str and {name} in {{v}}.casefold()"
+    if op == "regex":
+        return f"type({{v}}) is str and {name}.search({{v}}) is not None"
+    return "{v} is not None" if comparison.value else "{v} is None"
+
+
+class CompiledFilter:
+    """Prédicat compilé : `filter(item) -> bool`, `apply(data)`, `mask(batch)`"""
+
+    def __init__(self, node: Optional[Node], unknown: Sequence[str] = ()):
+        self.node = node
+        self.unknown = list(unknown)
+        self._namespace: Dict[str, Any] = {
+            "_SCALARS": SCALAR_TYPES, "_NUMBERS": NUMBER_TYPES, "_number": _text_number,
+            "_resolve": resolve_path,
+        }
+        self._tests: Dict[int, Callable[[Any], bool]] = {}
+        self._counter = 0
+        expression = self._render(node) if node is not None else "True"
+        source = f"def _predicate(item):\n    get = item.get\n    return {expression}\n"
+        exec(compile(source, "<filter>", "exec"), self._namespace)
+        self._predicate = self._namespace["_predicate"]
+
+    def _render(self, node: Node) -> str:
+        if not isinstance(node, Comparison):
+            kind, children = node
+            if kind == "not":
+                return f"not ({self._render(children)})"
+            return "(" + f" {kind} ".join(self._render(child) for child in children) + ")"
+
+        index = self._counter
+        self._counter += 1
+        name = f"_c{index}"
+        self._namespace[name] = node.value
+        template = _test_source(node, name)
+
+        # Test sur une valeur isolée (colonnes non vectorisables)
+        test_namespace = dict(self._namespace)
+        exec(f"def _test(v):\n    return {template.replace('{v}', 'v')}\n", test_namespace)
+        self._tests[id(node)] = test_namespace["_test"]
+
+        if node.steps is None:
+            accessor = f"get({node.field!r})"
+        else:
+            self._namespace[f"_s{index}"] = node.steps
+            accessor = f"_resolve(item, _s{index}, None)"
+        variable = f"_v{index}"
+        first = template.replace("{v}", f"({variable} := {accessor})", 1)
+        return "(" + first.replace("{v}", variable) + ")"
+
+    def __bool__(self) -> bool:
+        return self.node is not None
+
+    def __call__(self, item: Dict[str, Any]) -> bool:
+        return self._predicate(item)
+
+    def apply(self, data):
+        """Filtre une liste d'enregistrements ou un ColumnarBatch en une passe"""
+        if self.node is None:
+            return data
+        if isinstance(data, ColumnarBatch):
+            return data.where(self.mask(data))
+        return list(filter(self._predicate, data))
+
+    # ----- évaluation vectorisée -------------------------------------------
+
+    def mask(self, batch: ColumnarBatch):
+        """Masque booléen des lignes sélectionnées du lot"""
+        if self.node is None:
+            return np.ones(len(batch), dtype=bool) if np is not None else [True] * len(batch)
+        return self._mask(self.node, batch)
+
+    def _mask(self, node: Node, batch: ColumnarBatch):
+        if isinstance(node, Comparison):
+            return self._comparison_mask(node, batch)
+        kind, children = node
+        if kind == "not":
+            child = self._mask(children, batch)
+            return ~child if np is not None else [not value for value in child]
+        masks = [self._mask(child, batch) for child in children]
+        if np is not None:
+            combine = np.logical_and if kind == "and" else np.logical_or
+            return combine.reduce(masks)
+        reducer = all if kind == "and" else any
+        return [reducer(values) for values in zip(*masks)]
+
+    def _comparison_mask(self, node: Comparison, batch: ColumnarBatch):
+        if node.root not in batch.columns:
+            values = [None] * len(batch)
+        else:
+            values = batch.column(node.root)
+            if node.steps is not None:
+                rest = node.steps[1:]
+                values = [resolve_path(value, rest, None) for value in _python_values(values)]
+
+        if np is not None and isinstance(values, np.ndarray) and values.dtype.kind in "if":
+            vectorized = _numeric_mask(node, values)
+            if vectorized is not None:
+                return vectorized
+
+        test = self._tests[id(node)]
+        mask = [test(value) for value in _python_values(values)]
+        return np.fromiter(mask, dtype=bool, count=len(mask)) if np is not None else mask
+
+
+def _python_values(values) -> List[Any]:
+    return values if isinstance(values, list) else values.tolist()
+
+
+def _numeric_mask(node: Comparison, values):
+    """Masque NumPy pour une colonne numérique (None si non vectorisable)"""
+    op = node.op
+    if op in ("eq", "ne", "in", "nin"):
+        numbers = [c for c in node.value if type(c) in NUMBER_TYPES]
+        mask = np.isin(values, numbers) if numbers else np.zeros(len(values), dtype=bool)
+        return ~mask if op in ("ne", "nin") else mask
+    if op in RANGE_OPERATORS:
+        if isinstance(node.value, str):
+            return np.zeros(len(values), dtype=bool)
+        return {"gt": np.greater, "gte": np.greater_equal,
+                "lt": np.less, "lte": np.less_equal}[op](values, node.value)
+    if op == "exists":
+        return np.full(len(values), node.value, dtype=bool)
+    return None
+
+
+def compile_filter(spec: Any, known_fields: Optional[Iterable[str]] = None) -> CompiledFilter:
+    """Compile `extracted_params["filters"]` ; `known_fields` signale les champs inconnus
+
+    Les comparaisons sur des champs inconnus sont conservées (un champ absent
+    vaut None) : un filtre ne sélectionne jamais plus de lignes que demandé.
+    """
+    node = parse_filter(spec)
+    unknown: List[str] = []
+    if node is not None and known_fields is not None:
+        _unknown_fields(node, set(known_fields), unknown)
+    return CompiledFilter(node, unknown)
@@ -1,9 +1,16 @@
 import requests
 import os
-from typing import Dict, Any, List, Optional, Annotated
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Annotated, Union
 from typing_extensions import TypedDict
 import re
+import sqlite3
+import threading
+import uuid
+import contextlib
 from datetime import datetime
+from collections import deque
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
 
 # Chargement des variables d'environnement
 from dotenv import load_dotenv
@@ -13,8 +20,29 @@ load_dotenv()
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langgraph.graph import StateGraph, END, START
+from agent.matching import KeywordMatcher, tokenize
+from agent.projection import compile_projection, is_path
+from agent.columnar import ColumnarBatch
+from agent.filters import FILTER_SYNTAX_HELP, CompiledFilter, FilterError, compile_filter, parse_filter
+from agent.sorting import normalize_sort, pushdown_params, supports_pushdown, top_k
+from agent.joins import hash_join, normalize_joins, resolve_join_keys, resource_name, source_url
+from agent.aggregation import aggregate, normalize_aggregate, required_fields
+from agent.dedup import Deduplicator, dedup_batch, dedup_records, normalize_dedup_key
+from agent.schema import Schema, SchemaCache, infer_schema
+from agent.sheets import ChunkWriter, discard_sheet, provision_sheet
+from agent.sheet_pool import SheetPool
+from agent.background import TaskQueue
+from agent.jobs import JobQueue
+from agent.rate_limit import RateLimitedHttp, create_limiter, rate_limited_http_client
+from agent.streaming import run_pipeline
+from agent.jsonstream import iter_response_items
+from agent.http_cache import HTTPCache
+from agent.snapshots import Snapshot, SnapshotStore
+from agent.prefetch import AccessHistory, PrefetchBudget, PrefetchScheduler, filter_shape
+from agent import codec
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
@@ -22,6 +50,10 @@ from langchain_core.output_parsers import JsonOutputParser
 import gspread
 from google.oauth2.service_account import Credentials
 
+if TYPE_CHECKING:
+    # Importé à la demande (_create_checkpointer) : requiert une version récente de langgraph-checkpoint
+    from agent.checkpoints import SqliteCheckpointer
+
 # =============================================================================
 # CONFIGURATION DEPUIS .ENV AVEC VALEURS PAR DÉFAUT
 # =============================================================================
@@ -42,21 +74,102 @@ GOOGLE_PERSONAL_EMAIL = os.getenv("GOOGLE_PERSONAL_EMAIL")
 DEFAULT_API_URL = os.getenv("DEFAULT_API_URL", "https://jsonplaceholder.typicode.com/posts")
 API_TIMEOUT = int(os.getenv("API_TIMEOUT", "30"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+# Hôtes compatibles json-server (_sort/_order/_limit délégués à l'API)
+SORT_PUSHDOWN_HOSTS = [h.strip() for h in os.getenv("SORT_PUSHDOWN_HOSTS", "jsonplaceholder.typicode.com").split(",") if h.strip()]
+DEFAULT_SORT_FIELD = os.getenv("DEFAULT_SORT_FIELD", "id")
+
+# Schéma inféré des APIs (CONFIGURABLE - depuis .env avec défauts)
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "3600"))  # secondes
+SCHEMA_SAMPLE_SIZE = int(os.getenv("SCHEMA_SAMPLE_SIZE", "50"))
+
+# Cache HTTP disque des réponses upstream (CONFIGURABLE - depuis .env avec défauts)
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "./.cache/http")
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "256"))
+
+# Instantanés locaux indexés des collections (CONFIGURABLE - depuis .env avec défauts)
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "false").lower() == "true"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./.cache/snapshots")
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "300"))
+# Champs indexés (vide = tous les champs scalaires de premier niveau)
+SNAPSHOT_INDEX_FIELDS = [f.strip() for f in os.getenv("SNAPSHOT_INDEX_FIELDS", "").split(",") if f.strip()]
+
+# Préchargement prédictif des endpoints chauds (CONFIGURABLE - depuis .env avec défauts)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "60"))  # secondes entre deux passages
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "5"))  # cibles les plus chaudes considérées
+PREFETCH_MAX_MB_PER_HOUR = float(os.getenv("PREFETCH_MAX_MB_PER_HOUR", "100"))
+PREFETCH_MAX_REQUESTS_PER_MINUTE = int(os.getenv("PREFETCH_MAX_REQUESTS_PER_MINUTE", "10"))
+PREFETCH_HALF_LIFE = float(os.getenv("PREFETCH_HALF_LIFE", "86400"))  # demi-vie des fréquences (s)
+PREFETCH_HISTORY_PATH = os.getenv("PREFETCH_HISTORY_PATH", "./.cache/prefetch_history.json")
 
 # Limites métier (CONFIGURABLE - depuis .env avec défauts)
 DEFAULT_LIMIT = int(os.getenv("DEFAULT_LIMIT", "10"))
 MAX_LIMIT = int(os.getenv("MAX_LIMIT", "100"))
 MIN_LIMIT = int(os.getenv("MIN_LIMIT", "1"))
 
+# Export en flux au-delà de MAX_LIMIT (CONFIGURABLE - depuis .env avec défauts)
+LARGE_EXPORT_MAX_ROWS = int(os.getenv("LARGE_EXPORT_MAX_ROWS", "100000"))  # <= MAX_LIMIT désactive le mode
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "5000"))  # lignes par page upstream
+STREAM_FETCH_CONCURRENCY = int(os.getenv("STREAM_FETCH_CONCURRENCY", "4"))  # pages téléchargées en parallèle
+STREAM_WRITE_ROWS = int(os.getenv("STREAM_WRITE_ROWS", "20000"))  # lignes par appel append_rows
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "4"))  # blocs en attente entre deux étages
+
+# Représentation colonnaire des données (CONFIGURABLE - depuis .env avec défauts)
+COLUMNAR_MODE = os.getenv("COLUMNAR_MODE", "false").lower() == "true"
+
+# Déduplication des lignes (CONFIGURABLE - depuis .env avec défauts)
+DEDUP_ROWS = os.getenv("DEDUP_ROWS", "false").lower() == "true"
+DEDUP_KEY = os.getenv("DEDUP_KEY", "")  # champs séparés par des virgules, vide = ligne complète
+
 # Google Sheets (CONFIGURABLE - depuis .env avec défauts)
 SHEETS_FOLDER_NAME = os.getenv("SHEETS_FOLDER_NAME", "API_Data_Exports")
 SHEETS_SHARE_PUBLICLY = os.getenv("SHEETS_SHARE_PUBLICLY", "false").lower() == "true"
 SHEETS_DEFAULT_TITLE_PREFIX = os.getenv("SHEETS_DEFAULT_TITLE_PREFIX", "API_Data")
+# Dossier, création et partage du sheet en parallèle de fetch + process
+PARALLEL_PROVISIONING = os.getenv("PARALLEL_PROVISIONING", "true").lower() == "true"
+
+# Partages et droits post-création en arrière-plan (CONFIGURABLE - depuis .env avec défauts)
+BACKGROUND_SHARING = os.getenv("BACKGROUND_SHARING", "true").lower() == "true"
+BACKGROUND_TASK_WORKERS = int(os.getenv("BACKGROUND_TASK_WORKERS", "2"))
+BACKGROUND_TASK_MAX_ATTEMPTS = int(os.getenv("BACKGROUND_TASK_MAX_ATTEMPTS", "5"))
+BACKGROUND_TASK_DRAIN_SECONDS = float(os.getenv("BACKGROUND_TASK_DRAIN_SECONDS", "30"))  # attente à la sortie
+
+# Quotas Google du compte de service, partagés par tous les runs (CONFIGURABLE - depuis .env avec défauts)
+GOOGLE_RATE_LIMIT = os.getenv("GOOGLE_RATE_LIMIT", "true").lower() == "true"
+SHEETS_READS_PER_MINUTE = float(os.getenv("SHEETS_READS_PER_MINUTE", "60"))  # 0 = illimité
+SHEETS_WRITES_PER_MINUTE = float(os.getenv("SHEETS_WRITES_PER_MINUTE", "60"))
+DRIVE_REQUESTS_PER_MINUTE = float(os.getenv("DRIVE_REQUESTS_PER_MINUTE", "600"))
+GOOGLE_QUOTA_BURST = float(os.getenv("GOOGLE_QUOTA_BURST", "10"))  # requêtes d'avance par seau
+GOOGLE_QUOTA_DB = os.getenv("GOOGLE_QUOTA_DB", "")  # base SQLite partagée entre processus, vide = par processus
+GOOGLE_QUOTA_MAX_ATTEMPTS = int(os.getenv("GOOGLE_QUOTA_MAX_ATTEMPTS", "5"))  # essais sur 429 / 5xx
+
+# Pool de sheets pré-provisionnés (CONFIGURABLE - depuis .env avec défauts)
+SHEET_POOL_SIZE = int(os.getenv("SHEET_POOL_SIZE", "0"))  # 0 = désactivé
+SHEET_POOL_LEDGER = os.getenv("SHEET_POOL_LEDGER", "./.cache/sheet_pool.json")
+SHEET_POOL_MAX_AGE_HOURS = float(os.getenv("SHEET_POOL_MAX_AGE_HOURS", "168"))  # sheets prêts renouvelés au-delà
+
+# File persistante des exports asynchrones (CONFIGURABLE - depuis .env avec défauts)
+JOBS_DB = os.getenv("JOBS_DB", "./.cache/jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # exports exécutés en parallèle
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # prises d'un job interrompu par l'arrêt du processus
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # job repris si son processus ne donne plus signe de vie
+
+# Points de reprise des runs (CONFIGURABLE - depuis .env avec défauts)
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "true").lower() == "true"
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "./.cache/checkpoints.sqlite")
+CHECKPOINT_RETENTION_HOURS = float(os.getenv("CHECKPOINT_RETENTION_HOURS", "72"))  # runs purgés au-delà
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "4096"))  # valeurs compressées au-delà
 
 # Debug et logging (CONFIGURABLE - depuis .env avec défauts)
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+# Record/replay des runs (CONFIGURABLE - depuis .env avec défauts)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()  # off | record | replay
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "./cassettes/last_run.json")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+
 # LangGraph Studio Configuration (CONFIGURABLE - depuis .env avec défauts)
 BG_JOB_ISOLATED_LOOPS = os.getenv("BG_JOB_ISOLATED_LOOPS", "true").lower() == "true"
 LANGGRAPH_STUDIO_DEBUG = os.getenv("LANGGRAPH_STUDIO_DEBUG", "true").lower() == "true"
@@ -172,10 +285,10 @@ else:
 # CONFIGURATION TECHNIQUE (CONSTANTES - RESTE DANS LE CODE)
 # =============================================================================
 
-# Champs API disponibles (LOGIQUE MÉTIER - dans le code)
+# Champs par défaut quand le schéma de l'API n'a pas pu être inféré (posts JSONPlaceholder)
 VALID_API_FIELDS = ["userId", "id", "title", "body"]
 
-# Mots-clés pour le parsing (LOGIQUE MÉTIER - dans le code)
+# Mots-clés pour le parsing (LOGIQUE MÉTIER - dans le code) ; alias des champs du schéma
 FIELD_KEYWORDS = {
     "title": ["title", "titre"],
     "id": ["id", "identifiant"],
@@ -185,6 +298,61 @@ FIELD_KEYWORDS = {
 
 RESTRICTION_KEYWORDS = ["avec", "seulement", "uniquement", "juste"]
 
+# Mots-clés d'export complet (mode flux, jusqu'à LARGE_EXPORT_MAX_ROWS lignes)
+LARGE_EXPORT_KEYWORDS = ["export complet", "toutes les lignes", "full export", "all rows"]
+
+# Mots-clés de tri ("les 10 derniers posts", "top 5 par id")
+LATEST_KEYWORDS = ["dernier", "plus recent", "latest", "last", "newest"]
+OLDEST_KEYWORDS = ["premier", "plus ancien", "oldest", "first"]
+TOP_KEYWORDS = ["top", "meilleur", "plus grand"]
+SORT_BY_PATTERN = r'\b(?:par|by)\s+(\w+)'
+
+# Relations entre ressources : (principale, jointe) -> (clé gauche, clé droite)
+KNOWN_RELATIONS = {
+    ("posts", "users"): ("userId", "id"),
+    ("albums", "users"): ("userId", "id"),
+    ("todos", "users"): ("userId", "id"),
+    ("comments", "posts"): ("postId", "id"),
+    ("photos", "albums"): ("albumId", "id"),
+    ("posts", "comments"): ("id", "postId"),
+}
+
+# Mots-clés déclenchant une jointure et champs joints ajoutés par défaut
+JOIN_KEYWORDS = {"users": ["auteur", "author", "email", "ecrivain"]}
+JOIN_DEFAULT_FIELDS = {"users": ["users.name", "users.email"]}
+
+# Mots-clés d'agrégation ("nombre de posts par utilisateur")
+AGGREGATE_KEYWORDS = {
+    "count": ["nombre", "combien", "count", "how many"],
+    "count_distinct": ["distinct", "different", "unique"],
+    "sum": ["somme", "sum"],
+    "avg": ["moyenne", "average"],
+    "min": ["minimum"],
+    "max": ["maximum"],
+}
+
+# Matcher compilé une seule fois, partagé par la validation et le fallback
+# (les groupes techniques commencent par "_" et ne sont pas des champs)
+RESTRICTION_GROUP = "_restriction"
+LATEST_GROUP = "_latest"
+OLDEST_GROUP = "_oldest"
+TOP_GROUP = "_top"
+LARGE_EXPORT_GROUP = "_large_export"
+QUERY_MATCHER = (
+    KeywordMatcher(FIELD_KEYWORDS)
+    .add(RESTRICTION_GROUP, RESTRICTION_KEYWORDS, prefix=True)
+    .add(LATEST_GROUP, LATEST_KEYWORDS, prefix=True)
+    .add(OLDEST_GROUP, OLDEST_KEYWORDS, prefix=True)
+    .add(TOP_GROUP, TOP_KEYWORDS, prefix=True)
+    .add(LARGE_EXPORT_GROUP, LARGE_EXPORT_KEYWORDS)
+)
+JOIN_GROUP_PREFIX = "_join_"
+for _resource, _keywords in JOIN_KEYWORDS.items():
+    QUERY_MATCHER.add(f"{JOIN_GROUP_PREFIX}{_resource}", _keywords, prefix=True)
+AGGREGATE_GROUP_PREFIX = "_agg_"
+for _op, _keywords in AGGREGATE_KEYWORDS.items():
+    QUERY_MATCHER.add(f"{AGGREGATE_GROUP_PREFIX}{_op}", _keywords, prefix=True)
+
 # Google Sheets Scopes (TECHNIQUE - dans le code)
 GOOGLE_SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
@@ -218,13 +386,23 @@ env_valid = validate_environment()
 # ÉTAT TYPÉ POUR LANGGRAPH
 # =============================================================================
 
+def _merge_provisioned(current: Optional[Dict[str, Any]], update: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Réducteur de `provisioned` : seule la branche de provisioning l'écrit, les autres
+    nœuds (qui renvoient l'état complet, éventuellement pendant la même étape) le recopient"""
+    return update if update is not None else current
+
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], "The messages in the conversation"]
     api_url: str
     user_query: str
     extracted_params: Optional[Dict[str, Any]]
-    api_data: Optional[List[Dict]]
-    processed_data: Optional[List[Dict]]
+    api_data: Optional[Union[List[Dict], ColumnarBatch]]
+    processed_data: Optional[Union[List[tuple], ColumnarBatch]]
+    sheet_headers: Optional[List[str]]
+    join_data: Optional[Dict[str, Dict[str, Any]]]
+    rows_exported: Optional[int]
+    provisioned: Annotated[Optional[Dict[str, Any]], _merge_provisioned]
+    run_id: str
     sheets_url: str
     error: str
 
@@ -232,6 +410,16 @@ class AgentState(TypedDict):
 # CONFIGURATION GOOGLE SHEETS
 # =============================================================================
 
+# Limiteur de débit des requêtes Sheets / Drive (partagé par gc, Drive, pool et tâches d'arrière-plan)
+GOOGLE_LIMITER = create_limiter(
+    SHEETS_READS_PER_MINUTE, SHEETS_WRITES_PER_MINUTE, DRIVE_REQUESTS_PER_MINUTE, burst=GOOGLE_QUOTA_BURST,
+    path=GOOGLE_QUOTA_DB or None, max_attempts=GOOGLE_QUOTA_MAX_ATTEMPTS, log=lambda message: log_debug(message)
+) if GOOGLE_RATE_LIMIT else None
+
+def google_throttling():
+    """Compteurs des attentes de quota Google du nœud courant (vides sans limiteur)"""
+    return GOOGLE_LIMITER.tracking() if GOOGLE_LIMITER is not None else contextlib.nullcontext({})
+
 def setup_google_sheets():
     """Configuration de l'accès Google Sheets"""
     try:
@@ -242,6 +430,8 @@ def setup_google_sheets():
         creds = Credentials.from_service_account_file(
             GOOGLE_CREDENTIALS_PATH, scopes=GOOGLE_SCOPES
         )
+        if GOOGLE_LIMITER is not None:
+            return gspread.authorize(creds, http_client=rate_limited_http_client(GOOGLE_LIMITER))
         return gspread.authorize(creds)
     except Exception as e:
         print(f"⚠️ Erreur configuration Google Sheets: {e}")
@@ -249,6 +439,23 @@ def setup_google_sheets():
 
 gc = setup_google_sheets()
 
+def setup_drive_service():
+    """Configuration du service Google Drive API (lève une exception si indisponible)"""
+    from googleapiclient.discovery import build
+    
+    log_debug(f"Chargement des credentials depuis: {GOOGLE_CREDENTIALS_PATH}")
+    
+    # Créer les credentials avec les scopes Drive
+    creds = Credentials.from_service_account_file(
+        GOOGLE_CREDENTIALS_PATH, 
+        scopes=GOOGLE_SCOPES
+    )
+    if GOOGLE_LIMITER is not None:
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.http import build_http
+        return build('drive', 'v3', http=RateLimitedHttp(AuthorizedHttp(creds, http=build_http()), GOOGLE_LIMITER))
+    return build('drive', 'v3', credentials=creds)
+
 # =============================================================================
 # FONCTIONS UTILITAIRES
 # =============================================================================
@@ -258,6 +465,26 @@ def log_debug(message: str):
     if DEBUG:
         print(f"🔍 DEBUG: {message}")
 
+def _create_http_cache() -> Optional[HTTPCache]:
+    if not HTTP_CACHE_ENABLED:
+        return None
+    try:
+        return HTTPCache(HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024)
+    except OSError as cache_error:
+        log_debug(f"⚠️ Cache HTTP désactivé ({HTTP_CACHE_DIR}): {cache_error}")
+        return None
+
+HTTP_CACHE = _create_http_cache()
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """Point d'entrée unique des requêtes HTTP upstream (substitué en record/replay)
+
+    Passe par le cache disque (revalidation ETag / Last-Modified) s'il est actif.
+    """
+    if HTTP_CACHE is not None:
+        return HTTP_CACHE.get(url, requests.get, **kwargs)
+    return requests.get(url, **kwargs)
+
 def ensure_state_keys(state: AgentState) -> AgentState:
     """S'assurer que toutes les clés nécessaires sont présentes dans l'état"""
     default_state = {
@@ -267,6 +494,11 @@ def ensure_state_keys(state: AgentState) -> AgentState:
         "extracted_params": None,
         "api_data": None,
         "processed_data": None,
+        "sheet_headers": None,
+        "join_data": None,
+        "rows_exported": None,
+        "provisioned": None,
+        "run_id": "",
         "sheets_url": "",
         "error": ""
     }
@@ -281,8 +513,139 @@ def ensure_state_keys(state: AgentState) -> AgentState:
 # FONCTIONS PRINCIPALES (DÉFINIES AVANT build_graph)
 # =============================================================================
 
-def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[str, Any]:
-    """Valide et corrige AGRESSIVEMENT les paramètres extraits"""
+# =============================================================================
+# INSTANTANÉS LOCAUX
+# =============================================================================
+
+def _create_snapshot_store() -> Optional[SnapshotStore]:
+    if not SNAPSHOTS_ENABLED:
+        return None
+    try:
+        return SnapshotStore(SNAPSHOT_DIR, ttl=SNAPSHOT_REFRESH_SECONDS)
+    except OSError as store_error:
+        log_debug(f"⚠️ Instantanés désactivés ({SNAPSHOT_DIR}): {store_error}")
+        return None
+
+SNAPSHOT_STORE = _create_snapshot_store()
+
+def _fetch_collection(api_url: str) -> List[Any]:
+    """Collection complète (sans pagination ni filtre) pour matérialiser un instantané"""
+    log_debug(f"📦 Construction de l'instantané: {api_url}")
+    response = http_get(api_url, timeout=API_TIMEOUT, stream=True)
+    response.raise_for_status()
+    return list(iter_response_items(response, incremental=False))
+
+def load_snapshot(api_url: str) -> Optional[Snapshot]:
+    """Instantané indexé de la collection (reconstruit au-delà de SNAPSHOT_REFRESH_SECONDS)"""
+    if SNAPSHOT_STORE is None:
+        return None
+    try:
+        return SNAPSHOT_STORE.get_or_build(api_url, lambda: _fetch_collection(api_url),
+                                           SNAPSHOT_INDEX_FIELDS or None)
+    except Exception as snapshot_error:
+        log_debug(f"⚠️ Instantané indisponible pour {api_url}, appel upstream: {snapshot_error}")
+        return None
+
+# =============================================================================
+# PRÉCHARGEMENT PRÉDICTIF
+# =============================================================================
+
+def create_prefetcher(history_path: Optional[str] = PREFETCH_HISTORY_PATH,
+                      interval: float = PREFETCH_INTERVAL) -> PrefetchScheduler:
+    """Planificateur qui garde les cibles chaudes de l'historique fraîches dans le cache local
+
+    Une cible HTTP est revalidée avant expiration et rendue fraîche jusqu'au
+    passage suivant (les données servies ont au plus ~2 intervalles) ; un
+    instantané est reconstruit avant d'atteindre SNAPSHOT_REFRESH_SECONDS.
+    """
+    lead = 1.5 * interval
+
+    def due(target: Dict[str, Any]) -> bool:
+        if target["kind"] == "snapshot":
+            if SNAPSHOT_STORE is None:
+                return False
+            snapshot = SNAPSHOT_STORE.get(target["url"], allow_stale=True)
+            return snapshot is None or snapshot.age > SNAPSHOT_STORE.ttl - lead
+        if HTTP_CACHE is None:
+            return False
+        remaining = HTTP_CACHE.expires_in(target["url"], target.get("params") or None)
+        return remaining is None or remaining < lead
+
+    def refresh(target: Dict[str, Any]) -> Optional[int]:
+        if target["kind"] == "snapshot":
+            snapshot = SNAPSHOT_STORE.refresh(target["url"], lambda: _fetch_collection(target["url"]),
+                                              SNAPSHOT_INDEX_FIELDS or None)
+            return snapshot.header["sections"]["records"][1]
+        response = HTTP_CACHE.get(target["url"], requests.get, params=target.get("params") or None,
+                                  timeout=API_TIMEOUT, min_fresh=2 * interval)
+        response.raise_for_status()
+        status = response.headers.get("X-Cache")
+        if status is None:
+            # Réponse non cacheable : rien à précharger
+            return None
+        return len(response.content) if status == "MISS" else 0
+
+    budget = PrefetchBudget(int(PREFETCH_MAX_MB_PER_HOUR * 1024 * 1024), PREFETCH_MAX_REQUESTS_PER_MINUTE)
+    return PrefetchScheduler(AccessHistory(history_path, half_life=PREFETCH_HALF_LIFE), due, refresh, budget,
+                             interval=interval, top_n=PREFETCH_TOP_N, log=log_debug)
+
+PREFETCHER = create_prefetcher().start() if PREFETCH_ENABLED else None
+
+def record_access(api_url: str, params: Optional[Dict[str, Any]], filters: Any = None, snapshot: bool = False):
+    """Enregistre une récupération dans l'historique du préchargement (URL + forme des filtres)"""
+    if PREFETCHER is None:
+        return
+    target = {"kind": "snapshot", "url": api_url} if snapshot else {"kind": "http", "url": api_url,
+                                                                    "params": params or {}}
+    PREFETCHER.history.record(target, filter_shape(filters) if filters else "")
+
+# =============================================================================
+# SCHÉMA DES APIS
+# =============================================================================
+
+SCHEMA_CACHE = SchemaCache(ttl=SCHEMA_CACHE_TTL)
+
+def _sample_records(api_url: str) -> List[Any]:
+    """Premier échantillon de l'API pour l'inférence du schéma"""
+    params = {"_limit": SCHEMA_SAMPLE_SIZE} if supports_pushdown(api_url, SORT_PUSHDOWN_HOSTS) else None
+    response = http_get(api_url, params=params, timeout=API_TIMEOUT, stream=True)
+    response.raise_for_status()
+    items = iter_response_items(response)
+    try:
+        return list(islice(items, SCHEMA_SAMPLE_SIZE))
+    finally:
+        items.close()
+
+def load_api_schema(api_url: str) -> Optional[Schema]:
+    """Schéma de l'API (cache par URL, inféré sur la première page si absent ou expiré)"""
+    try:
+        schema = SCHEMA_CACHE.get(api_url)
+        if schema is None:
+            log_debug(f"🔎 Inférence du schéma: {api_url}")
+            schema = SCHEMA_CACHE.get_or_infer(api_url, lambda: _sample_records(api_url), SCHEMA_SAMPLE_SIZE)
+        return schema if schema.fields else None
+    except Exception as schema_error:
+        log_debug(f"⚠️ Schéma indisponible pour {api_url}, champs par défaut: {schema_error}")
+        return None
+
+def available_fields(schema: Optional[Schema] = None) -> List[str]:
+    """Champs exportés par défaut : ceux du schéma, sinon VALID_API_FIELDS"""
+    return schema.default_fields() if schema else VALID_API_FIELDS[:]
+
+def match_fields(text: Union[str, List[str]], schema: Optional[Schema] = None, loose: bool = False) -> List[str]:
+    """Champs cités dans un texte ou ses tokens (noms du schéma et alias de FIELD_KEYWORDS)"""
+    matcher = schema.matcher(FIELD_KEYWORDS) if schema else QUERY_MATCHER
+    return [group for group in matcher.match(text, loose=loose) if not group.startswith("_")]
+
+def extract_by_fields(user_query: str, schema: Optional[Schema] = None) -> List[str]:
+    """Champs cités après "par" / "by" ("top 5 par id", "nombre de posts par utilisateur")"""
+    by_match = re.search(SORT_BY_PATTERN, user_query.lower())
+    if not by_match:
+        return []
+    return match_fields(by_match.group(1), schema)
+
+def validate_extracted_params(params: Dict[str, Any], user_query: str, schema: Optional[Schema] = None) -> Dict[str, Any]:
+    """Valide et corrige AGRESSIVEMENT les paramètres extraits (champs vérifiés contre le schéma)"""
     
     # ✅ CORRECTION : Pas de timeout
     trace_context = create_trace_context(
@@ -303,14 +666,29 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
                 log_debug(f"Params invalide (type: {type(params)}), création d'un nouveau dict")
                 params = {}
             
-            # 1. VALIDATION DU LIMIT
+            # Mots-clés de la requête (champs, restriction, tri) détectés en une passe
+            # (requête normalisée une seule fois pour tous les matchers)
+            query_tokens = tokenize(user_query)
+            matches = QUERY_MATCHER.match(query_tokens)
+            
+            # 1. VALIDATION DU LIMIT (au-delà de MAX_LIMIT : export en flux)
+            params["large_export"] = False
+            large_export_enabled = LARGE_EXPORT_MAX_ROWS > MAX_LIMIT
             try:
                 numbers = re.findall(NUMBER_EXTRACTION_PATTERN, user_query)
                 if numbers:
                     limit = int(numbers[0])
-                    limit = max(MIN_LIMIT, min(limit, MAX_LIMIT))
+                    if limit > MAX_LIMIT and large_export_enabled:
+                        params["large_export"] = True
+                        limit = min(limit, LARGE_EXPORT_MAX_ROWS)
+                    else:
+                        limit = max(MIN_LIMIT, min(limit, MAX_LIMIT))
                     params["limit"] = limit
                     log_debug(f"Limite corrigée: {params['limit']}")
+                elif LARGE_EXPORT_GROUP in matches and large_export_enabled:
+                    params["large_export"] = True
+                    params["limit"] = LARGE_EXPORT_MAX_ROWS
+                    log_debug(f"Export complet demandé: jusqu'à {params['limit']} lignes")
                 elif "limit" not in params or not isinstance(params.get("limit"), int) or params.get("limit", 0) <= 0:
                     params["limit"] = DEFAULT_LIMIT
                     log_debug(f"Limite par défaut: {params['limit']}")
@@ -319,40 +697,124 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
                 params["limit"] = DEFAULT_LIMIT
             
             # 2. VALIDATION DES FIELDS
+            default_fields = available_fields(schema)
+            is_known_field = schema.has if schema else VALID_API_FIELDS.__contains__
             try:
-                mentioned_fields = []
-                for field, keywords in FIELD_KEYWORDS.items():
-                    if any(f" {keyword} " in f" {user_query_lower} " or 
-                           user_query_lower.startswith(keyword + " ") or 
-                           user_query_lower.endswith(" " + keyword) for keyword in keywords):
-                        mentioned_fields.append(field)
+                # Les chemins imbriqués explicites (address.geo.lat) sont toujours conservés
+                requested_paths = []
+                if isinstance(params.get("fields"), list):
+                    requested_paths = [f for f in params["fields"] if isinstance(f, str) and is_path(f)]
                 
-                has_restriction_keywords = any(word in user_query_lower for word in RESTRICTION_KEYWORDS)
+                if schema:
+                    mentioned_fields = match_fields(query_tokens, schema)
+                else:
+                    mentioned_fields = [group for group in matches if not group.startswith("_")]
+                has_restriction_keywords = RESTRICTION_GROUP in matches
                 
                 if mentioned_fields and has_restriction_keywords:
                     params["fields"] = mentioned_fields
                 elif not mentioned_fields:
-                    params["fields"] = VALID_API_FIELDS[:]
+                    params["fields"] = default_fields[:]
                 else:
                     if "fields" not in params or not isinstance(params.get("fields"), list):
-                        params["fields"] = VALID_API_FIELDS[:]
+                        params["fields"] = default_fields[:]
                     else:
-                        params["fields"] = [field for field in params["fields"] if field in VALID_API_FIELDS]
+                        params["fields"] = [field for field in params["fields"] if is_known_field(field)]
                         if not params["fields"]:
-                            params["fields"] = VALID_API_FIELDS[:]
+                            params["fields"] = default_fields[:]
+                
+                params["fields"] += [path for path in requested_paths if path not in params["fields"]]
             except Exception as fields_error:
                 log_debug(f"Erreur validation fields: {fields_error}")
-                params["fields"] = VALID_API_FIELDS[:]
+                params["fields"] = default_fields[:]
             
             # 3. VALIDATION DES FILTERS
             try:
-                if "filters" not in params or not isinstance(params.get("filters"), dict):
+                if "filters" not in params or not isinstance(params.get("filters"), (dict, list)):
                     params["filters"] = {}
+                else:
+                    parse_filter(params["filters"])
+            except FilterError as filters_error:
+                log_debug(f"⚠️ Filtres invalides ignorés: {filters_error}")
+                params["filters"] = {}
             except Exception as filters_error:
                 log_debug(f"Erreur validation filters: {filters_error}")
                 params["filters"] = {}
             
-            # 4. VALIDATION DE LA DESCRIPTION
+            # 4. VALIDATION DU TRI
+            try:
+                sort_spec = params.get("sort") or params.get("sort_by") or params.get("order_by")
+                try:
+                    params["sort"] = normalize_sort(sort_spec)
+                except ValueError as sort_error:
+                    log_debug(f"⚠️ Tri invalide ignoré: {sort_error}")
+                    params["sort"] = None
+                
+                if not params["sort"] and {TOP_GROUP, LATEST_GROUP, OLDEST_GROUP}.intersection(matches):
+                    by_fields = extract_by_fields(user_query, schema)
+                    sort_field = by_fields[0] if by_fields else DEFAULT_SORT_FIELD
+                    if TOP_GROUP in matches and by_fields or LATEST_GROUP in matches:
+                        params["sort"] = {"field": sort_field, "order": "desc"}
+                    elif OLDEST_GROUP in matches:
+                        params["sort"] = {"field": sort_field, "order": "asc"}
+                    if params["sort"]:
+                        log_debug(f"Tri déduit de la requête: {params['sort']}")
+            except Exception as sort_error:
+                log_debug(f"Erreur validation sort: {sort_error}")
+                params["sort"] = None
+            
+            # 5. VALIDATION DES JOINTURES
+            try:
+                try:
+                    params["joins"] = normalize_joins(params.get("joins"))
+                except ValueError as joins_error:
+                    log_debug(f"⚠️ Jointures invalides ignorées: {joins_error}")
+                    params["joins"] = []
+                
+                if not params["joins"]:
+                    params["joins"] = [
+                        {"resource": group[len(JOIN_GROUP_PREFIX):], "left_on": None, "right_on": None}
+                        for group in matches if group.startswith(JOIN_GROUP_PREFIX)
+                    ]
+                
+                # Champs joints par défaut si aucun chemin vers la source n'est demandé
+                for join in params["joins"]:
+                    prefix = f"{join['resource']}."
+                    if not any(field.startswith(prefix) for field in params["fields"]):
+                        params["fields"] += JOIN_DEFAULT_FIELDS.get(join["resource"], [])
+            except Exception as joins_error:
+                log_debug(f"Erreur validation joins: {joins_error}")
+                params["joins"] = []
+            
+            # 6. VALIDATION DE L'AGRÉGATION
+            try:
+                try:
+                    params["aggregate"] = normalize_aggregate(params.get("aggregate"))
+                except ValueError as aggregate_error:
+                    log_debug(f"⚠️ Agrégation invalide ignorée: {aggregate_error}")
+                    params["aggregate"] = None
+                
+                ops = [group[len(AGGREGATE_GROUP_PREFIX):] for group in matches if group.startswith(AGGREGATE_GROUP_PREFIX)]
+                if not params["aggregate"] and ops:
+                    group_by = extract_by_fields(user_query, schema)
+                    metric_fields = [field for field in match_fields(query_tokens, schema, loose=True) if field not in group_by]
+                    metrics = [{"op": op, "field": metric_fields[0]} for op in ops if op != "count"] if metric_fields else []
+                    if "count" in ops and not any(metric["op"] == "count_distinct" for metric in metrics):
+                        metrics.insert(0, {"op": "count"})
+                    if metrics and (group_by or "count" in ops):
+                        params["aggregate"] = normalize_aggregate({"group_by": group_by, "metrics": metrics})
+                        log_debug(f"Agrégation déduite de la requête: {params['aggregate']}")
+                
+                if params["aggregate"]:
+                    # Seuls les champs utiles sont projetés ; la limite porte sur les groupes
+                    params["fields"] = required_fields(params["aggregate"])
+                    if not re.findall(NUMBER_EXTRACTION_PATTERN, user_query):
+                        params["limit"] = MAX_LIMIT
+            except Exception as aggregate_error:
+                log_debug(f"Erreur validation aggregate: {aggregate_error}")
+                params["aggregate"] = None
+            
+            # 7. VALIDATION DE LA DESCRIPTION
             try:
                 if "description" not in params or not isinstance(params.get("description"), str):
                     params["description"] = f"Récupération de {params['limit']} posts avec les champs {', '.join(params['fields'])}"
@@ -370,8 +832,12 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
         # En cas d'erreur, retourner des paramètres par défaut valides
         fallback_params = {
             "limit": DEFAULT_LIMIT,
-            "fields": VALID_API_FIELDS[:],
+            "fields": available_fields(schema),
             "filters": {},
+            "sort": None,
+            "joins": [],
+            "aggregate": None,
+            "large_export": False,
             "description": f"Paramètres par défaut suite à une erreur de validation"
         }
         log_debug(f"Retour de paramètres fallback: {fallback_params}")
@@ -422,10 +888,22 @@ def parse_user_query(state: AgentState) -> AgentState:
                 log_debug(f"=== FIN PARSE_USER_QUERY (requête vide) ===")
                 return state
             
+            # Schéma de l'API cible (en cache après le premier run sur cette URL)
+            schema = load_api_schema(state.get("api_url") or DEFAULT_API_URL)
+            
             prompt = ChatPromptTemplate.from_template(
                 "Analyse la requête utilisateur et génère un JSON structuré pour requête API.\n"
                 "Requête: {user_query}\n"
-                "Réponds uniquement avec le JSON contenant les clés: limit, fields, filters, description."
+                "Réponds uniquement avec le JSON contenant les clés: limit, fields, filters, sort, joins, aggregate, description.\n"
+                "Champs disponibles: {available_fields}\n"
+                + FILTER_SYNTAX_HELP.replace("{", "{{").replace("}", "}}") + "\n"
+                "sort vaut {{\"field\": \"id\", \"order\": \"desc\"}} pour un tri "
+                "(\"les derniers\" = id desc, \"top N par champ\" = champ desc), ou null sans tri.\n"
+                "joins vaut [{{\"resource\": \"users\"}}] pour enrichir avec une ressource liée "
+                "(ex: l'auteur des posts, champs \"users.name\", \"users.email\"), sinon [].\n"
+                "aggregate vaut {{\"group_by\": [\"userId\"], \"metrics\": [{{\"op\": \"count\"}}, "
+                "{{\"op\": \"avg\", \"field\": \"id\"}}]}} pour une synthèse "
+                "(ops: count, count_distinct, sum, avg, min, max), ou null pour exporter les lignes."
             )
 
             parser = JsonOutputParser()
@@ -433,11 +911,11 @@ def parse_user_query(state: AgentState) -> AgentState:
             chain = prompt | llm | parser
 
             log_debug("⚡ Appel du LLM pour parsing de la requête utilisateur")
-            params = chain.invoke({"user_query": user_query})
+            params = chain.invoke({"user_query": user_query, "available_fields": ", ".join(available_fields(schema))})
             
             # Validation et nettoyage des paramètres
             log_debug("Début validation des paramètres")
-            validated_params = validate_extracted_params(params, user_query)
+            validated_params = validate_extracted_params(params, user_query, schema)
             log_debug("Fin validation des paramètres")
             
             state["extracted_params"] = validated_params
@@ -464,8 +942,9 @@ def parse_user_query(state: AgentState) -> AgentState:
         # Essayer de créer des paramètres fallback même en cas d'erreur
         try:
             log_debug("Tentative de création de paramètres fallback d'urgence")
-            params = create_fallback_params(user_query if 'user_query' in locals() else "récupérer des posts")
-            validated_params = validate_extracted_params(params, user_query if 'user_query' in locals() else "")
+            schema = locals().get("schema")
+            params = create_fallback_params(user_query if 'user_query' in locals() else "récupérer des posts", schema)
+            validated_params = validate_extracted_params(params, user_query if 'user_query' in locals() else "", schema)
             state["extracted_params"] = validated_params
             state["user_query"] = user_query if 'user_query' in locals() else ""
             log_debug(f"Paramètres fallback d'urgence créés: {validated_params}")
@@ -484,7 +963,7 @@ def parse_user_query(state: AgentState) -> AgentState:
     
     return state
 
-def create_fallback_params(user_query: str) -> Dict[str, Any]:
+def create_fallback_params(user_query: str, schema: Optional[Schema] = None) -> Dict[str, Any]:
     """Crée des paramètres par défaut basés sur une analyse simple de la requête"""
     
     log_debug(f"Création de paramètres fallback pour: '{user_query}'")
@@ -495,21 +974,20 @@ def create_fallback_params(user_query: str) -> Dict[str, Any]:
         limit = int(numbers[0]) if numbers else DEFAULT_LIMIT
         limit = max(MIN_LIMIT, min(limit, MAX_LIMIT))
         
-        # Analyse simple pour les champs
-        user_query_lower = user_query.lower()
-        mentioned_fields = []
-        
-        for field, keywords in FIELD_KEYWORDS.items():
-            if any(keyword in user_query_lower for keyword in keywords):
-                mentioned_fields.append(field)
+        # Analyse simple pour les champs (correspondance par préfixe, plus permissive)
+        query_tokens = tokenize(user_query)
+        matches = QUERY_MATCHER.match(query_tokens, loose=True)
+        mentioned_fields = match_fields(query_tokens, schema, loose=True) if schema else [
+            group for group in matches if not group.startswith("_")
+        ]
         
         # Vérifier les mots de restriction
-        has_restriction = any(word in user_query_lower for word in RESTRICTION_KEYWORDS)
+        has_restriction = RESTRICTION_GROUP in matches
         
         if mentioned_fields and has_restriction:
             fields = mentioned_fields[:]  # Copie de la liste
         else:
-            fields = VALID_API_FIELDS[:]  # Copie de la liste
+            fields = available_fields(schema)
         
         params = {
             "limit": limit,
@@ -526,11 +1004,18 @@ def create_fallback_params(user_query: str) -> Dict[str, Any]:
         # Paramètres d'urgence
         return {
             "limit": DEFAULT_LIMIT,
-            "fields": VALID_API_FIELDS[:],
+            "fields": available_fields(schema),
             "filters": {},
             "description": "Paramètres d'urgence"
         }
 
+def _compile_filters(filters: Any, known_fields) -> CompiledFilter:
+    """Prédicat compilé des filtres (champs inconnus du schéma signalés, évalués comme null)"""
+    predicate = compile_filter(filters, known_fields=known_fields)
+    if predicate.unknown:
+        log_debug(f"⚠️ Filtres sur des champs inconnus (valeur null): {predicate.unknown}")
+    return predicate
+
 def fetch_api_data(state: AgentState) -> AgentState:
     """Récupère les données depuis l'API"""
     
@@ -562,29 +1047,139 @@ def fetch_api_data(state: AgentState) -> AgentState:
                 "extracted_params": state.get("extracted_params", {})
             })
         
-        log_debug(f"Appel API: {state['api_url']}")
-        response = requests.get(state["api_url"], timeout=API_TIMEOUT)
-        response.raise_for_status()
+        extracted_params = state.get("extracted_params") or {}
+        limit = extracted_params.get("limit", DEFAULT_LIMIT)
+        filters = extracted_params.get("filters")
+        sort = extracted_params.get("sort")
+        # Avec une agrégation, tri et limite portent sur les groupes (nœud aggregate_data)
+        aggregating = bool(extracted_params.get("aggregate"))
         
-        all_data = response.json()
+        # Tri (et limite, sans filtre local) délégués à l'API si elle les supporte
+        query_params = {}
+        if supports_pushdown(state["api_url"], SORT_PUSHDOWN_HOSTS) and not aggregating:
+            query_params = pushdown_params(sort, None if filters else limit)
+        sort_pushed_down = "_sort" in query_params
         
-        # Application des filtres
-        if state.get("extracted_params") and "filters" in state["extracted_params"]:
-            filters = state["extracted_params"]["filters"]
-            for key, value in filters.items():
-                if key in ["userId", "id"]:
-                    all_data = [item for item in all_data if item.get(key) == int(value)]
+        # Sources jointes (même API) résolues via les relations connues
+        primary = resource_name(state["api_url"])
+        join_sources = {}
+        for join in extracted_params.get("joins") or []:
+            keys = resolve_join_keys(join, primary, KNOWN_RELATIONS)
+            if keys is None:
+                log_debug(f"⚠️ Relation inconnue {primary} -> {join['resource']}, jointure ignorée")
+                continue
+            join_sources[join["resource"]] = (source_url(state["api_url"], join["resource"]), keys)
+        
+        # Instantané local indexé : filtre + limite servis sans appel upstream
+        use_snapshot = SNAPSHOTS_ENABLED and not join_sources
+        record_access(state["api_url"], query_params, filters, snapshot=use_snapshot and SNAPSHOT_STORE is not None)
+        for url, _ in join_sources.values():
+            record_access(url, None)
+        snapshot = load_snapshot(state["api_url"]) if use_snapshot else None
+        if snapshot is not None:
+            sort_pushed_down = False
+        local_sort = bool(sort) and not sort_pushed_down and not aggregating
+        needs_all_rows = aggregating or (COLUMNAR_MODE and local_sort)
+        
+        response = None
+        if snapshot is not None:
+            log_debug(f"📦 Instantané local: {state['api_url']} ({len(snapshot)} enregistrements, "
+                      f"{snapshot.age:.0f}s)")
+            state["join_data"] = None
+            items = None
+            # Le prédicat est appliqué par l'instantané (positions candidates des index)
+            predicate = _compile_filters(filters, snapshot.fields) if filters else None
+            records = snapshot.query(predicate)
+            predicate = None
+        else:
+            log_debug(f"Appel API: {state['api_url']} {query_params or ''}")
+            if join_sources:
+                # Récupération concurrente : latence de la source la plus lente
+                with ThreadPoolExecutor(max_workers=1 + len(join_sources)) as executor:
+                    primary_future = executor.submit(http_get, state["api_url"], params=query_params or None,
+                                                     timeout=API_TIMEOUT, stream=True)
+                    join_futures = {
+                        name: executor.submit(http_get, url, timeout=API_TIMEOUT)
+                        for name, (url, _) in join_sources.items()
+                    }
+                    response = primary_future.result()
+                    join_data = {}
+                    for name, future in join_futures.items():
+                        try:
+                            join_response = future.result()
+                            join_response.raise_for_status()
+                            left_on, right_on = join_sources[name][1]
+                            join_data[name] = {"records": codec.loads(join_response.content),
+                                               "left_on": left_on, "right_on": right_on}
+                        except Exception as join_error:
+                            log_debug(f"⚠️ Source jointe {name} indisponible, jointure ignorée: {join_error}")
+                state["join_data"] = join_data
+            else:
+                response = http_get(state["api_url"], params=query_params or None,
+                                    timeout=API_TIMEOUT, stream=True)
+                state["join_data"] = None
+            response.raise_for_status()
+            
+            # Parsing incrémental : filtre et limite appliqués pendant le téléchargement,
+            # sauf si toutes les lignes sont nécessaires (décodage en une fois, plus rapide)
+            items = iter_response_items(response, incremental=not needs_all_rows)
+            first = next(items, None)
+            records = chain([first], items) if first is not None else iter(())
+            
+            # Le schéma est mis en cache depuis la réponse s'il n'a pas pu être échantillonné
+            sample = [first] if first is not None else []
+            if sample and SCHEMA_CACHE.get(state["api_url"]) is None:
+                sample.extend(islice(items, SCHEMA_SAMPLE_SIZE - 1))
+                SCHEMA_CACHE.put(state["api_url"], infer_schema(sample, SCHEMA_SAMPLE_SIZE))
+                records = chain(sample, items)
+            
+            # Filtres (prédicat compilé, une seule passe)
+            predicate = None
+            if filters and first is not None:
+                schema = SCHEMA_CACHE.get(state["api_url"])
+                predicate = _compile_filters(filters, schema.paths if schema is not None else None)
+        
+        if needs_all_rows:
+            # Toutes les lignes sont nécessaires : filtre en une passe (vectorisé en colonnaire)
+            all_data = list(records)
+            if COLUMNAR_MODE:
+                all_data = ColumnarBatch.from_records(all_data)
+            if predicate is not None:
+                all_data = predicate.apply(all_data)
+            if local_sort and all_data:
+                all_data = top_k(all_data, sort, limit)
+        else:
+            if predicate is not None:
+                records = filter(predicate, records)
+            if local_sort:
+                # Tri local borné (top-k) : mémoire en O(limit) sur le flux
+                all_data = top_k(records, sort, limit)
+            else:
+                # Arrêt de la lecture dès que `limit` lignes sont collectées
+                all_data = list(islice(records, limit))
+            if COLUMNAR_MODE:
+                all_data = ColumnarBatch.from_records(all_data)
+        if items is not None:
+            items.close()
         
         # Limitation du nombre de résultats
-        limit = state["extracted_params"].get("limit", DEFAULT_LIMIT) if state.get("extracted_params") else DEFAULT_LIMIT
-        state["api_data"] = all_data[:limit]
+        if aggregating:
+            state["api_data"] = all_data
+        elif isinstance(all_data, ColumnarBatch):
+            state["api_data"] = all_data.head(limit)
+        else:
+            state["api_data"] = all_data[:limit]
         
         if trace_context:
             trace_context.update(outputs={
                 "success": True,
                 "total_items": len(all_data),
                 "filtered_items": len(state["api_data"]),
-                "limit_applied": limit
+                "limit_applied": limit,
+                "sort": sort,
+                "sort_pushdown": sort_pushed_down,
+                "http_cache": response.headers.get("X-Cache") if response is not None else None,
+                "snapshot": snapshot is not None
             })
         
         log_debug(f"Données API récupérées: {len(state['api_data'])} éléments")
@@ -625,7 +1220,7 @@ def process_data(state: AgentState) -> AgentState:
                 trace_context.update(outputs={"skipped": True, "reason": "no_data_or_error"})
             return state
         
-        fields = VALID_API_FIELDS
+        fields = available_fields(SCHEMA_CACHE.get(state.get("api_url") or DEFAULT_API_URL))
         if state.get("extracted_params") and "fields" in state["extracted_params"]:
             fields = state["extracted_params"]["fields"]
         
@@ -635,13 +1230,44 @@ def process_data(state: AgentState) -> AgentState:
                 "fields_to_extract": fields
             })
         
-        processed_data = []
-        for item in state["api_data"]:
-            filtered_item = {}
-            for field in fields:
-                if field in item:
-                    filtered_item[field] = item[field]
-            processed_data.append(filtered_item)
+        api_data = state["api_data"]
+        
+        # Enrichissement : hash join avec chaque source jointe (imbriquée sous son nom)
+        join_data = state.get("join_data") or {}
+        if join_data:
+            if isinstance(api_data, ColumnarBatch):
+                api_data = api_data.to_records()
+            for name, join in join_data.items():
+                api_data = hash_join(api_data, join["records"], join["left_on"], join["right_on"], name)
+            log_debug(f"Jointures appliquées: {list(join_data)} -> {len(api_data)} lignes")
+        
+        # Déduplication optionnelle : clé déclarée (avant projection) ou ligne projetée complète
+        dedup = (state.get("extracted_params") or {}).get("dedup", DEDUP_ROWS)
+        dedup_key = normalize_dedup_key(dedup if isinstance(dedup, (str, list)) else DEDUP_KEY) if dedup else None
+        raw_count = len(api_data)
+        
+        if isinstance(api_data, ColumnarBatch):
+            # Lot colonnaire : projection sans copie des colonnes
+            if dedup and dedup_key:
+                api_data = dedup_batch(api_data, dedup_key)
+            processed_data = api_data.project(fields)
+            if dedup and not dedup_key:
+                processed_data = dedup_batch(processed_data)
+            state["sheet_headers"] = list(processed_data.schema)
+        else:
+            # Projection compilée une fois par run (champs simples et chemins imbriqués)
+            projection = compile_projection(fields, sample=api_data[0])
+            if not dedup:
+                processed_data = projection.rows(api_data)
+            elif dedup_key:
+                processed_data = projection.rows(dedup_records(api_data, dedup_key))
+            else:
+                processed_data = list(Deduplicator(projection.headers).unique(map(projection.row, api_data)))
+            state["sheet_headers"] = projection.headers
+        
+        duplicates = raw_count - len(processed_data)
+        if dedup and duplicates:
+            log_debug(f"🧹 Doublons supprimés: {duplicates} (clé: {dedup_key or 'ligne complète'})")
         
         state["processed_data"] = processed_data
         
@@ -649,6 +1275,7 @@ def process_data(state: AgentState) -> AgentState:
             trace_context.update(outputs={
                 "success": True,
                 "processed_items": len(processed_data),
+                "duplicates_removed": duplicates,
                 "extracted_fields": fields
             })
         
@@ -668,6 +1295,195 @@ def process_data(state: AgentState) -> AgentState:
     
     return state
 
+def aggregate_data(state: AgentState) -> AgentState:
+    """Agrège les données traitées (group-by) quand la requête demande une synthèse"""
+    
+    trace_context = None
+    if langsmith_client:
+        try:
+            trace_context = langsmith_client.trace(
+                name="aggregate_data",
+                tags=["processing", "aggregation"],
+                metadata={"step": "3.5", "component": "data_aggregator"}
+            ).__enter__()
+        except:
+            pass
+    
+    try:
+        state = ensure_state_keys(state)
+        params = state.get("extracted_params") or {}
+        spec = params.get("aggregate")
+        
+        if state.get("error") or not spec or not state.get("processed_data"):
+            if trace_context:
+                trace_context.update(outputs={"skipped": True, "reason": "no_aggregation_or_error"})
+            return state
+        
+        processed_data = state["processed_data"]
+        if isinstance(processed_data, ColumnarBatch):
+            batch = processed_data
+        else:
+            batch = ColumnarBatch.from_rows(state["sheet_headers"], processed_data)
+        
+        if trace_context:
+            trace_context.update(inputs={"rows_count": len(batch), "aggregate": spec})
+        
+        # Agrégation par hachage, puis tri et limite sur les groupes
+        summary = aggregate(batch, spec)
+        limit = params.get("limit", DEFAULT_LIMIT)
+        sort = params.get("sort")
+        if sort and sort["field"] in summary.columns:
+            summary = top_k(summary, sort, limit)
+        else:
+            summary = summary.head(limit)
+        
+        state["sheet_headers"] = list(summary.schema)
+        state["processed_data"] = summary if isinstance(processed_data, ColumnarBatch) else list(summary.rows())
+        
+        if trace_context:
+            trace_context.update(outputs={
+                "success": True,
+                "groups_count": len(summary),
+                "headers": state["sheet_headers"]
+            })
+        
+        log_debug(f"Agrégation: {len(batch)} lignes -> {len(summary)} groupes ({state['sheet_headers']})")
+        
+    except Exception as e:
+        error_msg = f"Erreur lors de l'agrégation: {str(e)}"
+        state["error"] = error_msg
+        
+        if trace_context:
+            trace_context.update(outputs={"success": False, "error": error_msg})
+        print(f"Erreur: {state['error']}")
+    
+    finally:
+        if trace_context:
+            trace_context.__exit__(None, None, None)
+    
+    return state
+
+# =============================================================================
+# PROVISIONING DU SHEET (BRANCHE PARALLÈLE)
+# =============================================================================
+
+# Sheets provisionnés par la branche parallèle, remis au nœud d'écriture (l'état ne garde que leur ID)
+_PROVISIONED_SHEETS: Dict[str, Any] = {}
+_PROVISIONED_LOCK = threading.Lock()
+
+def create_sheet_pool(size: int = SHEET_POOL_SIZE, ledger_path: str = SHEET_POOL_LEDGER) -> SheetPool:
+    """Pool de sheets vides déjà rangés et partagés (clients résolus à chaque appel)"""
+    return SheetPool(lambda: gc, lambda: setup_drive_service(), SHEETS_FOLDER_NAME, size, ledger_path,
+                     share_email=GOOGLE_PERSONAL_EMAIL, share_publicly=SHEETS_SHARE_PUBLICLY,
+                     title_prefix=SHEETS_DEFAULT_TITLE_PREFIX, max_age=SHEET_POOL_MAX_AGE_HOURS * 3600,
+                     log=log_debug)
+
+SHEET_POOL = create_sheet_pool().start() if SHEET_POOL_SIZE > 0 and gc else None
+
+# Effets de bord post-création (partages, lien public) exécutés après la réponse
+BACKGROUND_TASKS = TaskQueue(
+    workers=BACKGROUND_TASK_WORKERS, max_attempts=BACKGROUND_TASK_MAX_ATTEMPTS,
+    drain_timeout=BACKGROUND_TASK_DRAIN_SECONDS, log=log_debug
+) if BACKGROUND_SHARING else None
+
+def acquire_sheet(sheet_title: str):
+    """Sheet prêt à remplir : (sheet, folder_id, rangé, issu du pool, tâches de partage)
+
+    Réclamé au pool s'il en a un de prêt (un renommage, déjà partagé), sinon
+    provisionné à la demande ; ses partages partent alors en arrière-plan.
+    """
+    if SHEET_POOL is not None:
+        claimed = SHEET_POOL.claim(sheet_title)
+        if claimed is not None:
+            return (*claimed, True, [])
+    task_ids: List[str] = []
+    
+    def defer(name, task):
+        task_ids.append(BACKGROUND_TASKS.submit(name, task))
+    
+    sheet, folder_id, in_folder = provision_sheet(
+        gc, setup_drive_service, sheet_title, SHEETS_FOLDER_NAME,
+        share_email=GOOGLE_PERSONAL_EMAIL, share_publicly=SHEETS_SHARE_PUBLICLY, log=log_debug,
+        defer=defer if BACKGROUND_TASKS is not None else None
+    )
+    return sheet, folder_id, in_folder, False, task_ids
+
+def sharing_status(task_ids: List[str]) -> List[Dict[str, Any]]:
+    """Statut des tâches de partage d'un export (pending, running, retrying, done, failed)"""
+    if BACKGROUND_TASKS is None:
+        return []
+    return [status for status in map(BACKGROUND_TASKS.status, task_ids) if status is not None]
+
+def complete_sheet(sheet_id: str, pooled: bool):
+    """Le sheet a reçu ses données : il quitte le suivi du pool"""
+    if pooled and SHEET_POOL is not None:
+        SHEET_POOL.complete(sheet_id)
+
+def take_provisioned_sheet(sheet_id: str):
+    """Sheet provisionné par la branche parallèle (rouvert par son ID s'il n'est plus en mémoire)"""
+    with _PROVISIONED_LOCK:
+        sheet = _PROVISIONED_SHEETS.pop(sheet_id, None)
+    return sheet if sheet is not None else gc.open_by_key(sheet_id)
+
+def discard_provisioned_sheet(provisioned: Optional[Dict[str, Any]]):
+    """Supprime un sheet provisionné par anticipation qui ne sera pas rempli"""
+    if not provisioned or not provisioned.get("sheet_id"):
+        return
+    with _PROVISIONED_LOCK:
+        _PROVISIONED_SHEETS.pop(provisioned["sheet_id"], None)
+    if provisioned.get("pooled") and SHEET_POOL is not None:
+        SHEET_POOL.release(provisioned["sheet_id"])
+        return
+    try:
+        discard_sheet(setup_drive_service(), provisioned["sheet_id"], log=log_debug)
+    except Exception as discard_error:
+        log_debug(f"⚠️ Sheet inutilisé non supprimé ({provisioned['sheet_id']}): {discard_error}")
+
+def provision_google_sheet(state: AgentState) -> Dict[str, Any]:
+    """Dossier Drive, création et partage du sheet, en parallèle de fetch + process
+
+    Ne retourne que la clé `provisioned` : la branche données écrit les
+    autres clés de l'état pendant les mêmes étapes.
+    """
+    
+    if not PARALLEL_PROVISIONING or not gc or state.get("error"):
+        return {}
+    
+    trace_context = create_trace_context(
+        name="provision_google_sheet",
+        tags=["google_sheets", "provisioning"],
+        metadata={"step": "2-3", "component": "sheets_provisioner"}
+    )
+    throttling: Dict[str, Any] = {}
+    
+    try:
+        with trace_context or DummyContext(), google_throttling() as throttling:
+            sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            safe_trace_update(trace_context, inputs={"sheet_title": sheet_title, "folder_name": SHEETS_FOLDER_NAME})
+            log_debug(f"🔀 Provisioning du sheet en parallèle: {sheet_title}")
+            
+            sheet, folder_id, in_folder, pooled, sharing_tasks = acquire_sheet(sheet_title)
+            with _PROVISIONED_LOCK:
+                _PROVISIONED_SHEETS[sheet.id] = sheet
+            
+            provisioned = {
+                "sheet_id": sheet.id,
+                "sheet_url": sheet.url,
+                "title": sheet_title,
+                "folder_id": folder_id,
+                "in_folder": in_folder,
+                "pooled": pooled,
+                "sharing_tasks": sharing_tasks
+            }
+            safe_trace_update(trace_context, outputs={"success": True, **provisioned, "throttling": throttling})
+            return {"provisioned": provisioned}
+    
+    except Exception as e:
+        # Erreur signalée par le nœud d'écriture, après la jointure des branches
+        safe_trace_update(trace_context, outputs={"success": False, "error": str(e), "throttling": throttling})
+        log_debug(f"❌ Erreur de provisioning: {e}")
+        return {"provisioned": {"error": str(e)}}
+
 def create_google_sheet(state: AgentState) -> AgentState:
     """Crée un Google Sheet et y ajoute les données dans un dossier organisé"""
     
@@ -677,12 +1493,17 @@ def create_google_sheet(state: AgentState) -> AgentState:
         tags=["google_sheets", "export"],
         metadata={"step": "4", "component": "sheets_creator"}
     )
+    throttling: Dict[str, Any] = {}
     
     try:
-        with trace_context or DummyContext():
+        with trace_context or DummyContext(), google_throttling() as throttling:
             state = ensure_state_keys(state)
             
+            provisioned = state.get("provisioned")
+            
             if state.get("error") or not state.get("processed_data") or not gc:
+                # Sheet créé par anticipation mais sans données à écrire
+                discard_provisioned_sheet(provisioned)
                 if not gc:
                     error_msg = "Google Sheets non configuré"
                     state["error"] = error_msg
@@ -691,9 +1512,15 @@ def create_google_sheet(state: AgentState) -> AgentState:
                     safe_trace_update(trace_context, outputs={"skipped": True, "reason": "no_data_or_error"})
                 return state
             
+            if provisioned and provisioned.get("error"):
+                raise RuntimeError(provisioned["error"])
+            
             processed_data = state["processed_data"]
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{timestamp}"
+            if provisioned:
+                sheet_title = provisioned["title"]
+            else:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{timestamp}"
             
             safe_trace_update(trace_context, inputs={
                 "data_count": len(processed_data),
@@ -704,157 +1531,17 @@ def create_google_sheet(state: AgentState) -> AgentState:
             log_debug(f"Création du sheet: {sheet_title}")
             
             # =================================================================
-            # 1. SETUP DES CREDENTIALS POUR DRIVE API
+            # 1-5. DOSSIER DRIVE, CRÉATION ET PARTAGE DU SHEET
             # =================================================================
-            folder_id = None
-            drive_service = None
-            
-            try:
-                from googleapiclient.discovery import build
-                from google.oauth2.service_account import Credentials
-                
-                log_debug(f"Chargement des credentials depuis: {GOOGLE_CREDENTIALS_PATH}")
-                
-                # Créer les credentials avec les scopes Drive
-                creds = Credentials.from_service_account_file(
-                    GOOGLE_CREDENTIALS_PATH, 
-                    scopes=GOOGLE_SCOPES
-                )
-                
-                # Créer le service Drive
-                drive_service = build('drive', 'v3', credentials=creds)
-                log_debug("✅ Service Drive API initialisé")
-                
-                # =================================================================
-                # 2. RECHERCHER/CRÉER LE DOSSIER
-                # =================================================================
-                log_debug(f"Recherche du dossier '{SHEETS_FOLDER_NAME}'...")
-                
-                # Rechercher si le dossier existe déjà
-                search_query = f"name='{SHEETS_FOLDER_NAME}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-                results = drive_service.files().list(
-                    q=search_query,
-                    fields="files(id, name, parents)"
-                ).execute()
-                
-                folders = results.get('files', [])
-                log_debug(f"Dossiers trouvés: {len(folders)}")
-                
-                if folders:
-                    folder_id = folders[0]['id']
-                    log_debug(f"✅ Dossier trouvé: {SHEETS_FOLDER_NAME} (ID: {folder_id})")
-                else:
-                    # Créer le dossier s'il n'existe pas
-                    log_debug(f"🔧 Création du dossier '{SHEETS_FOLDER_NAME}'...")
-                    folder_metadata = {
-                        'name': SHEETS_FOLDER_NAME,
-                        'mimeType': 'application/vnd.google-apps.folder'
-                    }
-                    
-                    folder = drive_service.files().create(
-                        body=folder_metadata,
-                        fields='id'
-                    ).execute()
-                    
-                    folder_id = folder.get('id')
-                    log_debug(f"✅ Dossier créé: {SHEETS_FOLDER_NAME} (ID: {folder_id})")
-                    
-                    # Partager le dossier avec l'email personnel
-                    if GOOGLE_PERSONAL_EMAIL:
-                        try:
-                            permission = {
-                                'type': 'user',
-                                'role': 'writer',
-                                'emailAddress': GOOGLE_PERSONAL_EMAIL
-                            }
-                            drive_service.permissions().create(
-                                fileId=folder_id,
-                                body=permission,
-                                sendNotificationEmail=False
-                            ).execute()
-                            log_debug(f"✅ Dossier partagé avec {GOOGLE_PERSONAL_EMAIL}")
-                        except Exception as share_error:
-                            log_debug(f"⚠️ Erreur partage dossier: {share_error}")
-                    
-            except ImportError:
-                log_debug("❌ google-api-python-client non installé")
-                log_debug("📝 Installez avec: pip install google-api-python-client")
-                drive_service = None
-            except FileNotFoundError:
-                log_debug(f"❌ Fichier credentials non trouvé: {GOOGLE_CREDENTIALS_PATH}")
-                drive_service = None
-            except Exception as drive_error:
-                log_debug(f"⚠️ Erreur lors de la configuration Drive API: {drive_error}")
-                log_debug("📝 Le sheet sera créé à la racine de Drive")
-                drive_service = None
-            
-            # =================================================================
-            # 3. CRÉER LE GOOGLE SHEET
-            # =================================================================
-            log_debug("Création du Google Sheet...")
-            sheet = gc.create(sheet_title)
-            sheet_id = sheet.id
-            log_debug(f"✅ Sheet créé: {sheet_title} (ID: {sheet_id})")
-            
-            # =================================================================
-            # 4. DÉPLACER LE SHEET DANS LE DOSSIER
-            # =================================================================
-            if folder_id and drive_service:
-                try:
-                    log_debug(f"🔧 Déplacement du sheet dans le dossier '{SHEETS_FOLDER_NAME}'...")
-                    
-                    # Récupérer les parents actuels du fichier
-                    file_metadata = drive_service.files().get(
-                        fileId=sheet_id, 
-                        fields='parents'
-                    ).execute()
-                    
-                    previous_parents = ",".join(file_metadata.get('parents', []))
-                    log_debug(f"Parents actuels: {previous_parents}")
-                    
-                    # Déplacer le fichier vers le nouveau dossier
-                    drive_service.files().update(
-                        fileId=sheet_id,
-                        addParents=folder_id,
-                        removeParents=previous_parents,
-                        fields='id, parents'
-                    ).execute()
-                    
-                    log_debug(f"✅ Sheet déplacé dans le dossier '{SHEETS_FOLDER_NAME}'")
-                    
-                    # Vérifier le déplacement
-                    updated_file = drive_service.files().get(
-                        fileId=sheet_id,
-                        fields='parents'
-                    ).execute()
-                    log_debug(f"Nouveaux parents: {updated_file.get('parents', [])}")
-                    
-                except Exception as move_error:
-                    log_debug(f"⚠️ Erreur lors du déplacement: {move_error}")
-                    log_debug("📝 Le sheet reste à la racine mais est utilisable")
+            if provisioned:
+                # Déjà fait par la branche parallèle pendant fetch + process
+                sheet = take_provisioned_sheet(provisioned["sheet_id"])
+                folder_id, moved = provisioned["folder_id"], provisioned["in_folder"]
+                pooled = provisioned.get("pooled", False)
+                sharing_tasks = provisioned.get("sharing_tasks", [])
             else:
-                if not folder_id:
-                    log_debug("⚠️ Pas de folder_id - sheet créé à la racine")
-                if not drive_service:
-                    log_debug("⚠️ Pas de drive_service - sheet créé à la racine")
-            
-            # =================================================================
-            # 5. PARTAGER LE SHEET
-            # =================================================================
-            if GOOGLE_PERSONAL_EMAIL:
-                try:
-                    sheet.share(GOOGLE_PERSONAL_EMAIL, perm_type='user', role='writer')
-                    log_debug(f"✅ Sheet partagé avec {GOOGLE_PERSONAL_EMAIL}")
-                except Exception as share_error:
-                    log_debug(f"⚠️ Erreur partage sheet: {share_error}")
-            
-            # Partage public si configuré
-            if SHEETS_SHARE_PUBLICLY:
-                try:
-                    sheet.share('', perm_type='anyone', role='reader')
-                    log_debug("✅ Sheet partagé publiquement en lecture")
-                except Exception as public_error:
-                    log_debug(f"⚠️ Impossible de partager publiquement: {public_error}")
+                sheet, folder_id, moved, pooled, sharing_tasks = acquire_sheet(sheet_title)
+            sheet_id = sheet.id
             
             # =================================================================
             # 6. AJOUTER LES DONNÉES
@@ -862,17 +1549,24 @@ def create_google_sheet(state: AgentState) -> AgentState:
             worksheet = sheet.get_worksheet(0)
             
             if processed_data:
-                # En-têtes
-                headers = list(processed_data[0].keys())
-                worksheet.append_row(headers)
-                log_debug(f"✅ En-têtes ajoutés: {headers}")
-                
-                # Données
-                for item in processed_data:
-                    row_values = [item.get(header, '') for header in headers]
-                    worksheet.append_row(row_values)
+                if isinstance(processed_data, ColumnarBatch):
+                    # Lot colonnaire sérialisé directement en plage de valeurs
+                    headers = list(processed_data.schema)
+                    values = processed_data.to_values()
+                else:
+                    headers = state.get("sheet_headers")
+                    rows = processed_data
+                    if not headers or isinstance(processed_data[0], dict):
+                        # Données fournies sous forme de dictionnaires (appel direct du nœud)
+                        headers = headers or list(processed_data[0].keys())
+                        rows = compile_projection(headers).rows(processed_data)
+                    values = [list(headers), *rows]
                 
-                log_debug(f"✅ {len(processed_data)} lignes de données ajoutées")
+                # En-têtes + données en un seul appel
+                worksheet.append_rows(values)
+                complete_sheet(sheet_id, pooled)
+                log_debug(f"✅ En-têtes ajoutés: {headers}")
+                log_debug(f"✅ {len(values) - 1} lignes de données ajoutées")
             
             # =================================================================
             # 7. CONSTRUIRE L'URL FINALE
@@ -896,7 +1590,10 @@ def create_google_sheet(state: AgentState) -> AgentState:
                 "folder_id": folder_id,
                 "folder_url": folder_url,
                 "rows_added": len(processed_data),
-                "moved_to_folder": bool(folder_id and drive_service)
+                "moved_to_folder": moved,
+                "from_pool": pooled,
+                "sharing": [status["status"] for status in sharing_status(sharing_tasks)],
+                "throttling": throttling
             })
             
             log_debug(f"Google Sheet créé avec succès: {sheet.url}")
@@ -905,7 +1602,7 @@ def create_google_sheet(state: AgentState) -> AgentState:
         error_msg = f"Erreur lors de la création du Google Sheet: {str(e)}"
         state["error"] = error_msg
         
-        safe_trace_update(trace_context, outputs={"success": False, "error": error_msg})
+        safe_trace_update(trace_context, outputs={"success": False, "error": error_msg, "throttling": throttling})
         log_debug(f"❌ Erreur: {state['error']}")
         
         # Debug détaillé
@@ -914,6 +1611,183 @@ def create_google_sheet(state: AgentState) -> AgentState:
     
     return state
 
+# =============================================================================
+# EXPORT EN FLUX (GROS EXPORTS)
+# =============================================================================
+
+# Pipeline classique : branche données et branche de provisioning du sheet en parallèle
+PIPELINE_BRANCHES = ["fetch_data", "provision_sheet"]
+
+def route_after_parse(state: AgentState) -> Union[str, List[str]]:
+    """Export en flux si demandé et possible, sinon pipeline classique par étapes"""
+    params = state.get("extracted_params") or {}
+    if state.get("error") or not params.get("large_export"):
+        return PIPELINE_BRANCHES
+    # Agrégation, jointures et tri local ont besoin de toutes les lignes
+    api_url = state.get("api_url") or DEFAULT_API_URL
+    sort = params.get("sort")
+    local_sort = bool(sort) and not (
+        supports_pushdown(api_url, SORT_PUSHDOWN_HOSTS) and "_sort" in pushdown_params(sort)
+    )
+    if params.get("aggregate") or params.get("joins") or local_sort:
+        log_debug("⚠️ Export complet non diffusable (agrégation, jointure ou tri local) : pipeline classique")
+        return PIPELINE_BRANCHES
+    return "stream_export"
+
+def iter_api_pages(api_url: str, sort: Optional[Dict[str, str]], page_size: int,
+                   stop: threading.Event, concurrency: int = 1):
+    """Pages successives de l'API (`_start`/`_limit` json-server, sinon réponse découpée)"""
+    if not supports_pushdown(api_url, SORT_PUSHDOWN_HOSTS):
+        response = http_get(api_url, timeout=API_TIMEOUT, stream=True)
+        response.raise_for_status()
+        # Réponse unique découpée en pages au fil du parsing (jamais entièrement en mémoire)
+        items = iter_response_items(response)
+        try:
+            while not stop.is_set():
+                page = list(islice(items, page_size))
+                if not page:
+                    return
+                yield page
+        finally:
+            items.close()
+        return
+    
+    def fetch_page(start: int):
+        params = {**pushdown_params(sort), "_start": start, "_limit": page_size}
+        response = http_get(api_url, params=params, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        return codec.loads(response.content)
+    
+    # Fenêtre glissante de `concurrency` pages en vol, rendues dans l'ordre
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        in_flight = deque()
+        next_start = 0
+        exhausted = False
+        while True:
+            while not exhausted and not stop.is_set() and len(in_flight) < max(1, concurrency):
+                in_flight.append(executor.submit(fetch_page, next_start))
+                next_start += page_size
+            if not in_flight:
+                return
+            page = in_flight.popleft().result()
+            if exhausted or stop.is_set():
+                # Pages spéculatives au-delà de la fin (ou de la limite) : ignorées
+                continue
+            if page:
+                yield page
+            if len(page) < page_size:
+                exhausted = True
+
+def stream_export(state: AgentState) -> AgentState:
+    """Export en flux : téléchargement, projection et écriture du sheet se recouvrent"""
+    
+    trace_context = create_trace_context(
+        name="stream_export",
+        tags=["streaming", "export"],
+        metadata={"step": "2-4", "component": "stream_exporter"}
+    )
+    throttling: Dict[str, Any] = {}
+    writer = None
+    provisioned = {}
+    
+    try:
+        with trace_context or DummyContext(), google_throttling() as throttling:
+            state = ensure_state_keys(state)
+            
+            if state.get("error") or not gc:
+                if not gc:
+                    state["error"] = "Google Sheets non configuré"
+                    safe_trace_update(trace_context, outputs={"success": False, "error": state["error"]})
+                return state
+            
+            api_url = state.get("api_url") or DEFAULT_API_URL
+            state["api_url"] = api_url
+            params = state.get("extracted_params") or {}
+            limit = params.get("limit", LARGE_EXPORT_MAX_ROWS)
+            fields = params.get("fields") or available_fields(SCHEMA_CACHE.get(api_url))
+            filters = params.get("filters")
+            dedup = params.get("dedup", DEDUP_ROWS)
+            dedup_key = normalize_dedup_key(dedup if isinstance(dedup, (str, list)) else DEDUP_KEY) if dedup else None
+            sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            
+            safe_trace_update(trace_context, inputs={
+                "api_url": api_url, "limit": limit, "fields": fields,
+                "page_size": STREAM_PAGE_SIZE, "queue_size": STREAM_QUEUE_SIZE
+            })
+            log_debug(f"🌊 Export en flux: {api_url} (jusqu'à {limit} lignes, pages de {STREAM_PAGE_SIZE})")
+            
+            # Étage 3 : écriture ; le sheet est créé pendant le téléchargement des pages suivantes
+            def open_sheet():
+                (sheet, provisioned["folder_id"], provisioned["moved"], provisioned["pooled"],
+                 provisioned["sharing_tasks"]) = acquire_sheet(sheet_title)
+                return sheet
+            
+            writer = ChunkWriter(open_sheet, fields, chunk_rows=STREAM_WRITE_ROWS)
+            
+            # Étage 2 : projection (filtre, déduplication) compilée sur la première page
+            done = threading.Event()
+            compiled = {}
+            remaining = [limit]
+            
+            def transform(page):
+                if not compiled:
+                    # Première page reçue : le provisioning du sheet démarre sans attendre le premier bloc
+                    writer.prepare()
+                    compiled["filter"] = compile_filter(filters) if filters else None
+                    compiled["projection"] = compile_projection(fields, sample=page[0])
+                    compiled["dedup"] = Deduplicator(dedup_key or fields) if dedup else None
+                    compiled["key"] = compile_projection(dedup_key).row if dedup_key else None
+                if compiled["filter"]:
+                    page = compiled["filter"].apply(page)
+                deduplicator, key_of = compiled["dedup"], compiled["key"]
+                if key_of:
+                    page = [record for record in page if deduplicator.is_new(key_of(record))]
+                rows = compiled["projection"].rows(page)
+                if deduplicator and not key_of:
+                    rows = list(deduplicator.unique(rows))
+                rows = rows[:remaining[0]]
+                remaining[0] -= len(rows)
+                if remaining[0] <= 0:
+                    done.set()
+                return rows
+            
+            pages = iter_api_pages(api_url, params.get("sort"), STREAM_PAGE_SIZE, done, STREAM_FETCH_CONCURRENCY)
+            run_pipeline(pages, transform, writer.write, queue_size=STREAM_QUEUE_SIZE)
+            # Sans aucune ligne, le sheet est tout de même créé (en-têtes seuls)
+            writer.flush()
+            complete_sheet(writer.sheet.id, provisioned.get("pooled", False))
+            if not writer.rows_written:
+                log_debug("⚠️ Aucune ligne exportée : sheet créé avec les seuls en-têtes")
+            
+            state["sheet_headers"] = list(fields)
+            state["processed_data"] = None
+            state["rows_exported"] = writer.rows_written
+            state["sheets_url"] = writer.sheet.url
+            
+            safe_trace_update(trace_context, outputs={
+                "success": True,
+                "sheet_url": state["sheets_url"],
+                "rows_added": writer.rows_written,
+                "chunks_written": writer.chunks_written,
+                "folder_id": provisioned.get("folder_id"),
+                "moved_to_folder": provisioned.get("moved", False),
+                "sharing": [status["status"] for status in sharing_status(provisioned.get("sharing_tasks", []))],
+                "throttling": throttling
+            })
+            log_debug(f"✅ Export en flux terminé: {writer.rows_written} lignes en {writer.chunks_written} blocs")
+    
+    except Exception as e:
+        error_msg = f"Erreur lors de l'export en flux: {str(e)}"
+        state["error"] = error_msg
+        # Sheet provisionné par anticipation mais jamais rempli : supprimé (ou rendu au pool)
+        sheet = writer.opened_sheet() if writer is not None and not writer.rows_written else None
+        if sheet is not None:
+            discard_provisioned_sheet({"sheet_id": sheet.id, "pooled": provisioned.get("pooled", False)})
+        safe_trace_update(trace_context, outputs={"success": False, "error": error_msg, "throttling": throttling})
+        log_debug(f"❌ Erreur: {state['error']}")
+    
+    return state
+
 def generate_response(state: AgentState) -> AgentState:
     """Génère la réponse finale avec lien vers les stats LangSmith"""
     
@@ -923,11 +1797,14 @@ def generate_response(state: AgentState) -> AgentState:
         response = f"❌ Erreur: {state['error']}"
     else:
         params = state.get("extracted_params", {})
+        exported_count = state.get("rows_exported")
+        if exported_count is None:
+            exported_count = len(state.get("processed_data") or [])
         
         response = f"""✅ Tâche terminée avec succès !
 
 📊 **Données récupérées:**
-- {len(state.get('processed_data', []))} posts traités
+- {exported_count} posts traités
 - Champs extraits: {', '.join(params.get('fields', ['tous']))}
 - Limite appliquée: {params.get('limit', DEFAULT_LIMIT)}
 
@@ -952,8 +1829,8 @@ def generate_response(state: AgentState) -> AgentState:
 # CONSTRUCTION DU GRAPHE (APRÈS DÉFINITION DES FONCTIONS)
 # =============================================================================
 
-def build_graph() -> StateGraph:
-    """Construit le graphe LangGraph"""
+def build_graph(checkpointer: Optional["SqliteCheckpointer"] = None) -> StateGraph:
+    """Construit le graphe LangGraph (avec `checkpointer` : état enregistré après chaque étape)"""
     
     workflow = StateGraph(AgentState)
     
@@ -961,22 +1838,52 @@ def build_graph() -> StateGraph:
     workflow.add_node("parse_query", parse_user_query)
     workflow.add_node("fetch_data", fetch_api_data)
     workflow.add_node("process_data", process_data)
+    workflow.add_node("aggregate_data", aggregate_data)
+    workflow.add_node("provision_sheet", provision_google_sheet)
     workflow.add_node("create_sheet", create_google_sheet)
+    workflow.add_node("stream_export", stream_export)
     workflow.add_node("respond", generate_response)
     
     # Définition des connexions
     workflow.add_edge(START, "parse_query")
-    workflow.add_edge("parse_query", "fetch_data")
+    workflow.add_conditional_edges("parse_query", route_after_parse, [*PIPELINE_BRANCHES, "stream_export"])
+    workflow.add_edge("stream_export", "respond")
     workflow.add_edge("fetch_data", "process_data")
-    workflow.add_edge("process_data", "create_sheet")
+    workflow.add_edge("process_data", "aggregate_data")
+    # Jointure : écriture une fois les données prêtes ET le sheet provisionné
+    workflow.add_edge(["aggregate_data", "provision_sheet"], "create_sheet")
     workflow.add_edge("create_sheet", "respond")
     workflow.add_edge("respond", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
-# Instance du graphe pour l'export
+# Instance du graphe pour l'export (LangGraph Studio fournit sa propre persistance)
 graph = build_graph()
 
+def _create_checkpointer() -> Optional["SqliteCheckpointer"]:
+    if not CHECKPOINTS_ENABLED:
+        return None
+    try:
+        from agent.checkpoints import CompactSerializer, SqliteCheckpointer
+    except ImportError as import_error:
+        log_debug(f"⚠️ Points de reprise désactivés (langgraph-checkpoint trop ancien): {import_error}")
+        log_debug("📝 Mettez à jour avec: pip install -U langgraph-checkpoint")
+        return None
+    try:
+        checkpointer = SqliteCheckpointer(CHECKPOINT_DB, CompactSerializer(CHECKPOINT_COMPRESS_MIN_BYTES))
+        purged = checkpointer.purge(CHECKPOINT_RETENTION_HOURS * 3600)
+        if purged:
+            log_debug(f"🧹 {purged} run(s) expiré(s) retiré(s) des points de reprise")
+        return checkpointer
+    except (OSError, sqlite3.Error) as checkpoint_error:
+        log_debug(f"⚠️ Points de reprise désactivés ({CHECKPOINT_DB}): {checkpoint_error}")
+        return None
+
+CHECKPOINTER = _create_checkpointer()
+
+# Graphe des runs de l'agent : chaque étape est enregistrée par run_id (thread LangGraph) pour resume_run
+DURABLE_GRAPH = build_graph(CHECKPOINTER) if CHECKPOINTER is not None else graph
+
 # =============================================================================
 # UTILITAIRES D'ÉTAT
 # =============================================================================
@@ -990,6 +1897,11 @@ def get_initial_state() -> AgentState:
         "extracted_params": None,
         "api_data": None,
         "processed_data": None,
+        "sheet_headers": None,
+        "join_data": None,
+        "rows_exported": None,
+        "provisioned": None,
+        "run_id": "",
         "sheets_url": "",
         "error": ""
     }
@@ -998,9 +1910,33 @@ def get_initial_state() -> AgentState:
 # FONCTION D'EXÉCUTION AVEC TRACING GLOBAL
 # =============================================================================
 
-def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
-    """Exécute l'agent avec un tracing global de la session"""
+def run_with_cassette(initial_state: AgentState, path: str, mode: str = "record",
+                      latency_scale: float = 1.0) -> AgentState:
+    """Exécute le graphe en enregistrant (record) ou en rejouant (replay) ses interactions"""
+    from agent.cassette import Cassette, cassette_session
     
+    if mode == "record":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    
+    cassette = Cassette(path, mode=mode, latency_scale=latency_scale)
+    cassette.metadata.setdefault("api_url", initial_state.get("api_url"))
+    messages = initial_state.get("messages") or []
+    if messages and isinstance(messages[-1], HumanMessage):
+        cassette.metadata.setdefault("user_query", messages[-1].content)
+    
+    log_debug(f"🎞️ Cassette ({mode}): {path}")
+    with cassette_session(sys.modules[__name__], cassette):
+        return graph.invoke(initial_state)
+
+def run_config(run_id: str) -> Dict[str, Any]:
+    """Configuration LangGraph d'un run : ses points de reprise sont rangés sous son run_id"""
+    return {"configurable": {"thread_id": run_id}}
+
+def run_agent_with_tracing(user_input: str, run_name: str = None, run_id: str = None) -> AgentState:
+    """Exécute l'agent avec un tracing global de la session (run_id : identifiant de reprise)"""
+    
+    if run_id is None:
+        run_id = uuid.uuid4().hex[:12]
     if run_name is None:
         run_name = f"agent_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
@@ -1010,7 +1946,7 @@ def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
             trace_context = langsmith_client.trace(
                 name=run_name,
                 tags=["agent_execution", "full_pipeline"],
-                metadata={"user_input": user_input}
+                metadata={"user_input": user_input, "run_id": run_id}
             ).__enter__()
         except:
             pass
@@ -1019,21 +1955,27 @@ def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
         # État initial
         initial_state = get_initial_state()
         initial_state["messages"] = [HumanMessage(content=user_input)]
+        initial_state["run_id"] = run_id
         
         if trace_context:
             trace_context.update(inputs={"user_input": user_input})
         
         log_debug(f"Démarrage de l'agent avec input: {user_input}")
         
-        # Exécution du graphe
-        result = graph.invoke(initial_state)
+        # Exécution du graphe (sous cassette si CASSETTE_MODE est actif)
+        if CASSETTE_MODE in ("record", "replay"):
+            result = run_with_cassette(initial_state, CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
+        else:
+            result = DURABLE_GRAPH.invoke(initial_state, run_config(run_id))
         
         if trace_context:
             trace_context.update(outputs={
                 "success": True,
                 "final_state": {
                     "sheets_url": result.get("sheets_url"),
-                    "processed_data_count": len(result.get("processed_data", [])),
+                    # L'export en flux ne garde pas les lignes (processed_data=None) : rows_exported fait foi
+                    "processed_data_count": (result["rows_exported"] if result.get("rows_exported") is not None
+                                             else len(result.get("processed_data") or [])),
                     "error": result.get("error")
                 }
             })
@@ -1051,6 +1993,101 @@ def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
         if trace_context:
             trace_context.__exit__(None, None, None)
 
+# =============================================================================
+# REPRISE DES RUNS ÉCHOUÉS
+# =============================================================================
+
+def resume_point(run_id: str):
+    """Dernier point de reprise sans erreur d'un run avec des étapes restantes (None si le run a abouti)
+    
+    Les nœuds signalent leurs échecs dans `error` : le premier état porteur
+    d'une erreur est celui produit par l'étape en échec, qui sera rejouée.
+    """
+    history = list(DURABLE_GRAPH.get_state_history(run_config(run_id)))
+    if not history:
+        raise KeyError(f"Aucun point de reprise pour le run {run_id}")
+    latest = history[0]
+    if not latest.next and not latest.values.get("error"):
+        return None
+    for snapshot in history:
+        if snapshot.next and not snapshot.values.get("error"):
+            return snapshot
+    raise KeyError(f"Aucune étape réussie à reprendre pour le run {run_id}")
+
+def resume_run(run_id: str) -> AgentState:
+    """Reprend un run échoué depuis sa dernière étape réussie, sans refaire l'amont (LLM, téléchargement)"""
+    if CHECKPOINTER is None:
+        raise RuntimeError("Points de reprise désactivés (CHECKPOINTS_ENABLED=false)")
+    
+    trace_context = create_trace_context(
+        name=f"resume_{run_id}",
+        tags=["agent_execution", "resume"],
+        metadata={"run_id": run_id}
+    )
+    
+    with trace_context or DummyContext():
+        snapshot = resume_point(run_id)
+        if snapshot is None:
+            log_debug(f"✅ Run {run_id} déjà terminé, rien à reprendre")
+            safe_trace_update(trace_context, outputs={"success": True, "resumed": False})
+            return DURABLE_GRAPH.get_state(run_config(run_id)).values
+    
+        config = snapshot.config
+        provisioned = snapshot.values.get("provisioned")
+        if provisioned and provisioned.get("error"):
+            # Provisioning parallèle en échec : le nœud d'écriture crée le sheet lui-même
+            config = DURABLE_GRAPH.update_state(config, {"provisioned": {}}, as_node="provision_sheet")
+    
+        log_debug(f"♻️ Reprise du run {run_id} à l'étape {', '.join(snapshot.next)}")
+        safe_trace_update(trace_context, inputs={"run_id": run_id, "next": list(snapshot.next)})
+        result = DURABLE_GRAPH.invoke(None, config)
+        safe_trace_update(trace_context, outputs={
+            "success": not result.get("error"),
+            "resumed": True,
+            "sheets_url": result.get("sheets_url"),
+            "error": result.get("error")
+        })
+        return result
+
+# =============================================================================
+# EXPORTS ASYNCHRONES (FILE DE JOBS)
+# =============================================================================
+
+def summarize_run(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Résumé sérialisable d'un run : identifiant de reprise, URL du sheet, réponse finale, lignes, erreur"""
+    messages = result.get("messages") or []
+    answer = messages[-1].content if messages and isinstance(messages[-1], AIMessage) else ""
+    rows = result.get("rows_exported")
+    if rows is None and result.get("processed_data") is not None:
+        rows = len(result["processed_data"])
+    return {
+        "run_id": result.get("run_id", ""),
+        "sheets_url": result.get("sheets_url", ""),
+        "answer": answer,
+        "rows": rows or 0,
+        "error": result.get("error", "")
+    }
+
+def run_export_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Exécute le run d'un job (run_id = id du job) ; une erreur du pipeline fait échouer le job
+
+    Un job repris après l'arrêt de son processus repart de son dernier point
+    de reprise plutôt que du début.
+    """
+    if job["attempts"] > 1 and CHECKPOINTER is not None and CHECKPOINTER.get_tuple(run_config(job["id"])):
+        result = resume_run(job["id"])
+    else:
+        result = run_agent_with_tracing(job["query"], run_name=f"job_{job['id']}", run_id=job["id"])
+    summary = summarize_run(result)
+    if summary["error"]:
+        raise RuntimeError(summary["error"])
+    return summary
+
+def create_job_queue(path: str = JOBS_DB, workers: int = JOB_WORKERS) -> JobQueue:
+    """File persistante des exports asynchrones (workers démarrés par l'appelant avec start())"""
+    return JobQueue(path, run_export_job, workers=workers, max_attempts=JOB_MAX_ATTEMPTS,
+                    lease_seconds=JOB_LEASE_SECONDS, log=log_debug)
+
 # =============================================================================
 # FONCTION DE TEST PRINCIPALE
 # =============================================================================
@@ -1107,10 +2144,14 @@ __all__ = [
     'AgentState', 
     'get_initial_state',
     'run_agent_with_tracing',
+    'resume_run',
     'parse_user_query',
     'fetch_api_data',
     'process_data', 
+    'aggregate_data',
+    'provision_google_sheet',
     'create_google_sheet',
+    'stream_export',
     'generate_response'
 ]
 
@@ -0,0 +1,274 @@
+"""
+Cache HTTP disque des réponses upstream
+
+Les corps des réponses GET sont stockés sur disque, par URL et paramètres.
+Une entrée encore fraîche (`Cache-Control: max-age`) est servie sans
+requête ; une entrée périmée est revalidée (`If-None-Match` /
+`If-Modified-Since`) et un 304 est servi depuis la copie locale. La taille
+totale est bornée, les entrées les moins récemment utilisées sont évincées.
+
+L'en-tête `X-Cache` de la réponse rendue indique HIT, REVALIDATED ou MISS.
+`min_fresh` prolonge la fraîcheur d'une entrée que l'appelant s'engage à
+revalider lui-même (préchargement périodique, voir `agent.prefetch`).
+Une réponse cacheable est lue en entier pour être stockée (pas d'arrêt
+anticipé du téléchargement) ; les runs suivants n'en paient plus le coût.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+
+from agent import codec
+
+INDEX_FILE = "index.json"
+
+# En-têtes conservés avec le corps (le reste est propre à la connexion ; le corps est stocké décompressé)
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Date")
+
+
+def cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Clé d'une requête : URL et paramètres triés"""
+    query = urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return hashlib.sha256(f"GET {url}?{query}".encode("utf-8")).hexdigest()
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Directives `Cache-Control` ("max-age=60, no-cache" -> {"max-age": "60", "no-cache": None})"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers) -> float:
+    """Durée de fraîcheur (s) d'une réponse : max-age, sinon Expires, sinon 0 (revalidation)"""
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives:
+        return 0.0
+    if directives.get("max-age"):
+        try:
+            return max(0.0, float(directives["max-age"]) - float(headers.get("Age") or 0))
+        except ValueError:
+            return 0.0
+    if headers.get("Expires"):
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+            date = parsedate_to_datetime(headers["Date"]).timestamp() if headers.get("Date") else time.time()
+            return max(0.0, expires - date)
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+
+def is_cacheable(response: requests.Response) -> bool:
+    """Réponse 200 stockable : ni no-store, et avec un validateur ou une durée de fraîcheur"""
+    if response.status_code != 200:
+        return False
+    if "no-store" in parse_cache_control(response.headers.get("Cache-Control")):
+        return False
+    return bool(response.headers.get("ETag") or response.headers.get("Last-Modified")
+                or freshness_lifetime(response.headers) > 0)
+
+
+class HTTPCache:
+    """Cache disque des réponses GET (revalidation conditionnelle, éviction LRU par taille)"""
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._entries: Dict[str, Dict[str, Any]] = self._load_index()
+
+    # ----- persistance ---------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._path(INDEX_FILE), "rb") as f:
+                entries = codec.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+        # Entrées dont le corps a disparu : ignorées
+        return {key: entry for key, entry in entries.items() if os.path.exists(self._path(f"{key}.body"))}
+
+    def _write_atomic(self, name: str, data: bytes):
+        temporary = self._path(f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, self._path(name))
+
+    def _save_index(self):
+        self._write_atomic(INDEX_FILE, codec.dumps_bytes(self._entries))
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de `max_bytes`"""
+        total = self.total_bytes
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries.pop(key)["size"]
+            try:
+                os.remove(self._path(f"{key}.body"))
+            except OSError:
+                pass
+
+    # ----- entrées -------------------------------------------------------
+
+    def lookup(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(cache_key(url, params))
+            return dict(entry) if entry else None
+
+    def expires_in(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """Secondes de fraîcheur restantes d'une entrée (négatif si périmée, None si absente)"""
+        entry = self.lookup(url, params)
+        return entry["expires"] - time.time() if entry else None
+
+    def store(self, url: str, params: Optional[Dict[str, Any]], response: requests.Response,
+              min_fresh: float = 0.0) -> bool:
+        """Stocke le corps d'une réponse cacheable ; retourne False si elle ne l'est pas"""
+        if not is_cacheable(response):
+            return False
+        body = response.content
+        if len(body) > self.max_bytes:
+            return False
+        key = cache_key(url, params)
+        now = time.time()
+        entry = {
+            "url": url,
+            "headers": {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            "encoding": response.encoding,
+            "size": len(body),
+            "stored_at": now,
+            "last_access": now,
+            "expires": now + max(freshness_lifetime(response.headers), min_fresh),
+        }
+        with self._lock:
+            self._write_atomic(f"{key}.body", body)
+            self._entries[key] = entry
+            self._evict()
+            self._save_index()
+        return True
+
+    def refresh(self, url: str, params: Optional[Dict[str, Any]], not_modified: requests.Response,
+                min_fresh: float = 0.0):
+        """Met à jour une entrée revalidée par un 304 (validateurs et fraîcheur)"""
+        key = cache_key(url, params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            for name in ("ETag", "Last-Modified", "Cache-Control", "Date"):
+                if name in not_modified.headers:
+                    entry["headers"][name] = not_modified.headers[name]
+            entry["expires"] = now + max(freshness_lifetime(entry["headers"]), min_fresh)
+            entry["last_access"] = now
+            self._save_index()
+
+    def touch(self, url: str, params: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            entry = self._entries.get(cache_key(url, params))
+            if entry is not None:
+                entry["last_access"] = time.time()
+                self._save_index()
+
+    def invalidate(self, url: Optional[str] = None, params: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            keys = list(self._entries) if url is None else [cache_key(url, params)]
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    try:
+                        os.remove(self._path(f"{key}.body"))
+                    except OSError:
+                        pass
+            self._save_index()
+
+    def build_response(self, url: str, params: Optional[Dict[str, Any]], entry: Dict[str, Any],
+                       status: str) -> Optional[requests.Response]:
+        """Réponse `requests` reconstruite depuis le disque (None si le corps a disparu)"""
+        try:
+            with open(self._path(f"{cache_key(url, params)}.body"), "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(entry["headers"])
+        response.headers["X-Cache"] = status
+        response.url = url
+        response.encoding = entry.get("encoding")
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    # ----- requête -------------------------------------------------------
+
+    def get(self, url: str, fetch: Callable[..., requests.Response], params: Optional[Dict[str, Any]] = None,
+            min_fresh: float = 0.0, **kwargs) -> requests.Response:
+        """GET via le cache : `fetch` (requests.get) n'est appelé que sur miss ou revalidation
+
+        `min_fresh` (s) : durée de fraîcheur minimale de l'entrée stockée ou revalidée.
+        """
+        entry = self.lookup(url, params)
+        if entry is not None and time.time() < entry["expires"]:
+            response = self.build_response(url, params, entry, "HIT")
+            if response is not None:
+                self.touch(url, params)
+                self.hits += 1
+                return response
+            entry = None
+
+        request_headers = kwargs.pop("headers", None)
+        headers = dict(request_headers or {})
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        response = fetch(url, params=params, headers=headers or None, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            cached = self.build_response(url, params, entry, "REVALIDATED")
+            if cached is not None:
+                response.close()
+                self.refresh(url, params, response, min_fresh)
+                self.revalidated += 1
+                return cached
+            # Corps disparu entre-temps : requête inconditionnelle
+            response = fetch(url, params=params, headers=request_headers, **kwargs)
+
+        self.misses += 1
+        if self.store(url, params, response, min_fresh):
+            response.headers["X-Cache"] = "MISS"
+        elif entry is not None and response.status_code == 200:
+            # La ressource n'est plus cacheable : l'ancienne copie ne doit plus être servie
+            self.invalidate(url, params)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
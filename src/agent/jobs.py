@@ -0,0 +1,282 @@
+"""
+File persistante des exports en arrière-plan
+
+Les runs demandés en mode asynchrone (outil MCP run_agent) sont inscrits
+dans une base SQLite avant d'être exécutés par un pool de threads workers :
+le serveur répond aussitôt avec l'identifiant du job, et un job accepté
+survit à l'arrêt du processus. Les workers prennent les jobs par priorité
+décroissante puis par ancienneté ; la prise est atomique (BEGIN IMMEDIATE),
+plusieurs processus peuvent donc vider la même file.
+
+Un job en cours est tenu par sa file (`hôte:pid:jeton`, le jeton aléatoire
+distinguant deux instances de même pid, comme un conteneur redémarré), qui
+renouvelle un battement périodique. Un job dont le battement date de plus
+de `lease_seconds` (ou dont le processus, sur la même machine, n'existe
+plus) est remis en file, dans la limite de `max_attempts` prises, puis
+marqué en échec.
+"""
+
+import contextlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from agent import codec
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+"""
+
+
+def _no_log(message: str):
+    pass
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Faux seulement si le processus propriétaire (`hôte:pid`, jeton ignoré), sur cette machine, n'existe plus"""
+    host, _, rest = (owner or "").partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Jobs d'export persistés en SQLite, exécutés par `workers` threads via `runner(job) -> résultat`"""
+
+    def __init__(self, path: str, runner: Callable[[Dict[str, Any]], Any], workers: int = 2,
+                 max_attempts: int = 3, lease_seconds: float = 300.0, poll_interval: float = 2.0,
+                 log: Callable[[str], None] = _no_log):
+        self.path = path
+        self.runner = runner
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.log = log
+        # Jeton propre à l'instance : un processus redémarré avec le même pid ne reprend pas les baux du précédent
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._local = threading.local()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    # ----- base SQLite -----------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (sqlite3 interdit le partage entre threads)
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["result"] = codec.loads(job["result"]) if job["result"] else None
+        return job
+
+    # ----- soumission et statut --------------------------------------------
+
+    def submit(self, query: str, priority: int = 0) -> str:
+        """Inscrit un export ; retourne l'identifiant du job (priorité haute servie d'abord)"""
+        job_id = uuid.uuid4().hex[:12]
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, query, priority, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, query, int(priority), time.time())
+            )
+        with self._condition:
+            self._condition.notify()
+        self.log(f"📥 Job {job_id} en file (priorité {priority}): {query}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def recent(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Jobs les plus récents, éventuellement d'un seul statut"""
+        if status:
+            rows = self._connection().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Rang d'un job en file (1 = prochain servi), None s'il n'est pas en file"""
+        job = self.get(job_id)
+        if job is None or job["status"] != "queued":
+            return None
+        (ahead,) = self._connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+            "(priority > ? OR (priority = ? AND created_at < ?))",
+            (job["priority"], job["priority"], job["created_at"])
+        ).fetchone()
+        return ahead + 1
+
+    # ----- exécution -------------------------------------------------------
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, started_at = ?, "
+                "attempts = attempts + 1, error = NULL WHERE id = ?",
+                (self.owner, now, now, row["id"])
+            )
+            return self._job(connection.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def _finish(self, job_id: str, result: Any = None, error: Optional[str] = None):
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL "
+                "WHERE id = ? AND owner = ?",
+                ("failed" if error else "done", codec.dumps(result, default=str) if result is not None else None,
+                 error, time.time(), job_id, self.owner)
+            )
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as claim_error:
+                self.log(f"⚠️ File de jobs indisponible: {claim_error}")
+                job = None
+            if job is None:
+                with self._condition:
+                    self._condition.wait(self.poll_interval)
+                continue
+            self.log(f"▶️ Job {job['id']} (essai {job['attempts']}): {job['query']}")
+            try:
+                result = self.runner(job)
+            except Exception as job_error:
+                self._finish(job["id"], error=str(job_error))
+                self.log(f"❌ Job {job['id']} en échec: {job_error}")
+            else:
+                self._finish(job["id"], result=result)
+                self.log(f"✅ Job {job['id']} terminé")
+
+    # ----- baux et reprise -------------------------------------------------
+
+    def heartbeat(self):
+        """Renouvelle le bail des jobs en cours de ce processus"""
+        with self._transaction() as connection:
+            connection.execute("UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND owner = ?",
+                               (time.time(), self.owner))
+
+    def recover(self) -> int:
+        """Remet en file (ou en échec, après `max_attempts` prises) les jobs dont le processus a disparu"""
+        expired = time.time() - self.lease_seconds
+        recovered = 0
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, owner, heartbeat, attempts FROM jobs WHERE status = 'running' AND owner != ?",
+                (self.owner,)
+            ).fetchall()
+            for row in rows:
+                if (row["heartbeat"] or 0) >= expired and _owner_alive(row["owner"]):
+                    continue
+                if row["attempts"] < self.max_attempts:
+                    connection.execute("UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ?", (row["id"],))
+                else:
+                    connection.execute(
+                        "UPDATE jobs SET status = 'failed', owner = NULL, finished_at = ?, error = ? WHERE id = ?",
+                        (time.time(), f"Processus arrêté pendant le run ({row['attempts']} essai(s))", row["id"])
+                    )
+                recovered += 1
+        if recovered:
+            self.log(f"♻️ {recovered} job(s) abandonné(s) repris")
+            with self._condition:
+                self._condition.notify_all()
+        return recovered
+
+    def _maintain(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.heartbeat()
+                self.recover()
+            except sqlite3.Error as maintain_error:
+                self.log(f"⚠️ Maintenance de la file de jobs: {maintain_error}")
+
+    # ----- cycle de vie ----------------------------------------------------
+
+    def start(self) -> "JobQueue":
+        if self._threads:
+            return self
+        self._stop.clear()
+        self.recover()
+        targets = [(self._maintain, "job-lease")]
+        targets += [(self._work, f"job-worker-{index}") for index in range(self.workers)]
+        for target, name in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Arrête les workers après leur job en cours ; les jobs en file restent inscrits"""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
@@ -0,0 +1,105 @@
+"""
+Enrichissement multi-sources : URLs des ressources liées et hash join
+
+Une requête comme "les posts avec le nom et l'email de l'auteur" demande
+`posts` et `users` de la même API, joints sur `userId` -> `id`. Les sources
+sont récupérées en parallèle par fetch_api_data ; process_data indexe le
+plus petit côté dans une table de hachage et parcourt l'autre en flux.
+
+Les champs de la source jointe sont imbriqués sous son nom
+(`{"users": {...}}`), ce qui permet de les projeter avec des chemins
+comme `users.name` ou `users.address.city`.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+def resource_name(url: str) -> str:
+    """Nom de la ressource d'une URL (`.../posts?x=1` -> `posts`)"""
+    path = urlsplit(url).path.rstrip("/")
+    return path.rsplit("/", 1)[-1]
+
+
+def source_url(api_url: str, resource: str) -> str:
+    """URL d'une ressource sœur sur la même API (`.../posts` -> `.../users`)"""
+    scheme, netloc, path, _, _ = urlsplit(api_url)
+    base = path.rstrip("/").rsplit("/", 1)[0]
+    return urlunsplit((scheme, netloc, f"{base}/{resource}", "", ""))
+
+
+def normalize_joins(spec: Any) -> List[Dict[str, Optional[str]]]:
+    """Normalise `joins` ("users", ["users"], [{"resource": "users", "left_on": ...}])"""
+    if not spec:
+        return []
+    items = spec if isinstance(spec, list) else [spec]
+    joins = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"resource": item}
+        if not isinstance(item, dict):
+            raise ValueError(f"Jointure invalide: {item!r}")
+        resource = item.get("resource") or item.get("source") or item.get("name")
+        if not isinstance(resource, str) or not resource.strip():
+            raise ValueError(f"Jointure sans ressource: {item!r}")
+        joins.append({
+            "resource": resource.strip().strip("/"),
+            "left_on": item.get("left_on"),
+            "right_on": item.get("right_on"),
+        })
+    return joins
+
+
+def resolve_join_keys(join: Dict[str, Optional[str]], primary: str,
+                      relations: Dict[Tuple[str, str], Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    """Clés (gauche, droite) d'une jointure : explicites ou déduites des relations connues"""
+    if join.get("left_on") and join.get("right_on"):
+        return join["left_on"], join["right_on"]
+    return relations.get((primary, join["resource"]))
+
+
+def _key(value: Any) -> Any:
+    # "3" et 3 désignent la même clé (APIs qui mélangent texte et nombre)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def hash_join(left: Sequence[Dict[str, Any]], right: Sequence[Dict[str, Any]],
+              left_on: str, right_on: str, name: str) -> List[Dict[str, Any]]:
+    """Jointure externe gauche ; la source droite est imbriquée sous `name`
+
+    La table de hachage est construite sur le plus petit des deux côtés ;
+    l'ordre des lignes de gauche est conservé et une ligne de gauche sans
+    correspondance est gardée (champs joints vides). Comme en SQL, une clé
+    absente (None) ne correspond à rien.
+    """
+    if len(right) <= len(left):
+        # Index sur la droite, la gauche est parcourue en flux
+        index: Dict[Any, List[Dict[str, Any]]] = {}
+        for record in right:
+            key = _key(record.get(right_on))
+            if key is not None:
+                index.setdefault(key, []).append(record)
+        matches = [index.get(_key(record.get(left_on))) for record in left]
+    else:
+        # Index sur la gauche (positions), la droite est parcourue en flux
+        positions: Dict[Any, List[int]] = {}
+        for position, record in enumerate(left):
+            key = _key(record.get(left_on))
+            if key is not None:
+                positions.setdefault(key, []).append(position)
+        matches = [None] * len(left)
+        for record in right:
+            for position in positions.get(_key(record.get(right_on)), ()):
+                if matches[position] is None:
+                    matches[position] = []
+                matches[position].append(record)
+
+    joined = []
+    for record, found in zip(left, matches):
+        if not found:
+            joined.append({**record, name: None})
+        else:
+            joined.extend({**record, name: match} for match in found)
+    return joined
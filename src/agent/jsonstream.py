@@ -0,0 +1,160 @@
+"""
+Parsing JSON incrémental des réponses upstream
+
+`response.json()` construit tout le graphe d'objets avant le moindre filtre
+ou limite. Pour une réponse tableau (`[{...}, {...}, ...]`), ce module
+itère sur les éléments au fil du flux HTTP : filtre et limite s'appliquent
+pendant le téléchargement et la connexion est fermée dès que assez de
+lignes ont été collectées.
+
+Décodeur : `ijson` (backend C yajl2 quand il est compilé) s'il est installé,
+sinon le scanner C de la stdlib (`JSONDecoder.scan_once`) sur un tampon texte.
+Une réponse qui n'est pas un tableau est décodée en une fois par le codec
+(`agent.codec`), de même qu'une réponse dont toutes les lignes seront lues.
+"""
+
+import codecs
+import json
+import re
+from itertools import chain
+from typing import Any, Iterable, Iterator, List
+
+from agent import codec
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    ijson = None
+    IJSON_AVAILABLE = False
+
+CHUNK_SIZE = 64 * 1024
+
+_DELIMITERS = " \t\n\r,]"
+_SEPARATORS = re.compile(r"[ \t\n\r,]*")
+
+
+class _ChunkReader:
+    """Adaptateur fichier (`read`) sur un itérateur de blocs d'octets, pour ijson"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _iter_stdlib(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Éléments d'un tableau JSON via le scanner stdlib (tampon texte borné par un élément)"""
+    # scan_once : scanner C de json, sans l'enveloppe Python de raw_decode
+    scan_once = json.JSONDecoder().scan_once
+    skip = _SEPARATORS.match
+    # utf-8-sig : un BOM initial n'arrive pas dans le tampon (comme avec response.json())
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    started = False
+    chunks = iter(chunks)
+    eof = False
+
+    while True:
+        position = skip(buffer, position).end()
+        if not started and position < len(buffer):
+            if buffer[position] != "[":
+                raise ValueError("La réponse n'est pas un tableau JSON")
+            started = True
+            position = skip(buffer, position + 1).end()
+
+        # Éléments complets du tampon ; un élément n'est complet que suivi d'un
+        # séparateur ("1e" de "1e-07" est tronqué)
+        length = len(buffer)
+        while started and position < length:
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = scan_once(buffer, position)
+            except (StopIteration, json.JSONDecodeError):
+                if eof:
+                    raise json.JSONDecodeError("Élément JSON invalide", buffer, position) from None
+                break
+            if end < length and buffer[end] in _DELIMITERS or eof:
+                yield item
+                position = skip(buffer, end).end()
+            else:
+                break
+
+        if eof:
+            if started:
+                raise ValueError("Tableau JSON incomplet")
+            return
+        # Seule la partie non encore décodée du tampon est conservée
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buffer = buffer[position:] + utf8.decode(chunk or b"", final=eof)
+        position = 0
+
+
+def _first_significant_byte(chunks: Iterator[bytes]):
+    """Premier octet non blanc et blocs lus pour le trouver (à rejouer)"""
+    consumed: List[bytes] = []
+    for chunk in chunks:
+        consumed.append(chunk)
+        stripped = chunk.lstrip(b" \t\n\r\xef\xbb\xbf")
+        if stripped:
+            return stripped[:1], consumed
+    return b"", consumed
+
+
+def _document_items(document: Any) -> Iterator[Any]:
+    if isinstance(document, list):
+        yield from document
+    elif document is not None:
+        yield document
+
+
+def iter_json_items(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Itère sur les éléments d'un document JSON reçu par blocs
+
+    Tableau : éléments décodés un à un. Autre document : décodé en une fois,
+    puis ses éléments s'il s'agit d'une liste, sinon le document lui-même.
+    """
+    chunks = iter(chunks)
+    first, consumed = _first_significant_byte(chunks)
+    head = b"".join(consumed)
+    if head.startswith(codecs.BOM_UTF8):
+        head = head[len(codecs.BOM_UTF8):]
+    stream = chain([head], chunks)
+    if first != b"[":
+        yield from _document_items(codec.loads(b"".join(stream) or b"null"))
+        return
+    if IJSON_AVAILABLE:
+        yield from ijson.items(_ChunkReader(stream), "item", use_float=True)
+    else:
+        yield from _iter_stdlib(stream)
+
+
+def iter_response_items(response, chunk_size: int = CHUNK_SIZE, incremental: bool = True) -> Iterator[Any]:
+    """Éléments d'une réponse `requests` (idéalement obtenue avec `stream=True`)
+
+    Fermer le générateur (ou arrêter de l'itérer puis appeler
+    `response.close()`) interrompt le téléchargement. `incremental=False`
+    décode le corps en une fois avec le codec : plus rapide quand toutes
+    les lignes seront consommées.
+    """
+    try:
+        if incremental:
+            yield from iter_json_items(response.iter_content(chunk_size=chunk_size))
+        else:
+            yield from _document_items(codec.loads(response.content or b"null"))
+    finally:
+        response.close()
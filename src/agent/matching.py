@@ -0,0 +1,164 @@
+"""
+Détection de mots-clés compilée pour le parsing des requêtes
+
+Les tables de mots-clés (champs, restrictions, ...) sont compilées une seule
+fois en un trie de tokens. Une requête est normalisée (minuscules, sans
+accents), découpée en tokens puis parcourue en une seule passe : le coût
+dépend de la longueur de la requête, pas de la taille du vocabulaire.
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Tokens mémorisés par nœud (mots-clés dont ils prolongent le préfixe) ; borne par nœud
+PREFIX_CACHE_SIZE = 4096
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+# Table précalculée pour les lettres latines accentuées (chemin rapide via str.translate)
+_ACCENT_TABLE = {
+    code: _strip_accents(chr(code))
+    for code in range(0x00C0, 0x0250)
+    if _strip_accents(chr(code)) != chr(code)
+}
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules et suppression des accents ("Récupère" -> "recupere")"""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    text = text.translate(_ACCENT_TABLE)
+    return text if text.isascii() else _strip_accents(text)
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte normalisé en tokens (frontières de mots)"""
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact_groups", "prefix_groups", "groups", "prefix_lengths", "terminal_lengths",
+                 "prefix_tokens", "terminal_tokens", "prefix_hits", "loose_hits")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.exact_groups: set = set()
+        self.prefix_groups: set = set()
+        # Union des deux : groupes trouvés quand un mot-clé se termine exactement ici
+        self.groups: frozenset = frozenset()
+        # Longueurs des tokens enfants terminant un mot-clé (préfixe / tous)
+        self.prefix_lengths: set = set()
+        self.terminal_lengths: set = set()
+        # Mêmes tokens en tuples (filtre str.startswith de prefix_matches)
+        self.prefix_tokens: tuple = ()
+        self.terminal_tokens: tuple = ()
+        # token -> groupes des mots-clés dont il prolonge le dernier token (strict / loose)
+        self.prefix_hits: Dict[str, frozenset] = {}
+        self.loose_hits: Dict[str, frozenset] = {}
+
+    def prefix_matches(self, token: str, loose: bool) -> frozenset:
+        """Groupes des mots-clés se terminant ici par un préfixe strict de `token`"""
+        cache = self.loose_hits if loose else self.prefix_hits
+        hits = cache.get(token)
+        if hits is not None:
+            return hits
+        hits = frozenset()
+        # La plupart des tokens ne commencent par aucun mot-clé : pas de découpage par longueur
+        if token.startswith(self.terminal_tokens if loose else self.prefix_tokens):
+            found = set()
+            for length in (self.terminal_lengths if loose else self.prefix_lengths):
+                if length < len(token):
+                    child = self.children.get(token[:length])
+                    if child is not None:
+                        found.update(child.prefix_groups)
+                        if loose:
+                            found.update(child.exact_groups)
+            hits = frozenset(found)
+        if len(cache) < PREFIX_CACHE_SIZE:
+            cache[token] = hits
+        return hits
+
+
+class KeywordMatcher:
+    """Matcher multi-motifs : groupe -> mots-clés (un ou plusieurs mots)
+
+    - Correspondance exacte : le mot-clé doit couvrir des tokens entiers
+      ("id" trouve "id" mais pas "userid").
+    - Correspondance par préfixe (groupes `prefix=True` ou `loose=True`) :
+      le dernier token du mot-clé peut être un préfixe du token de la requête
+      ("user" trouve "users", "titre" trouve "titres").
+    """
+
+    def __init__(self, groups: Optional[Dict[str, Iterable[str]]] = None):
+        self._root = _TrieNode()
+        self._group_index: Dict[str, int] = {}
+        for group, keywords in (groups or {}).items():
+            self.add(group, keywords)
+
+    def add(self, group: str, keywords: Iterable[str], prefix: bool = False):
+        """Ajoute des mots-clés à un groupe (le matcher reste extensible après compilation)"""
+        self._group_index.setdefault(group, len(self._group_index))
+        for keyword in keywords:
+            tokens = tokenize(keyword)
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                parent, node = node, node.children.setdefault(token, _TrieNode())
+            parent.terminal_lengths.add(len(tokens[-1]))
+            if tokens[-1] not in parent.terminal_tokens:
+                parent.terminal_tokens += (tokens[-1],)
+            if prefix:
+                parent.prefix_lengths.add(len(tokens[-1]))
+                if tokens[-1] not in parent.prefix_tokens:
+                    parent.prefix_tokens += (tokens[-1],)
+            parent.prefix_hits.clear()
+            parent.loose_hits.clear()
+            (node.prefix_groups if prefix else node.exact_groups).add(group)
+            node.groups = frozenset(node.exact_groups | node.prefix_groups)
+        return self
+
+    @property
+    def groups(self) -> List[str]:
+        return list(self._group_index)
+
+    def match(self, text: Union[str, Sequence[str]], loose: bool = False) -> List[str]:
+        """Retourne les groupes trouvés dans le texte, dans l'ordre de déclaration
+
+        `text` peut être une liste de tokens déjà produite par `tokenize`, pour
+        ne normaliser qu'une fois une requête passée à plusieurs matchers.
+        """
+        tokens = tokenize(text) if isinstance(text, str) else text
+        found = set()
+        root = self._root
+        count = len(tokens)
+
+        for start, token in enumerate(tokens):
+            node = root
+            position = start
+            while True:
+                # Préfixes stricts du token : seuls les mots-clés "préfixe" terminent ici
+                hits = (node.loose_hits if loose else node.prefix_hits).get(token)
+                if hits is None:
+                    hits = node.prefix_matches(token, loose)
+                if hits:
+                    found.update(hits)
+                node = node.children.get(token)
+                if node is None:
+                    break
+                if node.groups:
+                    found.update(node.groups)
+                position += 1
+                if not node.children or position == count:
+                    break
+                token = tokens[position]
+
+        return sorted(found, key=self._group_index.__getitem__)
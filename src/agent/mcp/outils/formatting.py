@@ -9,13 +9,16 @@ def format_success_response(result: Dict[str, Any]) -> str:
     """Formate une réponse de succès pour MCP"""
     
     params = result.get("extracted_params", {})
-    processed_data = result.get("processed_data", [])
+    exported_count = result.get("rows_exported")
+    if exported_count is None:
+        # L'export en flux laisse processed_data à None et renseigne rows_exported
+        exported_count = len(result.get("processed_data") or [])
     sheets_url = result.get("sheets_url", "Non disponible")
     
     return f"""✅ Tâche terminée avec succès !
 
 📊 **Données récupérées:**
-- {len(processed_data)} éléments traités
+- {exported_count} éléments traités
 - Champs extraits: {', '.join(params.get('fields', ['tous']))}
 - Limite appliquée: {params.get('limit', 10)}
 
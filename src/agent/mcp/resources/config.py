@@ -2,11 +2,12 @@
 Ressources de configuration MCP
 """
 
-import json
 import os
 from typing import List
 from mcp.types import Resource
 
+from agent import codec
+
 class ConfigResources:
     def __init__(self, server):
         self.server = server
@@ -59,7 +60,7 @@ class ConfigResources:
                         "LANGSMITH_API_KEY": "✅" if os.getenv("LANGSMITH_API_KEY") else "❌"
                     }
                 }
-                return json.dumps(config, indent=2)
+                return codec.dumps(config, indent=True)
             
             elif uri == "config://api-fields":
                 fields_info = {
@@ -76,21 +77,13 @@ class ConfigResources:
                         "prends 3 posts avec seulement le title"
                     ]
                 }
-                return json.dumps(fields_info, indent=2)
+                return codec.dumps(fields_info, indent=True)
             
             elif uri == "state://current-state":
                 from agent.graph import get_initial_state
                 initial_state = get_initial_state()
-                # Convertir en dict sérialisable
-                serializable_state = {}
-                for key, value in initial_state.items():
-                    try:
-                        json.dumps(value)  # Test de sérialisation
-                        serializable_state[key] = value
-                    except:
-                        serializable_state[key] = str(value)
-                
-                return json.dumps(serializable_state, indent=2, default=str)
+                # Une seule sérialisation : les valeurs non sérialisables deviennent str(value)
+                return codec.dumps(initial_state, indent=True, default=str)
             
             else:
                 raise ValueError(f"Ressource inconnue: {uri}")
@@ -100,4 +93,4 @@ class ConfigResources:
                 "error": f"Erreur lors de la lecture de la ressource: {str(e)}",
                 "uri": uri
             }
-            return json.dumps(error_response, indent=2)
\ No newline at end of file
+            return codec.dumps(error_response, indent=True)
\ No newline at end of file
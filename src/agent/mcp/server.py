@@ -5,9 +5,10 @@ Serveur MCP complet avec Agent LangGraph
 
 import asyncio
 import sys
-import json
 import requests
 import os
+import threading
+from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -18,9 +19,20 @@ src_path = project_root / "src"
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(src_path))
 
+from agent import codec
+
+# Flux JSON-RPC réservé aux réponses : les logs de l'agent et des workers de jobs vont sur stderr
+PROTOCOL_STDOUT = sys.stdout
+
 def send_message(message: dict):
-    json_str = json.dumps(message)
-    print(json_str, flush=True)
+    """Écrit une réponse JSON-RPC sur une ligne (octets UTF-8 directement sur stdout)"""
+    stdout = getattr(PROTOCOL_STDOUT, "buffer", None)
+    if stdout is None:
+        print(codec.dumps(message), file=PROTOCOL_STDOUT, flush=True)
+        return
+    PROTOCOL_STDOUT.flush()
+    stdout.write(codec.dumps_bytes(message) + b"\n")
+    stdout.flush()
 
 def log_to_stderr(message: str):
     print(f"[DEBUG] {message}", file=sys.stderr, flush=True)
@@ -85,7 +97,7 @@ def make_api_request(endpoint: str, limit: int = 10) -> List[Dict]:
         url = f"https://jsonplaceholder.typicode.com/{endpoint}"
         response = requests.get(url, params={'_limit': limit}, timeout=10)
         response.raise_for_status()
-        data = response.json()
+        data = codec.loads(response.content)
         
         if isinstance(data, list):
             return data[:limit]
@@ -126,6 +138,84 @@ def run_agent_safely(query: str) -> dict:
         log_to_stderr(f"❌ Erreur agent: {e}")
         return {"error": str(e)}
 
+def resume_run_safely(run_id: str) -> dict:
+    """Reprend un run échoué depuis son dernier point de reprise"""
+    if not AGENT_AVAILABLE:
+        return {"error": "Agent LangGraph non disponible"}
+    
+    try:
+        original_stdout = sys.stdout
+        sys.stdout = sys.stderr
+        
+        log_to_stderr(f"♻️ Reprise du run: {run_id}")
+        result = agent_module.resume_run(run_id)
+        
+        sys.stdout = original_stdout
+        return {"success": True, "result": result}
+        
+    except KeyError as e:
+        sys.stdout = original_stdout
+        return {"error": e.args[0] if e.args else str(e)}
+    except Exception as e:
+        sys.stdout = original_stdout
+        log_to_stderr(f"❌ Erreur reprise: {e}")
+        return {"error": str(e)}
+
+def resume_hint(run_id: str) -> str:
+    return f"💡 Reprenez depuis la dernière étape réussie avec `resume_run run_id=\"{run_id}\"`"
+
+# =============================================================================
+# EXPORTS ASYNCHRONES (FILE DE JOBS)
+# =============================================================================
+
+JOB_QUEUE = None
+_job_queue_lock = threading.Lock()
+
+JOB_STATUS_ICONS = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}
+
+def get_job_queue():
+    """File persistante des exports, créée et démarrée au premier usage"""
+    global JOB_QUEUE
+    with _job_queue_lock:
+        if JOB_QUEUE is None:
+            JOB_QUEUE = agent_module.create_job_queue().start()
+    return JOB_QUEUE
+
+def format_timestamp(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else "-"
+
+def format_job(job: dict, position=None) -> str:
+    """Statut d'un job en texte MCP"""
+    icon = JOB_STATUS_ICONS.get(job["status"], "•")
+    content = f"{icon} **Job {job['id']}** — {job['status']}\n"
+    content += f"   📋 {job['query']}\n"
+    content += f"   🔢 Priorité: {job['priority']} | Essais: {job['attempts']}\n"
+    content += f"   🕒 Créé: {format_timestamp(job['created_at'])}"
+    if job.get("started_at"):
+        content += f" | Démarré: {format_timestamp(job['started_at'])}"
+    if job.get("finished_at") and job.get("started_at"):
+        content += f" | Durée: {job['finished_at'] - job['started_at']:.1f}s"
+    content += "\n"
+    if position:
+        content += f"   📍 Position dans la file: {position}\n"
+    result = job.get("result") or {}
+    if result.get("sheets_url"):
+        content += f"   🔗 {result['sheets_url']} ({result.get('rows', 0)} lignes)\n"
+    if job.get("error"):
+        content += f"   ❌ {job['error']}\n"
+        if job["status"] == "failed":
+            content += f"   {resume_hint(job['id'])}\n"
+    return content
+
+def text_response(request_id, content: str) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {
+            "content": [{"type": "text", "text": content}]
+        }
+    }
+
 async def handle_request(request: dict) -> dict:
     """Traite une requête MCP"""
     method = request.get("method")
@@ -211,11 +301,71 @@ async def handle_request(request: dict) -> dict:
                         "query": {
                             "type": "string",
                             "description": "Requête à traiter par l'agent (ex: 'récupère 5 posts et sauvegarde dans une feuille')"
+                        },
+                        "async": {
+                            "type": "boolean",
+                            "description": "Met l'export en file et retourne aussitôt un identifiant de job (suivi avec get_job_status)",
+                            "default": False
+                        },
+                        "priority": {
+                            "type": "integer",
+                            "description": "Priorité du job en mode async (les plus hautes passent d'abord)",
+                            "default": 0
                         }
                     },
                     "required": ["query"]
                 }
             })
+            tools.append({
+                "name": "resume_run",
+                "description": "Reprend un run en échec depuis sa dernière étape réussie (sans nouvel appel LLM ni nouveau téléchargement)",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "run_id": {
+                            "type": "string",
+                            "description": "Identifiant du run (affiché par run_agent, ou identifiant du job pour un export async)"
+                        }
+                    },
+                    "required": ["run_id"]
+                }
+            })
+            tools.append({
+                "name": "get_job_status",
+                "description": "Statut d'un export lancé avec run_agent async=true (file, en cours, terminé avec l'URL, en échec)",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "Identifiant retourné par run_agent"
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            })
+            tools.append({
+                "name": "list_jobs",
+                "description": "Liste les exports asynchrones les plus récents",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "status": {
+                            "type": "string",
+                            "description": "Filtre sur le statut",
+                            "enum": ["queued", "running", "done", "failed"]
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Nombre de jobs (1-100)",
+                            "default": 20,
+                            "minimum": 1,
+                            "maximum": 100
+                        }
+                    },
+                    "required": []
+                }
+            })
         
         # Ajouter les outils Google Sheets si disponibles
         if GOOGLE_SHEETS_AVAILABLE and check_google_credentials():
@@ -264,6 +414,8 @@ async def handle_request(request: dict) -> dict:
 - `get_posts limit=3` - Récupérer des posts
 - `get_users limit=3` - Récupérer des utilisateurs
 {'- `run_agent query="récupère 5 posts et sauvegarde dans une feuille"` - Agent complet !' if AGENT_AVAILABLE else ''}
+{'- `run_agent query="..." async=true` puis `get_job_status job_id="..."` - Exports en file' if AGENT_AVAILABLE else ''}
+{'- `resume_run run_id="..."` - Reprise des runs en échec' if AGENT_AVAILABLE else ''}
 {'- `create_sheet title="Test"` - Créer une feuille simple' if (GOOGLE_SHEETS_AVAILABLE and check_google_credentials()) else ''}
 
 🚀 **Agent LangGraph intégré:** Pipeline complet API → Google Sheets disponible !"""
@@ -326,13 +478,28 @@ async def handle_request(request: dict) -> dict:
             
             if not query:
                 content = "❌ Veuillez fournir une requête pour l'agent"
+            elif arguments.get("async") and AGENT_AVAILABLE:
+                job_queue = get_job_queue()
+                job_id = job_queue.submit(query, priority=int(arguments.get("priority", 0)))
+                position = job_queue.position(job_id)
+                content = f"""📥 **EXPORT MIS EN FILE**
+
+🆔 **Job:** {job_id}
+{f'📍 **Position dans la file:** {position}' if position else '⚙️ **Export démarré**'}
+
+💡 Suivez l'export avec `get_job_status job_id="{job_id}"`"""
             else:
                 result = run_agent_safely(query)
                 
                 if result.get("success"):
                     agent_result = result["result"]
                     
-                    if isinstance(agent_result, dict):
+                    if isinstance(agent_result, dict) and agent_result.get('error') and agent_result.get('run_id'):
+                        content = f"""❌ **Erreur de l'agent:** {agent_result['error']}
+
+🆔 **Run:** {agent_result['run_id']}
+{resume_hint(agent_result['run_id'])}"""
+                    elif isinstance(agent_result, dict):
                         final_answer = agent_result.get('final_answer', str(agent_result))
                         sheets_url = agent_result.get('sheets_url', '')
                         
@@ -362,6 +529,52 @@ async def handle_request(request: dict) -> dict:
                 }
             }
         
+        elif tool_name in ("resume_run", "get_job_status", "list_jobs") and not AGENT_AVAILABLE:
+            return text_response(request_id, "❌ Agent LangGraph non disponible")
+        
+        elif tool_name == "resume_run":
+            run_id = arguments.get("run_id", "")
+            result = resume_run_safely(run_id) if run_id else {"error": "Veuillez fournir un run_id"}
+            
+            if result.get("success"):
+                summary = agent_module.summarize_run(result["result"])
+                if summary["error"]:
+                    content = f"❌ **Reprise du run {run_id} en échec:** {summary['error']}\n\n{resume_hint(run_id)}"
+                else:
+                    content = f"""♻️ **RUN {run_id} REPRIS ET TERMINÉ**
+
+📋 **Résultat:**
+{summary['answer']}
+
+🔗 **Feuille Google Sheets:**
+{summary['sheets_url']}"""
+            else:
+                content = f"❌ **Reprise impossible:** {result.get('error')}"
+            
+            return text_response(request_id, content)
+        
+        elif tool_name == "get_job_status":
+            job_queue = get_job_queue()
+            job = job_queue.get(arguments.get("job_id", ""))
+            if job is None:
+                content = f"❌ Job inconnu: {arguments.get('job_id')}"
+            else:
+                content = format_job(job, job_queue.position(job["id"]))
+            
+            return text_response(request_id, content)
+        
+        elif tool_name == "list_jobs":
+            job_queue = get_job_queue()
+            limit = max(1, min(100, int(arguments.get("limit", 20))))
+            jobs = job_queue.recent(arguments.get("status"), limit)
+            counts = job_queue.counts()
+            
+            content = "📦 **Exports asynchrones:** " + (", ".join(f"{JOB_STATUS_ICONS.get(status, '•')} {status}: {count}"
+                                                              for status, count in sorted(counts.items())) or "aucun") + "\n\n"
+            content += "\n".join(format_job(job) for job in jobs) if jobs else "Aucun job à afficher"
+            
+            return text_response(request_id, content)
+        
         elif tool_name == "create_sheet":
             content = "❌ Fonctionnalité Google Sheets en cours de correction (problème OAuth)\n\n💡 **Alternative:** Utilisez `run_agent` qui inclut la création de feuilles avec votre agent LangGraph complet !"
             
@@ -400,10 +613,19 @@ async def main():
     log_to_stderr(f"🤖 Agent: {'✅' if AGENT_AVAILABLE else '❌'}")
     log_to_stderr(f"📊 Google Sheets: {'✅' if (GOOGLE_SHEETS_AVAILABLE and check_google_credentials()) else '❌'}")
     
+    # stdout reste réservé au protocole, y compris pendant les exports des workers
+    sys.stdout = sys.stderr
+    if AGENT_AVAILABLE:
+        # Reprise des jobs laissés en file (ou interrompus) par un arrêt précédent
+        counts = get_job_queue().counts()
+        log_to_stderr(f"📦 File de jobs: {counts.get('queued', 0)} en attente")
+    
+    # Lignes lues en octets : le codec décode l'UTF-8 lui-même
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
     try:
         while True:
             try:
-                line = sys.stdin.readline()
+                line = stdin.readline()
                 if not line:
                     break
                 
@@ -412,9 +634,9 @@ async def main():
                     continue
                 
                 try:
-                    request = json.loads(line)
+                    request = codec.loads(line)
                     log_to_stderr(f"Requête parsée: {request.get('method')}")
-                except json.JSONDecodeError as e:
+                except codec.JSONDecodeError as e:
                     log_to_stderr(f"Erreur JSON: {e}")
                     continue
                 
@@ -0,0 +1,244 @@
+"""
+Préchargement prédictif des endpoints les plus demandés
+
+Chaque récupération de fetch_api_data est enregistrée dans un historique
+(cible : URL et paramètres de la requête upstream, ou instantané d'une
+collection ; forme des filtres). La fréquence de chaque cible décroît
+exponentiellement (demi-vie configurable). Un thread d'arrière-plan
+rafraîchit périodiquement les cibles les plus chaudes dans le cache local
+(cache HTTP ou instantanés) avant que les requêtes n'arrivent, dans la
+limite d'un budget d'octets par heure et de requêtes par minute.
+
+L'historique est persisté : au démarrage d'un processus, les cibles
+chaudes des runs précédents sont préchargées avant la première requête.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent import codec
+from agent.filters import Comparison, FilterError, parse_filter
+
+# Cibles en dessous de ce score (≈ une requête il y a plusieurs demi-vies) : jamais préchargées
+MIN_SCORE = 0.5
+
+
+def target_key(target: Dict[str, Any]) -> str:
+    """Clé canonique d'une cible ({"kind": "http", "url": ..., "params": {...}})"""
+    return codec.dumps(target, sort_keys=True, default=str)
+
+
+def filter_shape(spec: Any) -> str:
+    """Forme d'une spécification de filtres, sans les valeurs ("id:gte,userId:eq")"""
+    try:
+        node = parse_filter(spec)
+    except FilterError:
+        return "invalid"
+    comparisons = set()
+
+    def visit(current):
+        if current is None:
+            return
+        if isinstance(current, Comparison):
+            comparisons.add(f"{current.field}:{current.op}")
+            return
+        kind, children = current
+        for child in (children,) if kind == "not" else children:
+            visit(child)
+
+    visit(node)
+    return ",".join(sorted(comparisons))
+
+
+# =============================================================================
+# HISTORIQUE DES ACCÈS
+# =============================================================================
+
+class AccessHistory:
+    """Fréquences décroissantes des cibles upstream, persistées en JSON"""
+
+    def __init__(self, path: Optional[str] = None, half_life: float = 86400.0):
+        self.path = path
+        self.half_life = half_life
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            self.load()
+
+    def _decayed(self, entry: Dict[str, Any], now: float) -> float:
+        return entry["score"] * 0.5 ** ((now - entry["last_seen"]) / self.half_life)
+
+    def record(self, target: Dict[str, Any], shape: str = ""):
+        now = time.time()
+        key = target_key(target)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"target": target, "score": 0.0, "count": 0,
+                                              "last_seen": now, "shapes": {}}
+            entry["score"] = self._decayed(entry, now) + 1.0
+            entry["last_seen"] = now
+            entry["count"] += 1
+            entry["shapes"][shape] = entry["shapes"].get(shape, 0) + 1
+            self._dirty = True
+
+    def hot(self, limit: int, min_score: float = MIN_SCORE) -> List[Tuple[Dict[str, Any], float]]:
+        """Les `limit` cibles les plus chaudes (score décru à maintenant), par score décroissant"""
+        now = time.time()
+        with self._lock:
+            scored = [(entry["target"], self._decayed(entry, now)) for entry in self._entries.values()]
+        scored = [(target, score) for target, score in scored if score >= min_score]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def forget_cold(self, min_score: float = MIN_SCORE / 8):
+        """Retire les cibles refroidies (l'historique reste borné)"""
+        now = time.time()
+        with self._lock:
+            cold = [key for key, entry in self._entries.items() if self._decayed(entry, now) < min_score]
+            for key in cold:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(cold)
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                entries = codec.loads(f.read())
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._entries = {target_key(entry["target"]): entry for entry in entries.get("entries", [])}
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            payload = {"entries": list(self._entries.values())}
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(codec.dumps_bytes(payload, indent=True))
+        os.replace(temporary, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# =============================================================================
+# BUDGET ET PLANIFICATEUR
+# =============================================================================
+
+class PrefetchBudget:
+    """Budget glissant : octets téléchargés par heure et requêtes par minute"""
+
+    def __init__(self, max_bytes_per_hour: int, max_requests_per_minute: int):
+        self.max_bytes_per_hour = max_bytes_per_hour
+        self.max_requests_per_minute = max_requests_per_minute
+        self._spent: deque = deque()
+
+    def _trim(self, now: float):
+        while self._spent and now - self._spent[0][0] > 3600:
+            self._spent.popleft()
+
+    def allows(self) -> bool:
+        now = time.time()
+        self._trim(now)
+        bytes_spent = sum(size for _, size in self._spent)
+        recent = sum(1 for timestamp, _ in self._spent if now - timestamp <= 60)
+        return bytes_spent < self.max_bytes_per_hour and recent < self.max_requests_per_minute
+
+    def spend(self, size: int):
+        self._spent.append((time.time(), size))
+
+
+class PrefetchScheduler:
+    """Rafraîchit en arrière-plan les cibles chaudes dont la copie locale va expirer
+
+    `due(target)` indique si la copie locale manque ou expire avant le
+    prochain passage ; `refresh(target)` la recharge et retourne les octets
+    téléchargés, ou None si la cible ne peut pas être mise en cache (elle est
+    alors ignorée pendant `skip_seconds`).
+    """
+
+    def __init__(self, history: AccessHistory, due: Callable[[Dict[str, Any]], bool],
+                 refresh: Callable[[Dict[str, Any]], Optional[int]], budget: PrefetchBudget,
+                 interval: float = 60.0, top_n: int = 5, skip_seconds: float = 3600.0,
+                 log: Callable[[str], None] = lambda message: None):
+        self.history = history
+        self.due = due
+        self.refresh = refresh
+        self.budget = budget
+        self.interval = interval
+        self.top_n = top_n
+        self.skip_seconds = skip_seconds
+        self.log = log
+        self.refreshed = 0
+        self.failed = 0
+        self._skip_until: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def run_once(self) -> List[Dict[str, Any]]:
+        """Un passage : rafraîchit les cibles chaudes dues, dans la limite du budget"""
+        refreshed = []
+        now = time.time()
+        for target, score in self.history.hot(self.top_n):
+            key = target_key(target)
+            if self._skip_until.get(key, 0) > now or not self.due(target):
+                continue
+            if not self.budget.allows():
+                self.log("⏸️ Préchargement: budget atteint")
+                break
+            try:
+                size = self.refresh(target)
+            except Exception as refresh_error:
+                self.failed += 1
+                self.log(f"⚠️ Préchargement échoué pour {target.get('url')}: {refresh_error}")
+                self._skip_until[key] = now + self.interval
+                continue
+            if size is None:
+                self._skip_until[key] = now + self.skip_seconds
+                continue
+            self.budget.spend(size)
+            self.refreshed += 1
+            refreshed.append(target)
+            self.log(f"🔮 Préchargé ({score:.1f}): {target.get('url')} {target.get('params') or ''}")
+        self.history.forget_cold()
+        self.history.save()
+        return refreshed
+
+    def _loop(self):
+        # Premier passage immédiat : cibles chaudes des runs précédents
+        while True:
+            try:
+                self.run_once()
+            except Exception as loop_error:
+                self.log(f"⚠️ Préchargement interrompu: {loop_error}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> "PrefetchScheduler":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.history.save()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
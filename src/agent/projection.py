@@ -0,0 +1,145 @@
+"""
+Moteur de projection compilé pour process_data
+
+Une liste de champs (clés simples ou chemins JSONPath-lite comme
+`address.geo.lat`, `$.company.name`, `tags[0]`, `comments[*].id`) est
+compilée une fois par run en une fonction qui produit directement des
+tuples de lignes pour l'écriture dans Google Sheets.
+
+Règles d'aplatissement des valeurs non scalaires :
+- liste de scalaires -> "a, b, c"
+- dictionnaire ou liste imbriquée -> JSON compact
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from agent import codec
+
+WILDCARD = "*"
+MISSING = ""
+
+PATH_TOKEN_PATTERN = re.compile(r"""\.?([^.\[\]]+)|\[(\d+|\*|'[^']*'|"[^"]*")\]""")
+
+SCALAR_TYPES = (str, int, float, bool, type(None))
+# Types exacts écrits tels quels ; toute autre valeur passe par flatten_value
+_EXACT_SCALARS = frozenset(SCALAR_TYPES)
+
+PathStep = Union[str, int]
+
+
+def is_path(field: str) -> bool:
+    """Vrai si le champ désigne un chemin imbriqué plutôt qu'une clé de premier niveau"""
+    return "." in field or "[" in field
+
+
+def parse_path(path: str) -> Tuple[PathStep, ...]:
+    """Découpe un chemin (`$.a.b[0]`, `a[*].b`) en étapes (clé, index ou `*`)"""
+    text = path[1:] if path.startswith("$") else path
+    steps: List[PathStep] = []
+    position = 0
+    while position < len(text):
+        match = PATH_TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Chemin invalide: {path}")
+        key, bracket = match.groups()
+        if key is not None:
+            steps.append(key)
+        elif bracket == WILDCARD or bracket.isdigit():
+            steps.append(WILDCARD if bracket == WILDCARD else int(bracket))
+        else:
+            steps.append(bracket[1:-1])
+        position = match.end()
+    if not steps:
+        raise ValueError(f"Chemin vide: {path}")
+    return tuple(steps)
+
+
+def flatten_value(value: Any) -> Any:
+    """Convertit une valeur en cellule de tableur"""
+    if isinstance(value, SCALAR_TYPES):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(v, SCALAR_TYPES) for v in value):
+        return ", ".join("" if v is None else str(v) for v in value)
+    return codec.dumps(value, default=str)
+
+
+def resolve_path(value: Any, steps: Sequence[PathStep], missing: Any = MISSING) -> Any:
+    """Suit les étapes d'un chemin parsé (`missing` si le chemin n'existe pas)"""
+    for position, step in enumerate(steps):
+        if step == WILDCARD:
+            if not isinstance(value, list):
+                return missing
+            rest = steps[position + 1:]
+            values = [resolve_path(item, rest, missing) for item in value]
+            return [v for v in values if v is not missing]
+        if isinstance(step, int):
+            if not isinstance(value, list) or not -len(value) <= step < len(value):
+                return missing
+            value = value[step]
+        else:
+            if not isinstance(value, dict) or step not in value:
+                return missing
+            value = value[step]
+    return value
+
+
+def compile_accessor(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """Compile un chemin en fonction d'accès (valeur aplatie, "" si absente)"""
+    steps = parse_path(path)
+
+    def accessor(item):
+        return flatten_value(resolve_path(item, steps))
+
+    return accessor
+
+
+class Projection:
+    """Projection compilée : liste de champs -> fonction `row(item) -> tuple`"""
+
+    def __init__(self, fields: Sequence[str], sample: Optional[Dict[str, Any]] = None):
+        self.headers: List[str] = list(fields)
+        self._row = self._compile(sample)
+
+    def _compile(self, sample: Optional[Dict[str, Any]]):
+        namespace: Dict[str, Any] = {"_flat": flatten_value, "_scalars": _EXACT_SCALARS}
+        bound = ["_type=type", "_scalars=_scalars", "_flat=_flat"]
+        lines = []
+        for position, field in enumerate(self.headers):
+            value = f"v{position}"
+            if not is_path(field):
+                # Clé de premier niveau : accès direct ; le type est vérifié à chaque ligne
+                # (l'échantillon ne dit rien des lignes suivantes), aplati d'office s'il est imbriqué
+                lines.append(f"{value} = get({field!r}, {MISSING!r})")
+                expected = type(sample.get(field)) if sample is not None else None
+                if sample is not None and expected not in _EXACT_SCALARS:
+                    lines.append(f"{value} = _flat({value})")
+                elif expected is not None and expected is not type(None):
+                    # Type scalaire de l'échantillon : test d'identité, flatten_value sinon
+                    namespace[f"_t{position}"] = expected
+                    bound.append(f"_t{position}=_t{position}")
+                    lines.append(f"if _type({value}) is not _t{position}: {value} = _flat({value})")
+                else:
+                    lines.append(f"if _type({value}) not in _scalars: {value} = _flat({value})")
+            else:
+                namespace[f"_acc{position}"] = compile_accessor(field)
+                lines.append(f"{value} = _acc{position}(item)")
+
+        values = "".join(f"v{position}, " for position in range(len(self.headers)))
+        # Gardes de type et aplatissement liés en variables locales (arguments par défaut)
+        source = f"def _row(item, {', '.join(bound)}):\n    get = item.get\n"
+        source += "".join(f"    {line}\n" for line in lines)
+        source += f"    return ({values})\n"
+        exec(compile(source, "<projection>", "exec"), namespace)
+        return namespace["_row"]
+
+    def row(self, item: Dict[str, Any]) -> tuple:
+        return self._row(item)
+
+    def rows(self, items: Iterable[Dict[str, Any]]) -> List[tuple]:
+        return list(map(self._row, items))
+
+
+def compile_projection(fields: Sequence[str], sample: Optional[Dict[str, Any]] = None) -> Projection:
+    """Compile une projection ; `sample` (premier enregistrement) aplatit d'office ses champs imbriqués"""
+    return Projection(fields, sample)
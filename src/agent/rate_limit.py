@@ -0,0 +1,300 @@
+"""
+Limitation de débit des appels Google (quotas Sheets et Drive)
+
+Le compte de service partage les quotas par minute de Google entre tous les
+runs concurrents. Chaque requête HTTP des clients gspread et Drive prend un
+jeton dans le seau de sa catégorie (lectures Sheets, écritures Sheets,
+Drive) avant de partir : un seau vide fait attendre l'appelant au lieu de
+lui valoir un 429. Les réponses 429 (et 403 "rateLimitExceeded" de Drive)
+sont reprises avec un backoff exponentiel à gigue et vident le seau
+concerné, ce qui ralentit aussi les autres appelants. Une 5xx n'est reprise
+que pour une méthode idempotente : un POST (values:append, batchUpdate,
+création de fichier) a pu être appliqué malgré l'erreur et le rejouer
+dupliquerait des lignes.
+
+Les seaux sont propres au processus, ou partagés entre processus par une
+base SQLite. Les attentes sont comptées par contexte (`tracking()`) pour
+apparaître dans les traces des nœuds.
+"""
+
+import contextlib
+import contextvars
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+from agent.background import error_status
+
+SHEETS_READ = "sheets_read"
+SHEETS_WRITE = "sheets_write"
+DRIVE = "drive"
+
+# Raisons des 403 de Drive qui signalent un quota et non un refus d'accès
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+# Méthodes rejouables sans risque après une erreur serveur (5xx)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Compteurs des attentes du contexte courant (nœud du graphe), voir QuotaLimiter.tracking
+_TRACKED: contextvars.ContextVar = contextvars.ContextVar("google_quota_tracking", default=None)
+
+
+def _no_log(message: str):
+    pass
+
+
+def classify(method: str, url: str) -> str:
+    """Seau d'une requête Google : Drive (fichiers, permissions, batch), sinon lecture ou écriture Sheets"""
+    if "/drive/" in url:
+        return DRIVE
+    return SHEETS_READ if method.upper() in ("GET", "HEAD") else SHEETS_WRITE
+
+
+def is_retryable(status: int, detail: Union[str, bytes] = "", method: str = "GET") -> bool:
+    """Réponse à reprendre : quota (429, 403 rateLimitExceeded de Drive), ou 5xx d'une méthode idempotente
+
+    Un quota dépassé garantit que la requête n'a pas été appliquée ; une 5xx
+    non (un POST rejoué pourrait être appliqué deux fois).
+    """
+    if status == 429:
+        return True
+    if status >= 500:
+        return method.upper() in IDEMPOTENT_METHODS
+    if status == 403:
+        if isinstance(detail, bytes):
+            detail = detail.decode("utf-8", errors="ignore")
+        return any(reason in detail for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def should_retry(error: Exception, method: str = "GET") -> bool:
+    """Erreur gspread / googleapiclient à reprendre (les erreurs réseau ne sont pas rejouées)"""
+    status = error_status(error)
+    return status is not None and is_retryable(status, str(error), method)
+
+
+# =============================================================================
+# SEAUX À JETONS
+# =============================================================================
+
+class TokenBucket:
+    """Seau à jetons en mémoire : `rate_per_minute` jetons par minute, au plus `burst` d'avance
+
+    Les jetons sont réservés (le solde peut devenir négatif) : chaque appelant
+    connaît immédiatement son attente et les appelants sont servis dans
+    l'ordre de réservation.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Réserve `tokens` jetons ; retourne l'attente (s) avant de pouvoir les consommer"""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def empty(self):
+        """Quota dépassé côté Google : plus aucune avance"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+
+class SqliteTokenBucket:
+    """Seau à jetons partagé entre processus : solde et horodatage dans une table SQLite"""
+
+    def __init__(self, path: str, name: str, rate_per_minute: float, burst: float):
+        self.path = path
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (sqlite3 interdit le partage entre threads)
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        return connection
+
+    def _update(self, change: Callable[[float], float]) -> float:
+        """Applique `change` au solde rechargé, sous verrou d'écriture SQLite (BEGIN IMMEDIATE)"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens = change(tokens)
+            connection.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                               (self.name, tokens, now))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return tokens
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        remaining = self._update(lambda available: available - tokens)
+        return max(0.0, -remaining / self.rate)
+
+    def empty(self):
+        self._update(lambda available: min(available, 0.0))
+
+
+# =============================================================================
+# LIMITEUR
+# =============================================================================
+
+class QuotaLimiter:
+    """Seaux par catégorie de requête, reprises à backoff exponentiel (avec gigue) et comptage des attentes"""
+
+    def __init__(self, buckets: Dict[str, Any], max_attempts: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 32.0, log: Callable[[str], None] = _no_log):
+        self.buckets = buckets
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.log = log
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _account(self, bucket: str, **increments: float):
+        tracked = _TRACKED.get()
+        with self._lock:
+            totals = self._totals.setdefault(bucket, {"requests": 0, "throttled": 0, "retries": 0,
+                                                      "wait_seconds": 0.0})
+            for counters in (totals, tracked):
+                if counters is None:
+                    continue
+                for key, value in increments.items():
+                    counters[key] = counters.get(key, 0) + value
+
+    def acquire(self, bucket: str, tokens: float = 1.0) -> float:
+        """Attend un jeton du seau `bucket` (catégorie sans seau : illimitée) ; retourne l'attente (s)"""
+        token_bucket = self.buckets.get(bucket)
+        wait = token_bucket.reserve(tokens) if token_bucket is not None else 0.0
+        if wait > 0:
+            time.sleep(wait)
+            self._account(bucket, requests=1, throttled=1, wait_seconds=wait)
+        else:
+            self._account(bucket, requests=1)
+        return wait
+
+    def backoff(self, bucket: str, attempt: int, reason: Any):
+        """Attente avant l'essai `attempt + 1` ; le seau est vidé (quota dépassé pour tous)"""
+        token_bucket = self.buckets.get(bucket)
+        if token_bucket is not None:
+            token_bucket.empty()
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        self.log(f"🚦 Quota Google ({bucket}): nouvel essai dans {delay:.1f}s ({reason})")
+        self._account(bucket, retries=1, wait_seconds=delay)
+        time.sleep(delay)
+
+    def call(self, bucket: str, fn: Callable[[], Any], tokens: float = 1.0,
+             retry_on: Callable[[Exception], bool] = should_retry) -> Any:
+        """`fn()` après un jeton de `bucket`, reprise tant que l'erreur est transitoire"""
+        attempt = 1
+        while True:
+            self.acquire(bucket, tokens)
+            try:
+                return fn()
+            except Exception as call_error:
+                if attempt >= self.max_attempts or not retry_on(call_error):
+                    raise
+                self.backoff(bucket, attempt, call_error)
+                attempt += 1
+
+    @contextlib.contextmanager
+    def tracking(self) -> Iterator[Dict[str, float]]:
+        """Compteurs (requêtes, attentes, reprises) des appels faits dans ce contexte"""
+        counters = {"requests": 0, "throttled": 0, "retries": 0, "wait_seconds": 0.0}
+        token = _TRACKED.set(counters)
+        try:
+            yield counters
+        finally:
+            _TRACKED.reset(token)
+            counters["wait_seconds"] = round(counters["wait_seconds"], 3)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {bucket: dict(totals) for bucket, totals in self._totals.items()}
+
+
+def create_limiter(reads_per_minute: float, writes_per_minute: float, drive_per_minute: float,
+                   burst: float = 10, path: Optional[str] = None, max_attempts: int = 5,
+                   log: Callable[[str], None] = _no_log) -> QuotaLimiter:
+    """Limiteur des trois catégories ; `path` = base SQLite partagée entre processus ; débit <= 0 = illimité"""
+    buckets = {}
+    for name, rate in ((SHEETS_READ, reads_per_minute), (SHEETS_WRITE, writes_per_minute), (DRIVE, drive_per_minute)):
+        if rate > 0:
+            buckets[name] = SqliteTokenBucket(path, name, rate, burst) if path else TokenBucket(rate, burst)
+    return QuotaLimiter(buckets, max_attempts=max_attempts, log=log)
+
+
+# =============================================================================
+# BRANCHEMENT SUR LES CLIENTS GOOGLE
+# =============================================================================
+
+def rate_limited_http_client(limiter: QuotaLimiter):
+    """Classe de client HTTP gspread (gspread.authorize(http_client=...)) dont chaque requête passe par `limiter`"""
+    from gspread.http_client import HTTPClient
+
+    class RateLimitedHTTPClient(HTTPClient):
+        def request(self, method, endpoint, *args, **kwargs):
+            return limiter.call(classify(method, endpoint),
+                                lambda: HTTPClient.request(self, method, endpoint, *args, **kwargs),
+                                retry_on=lambda error: should_retry(error, method))
+
+    return RateLimitedHTTPClient
+
+
+def _batch_size(uri: str, body: Any) -> int:
+    """Nombre de requêtes d'un batch Drive (chacune compte dans le quota), 1 sinon"""
+    if "/batch/" not in uri or not isinstance(body, (str, bytes)):
+        return 1
+    marker = "Content-ID:" if isinstance(body, str) else b"Content-ID:"
+    return max(1, body.count(marker))
+
+
+class RateLimitedHttp:
+    """Enveloppe httplib2 du client Drive (build(http=...)) : jetons et reprises par requête"""
+
+    def __init__(self, http, limiter: QuotaLimiter):
+        self.http = http
+        self.limiter = limiter
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        bucket = classify(method, uri)
+        tokens = _batch_size(uri, body)
+        attempt = 1
+        while True:
+            self.limiter.acquire(bucket, tokens)
+            response, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+            if attempt >= self.limiter.max_attempts or not is_retryable(response.status, content, method):
+                return response, content
+            self.limiter.backoff(bucket, attempt, f"HTTP {response.status}")
+            attempt += 1
+
+    def __getattr__(self, name: str):
+        return getattr(self.http, name)
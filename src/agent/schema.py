@@ -0,0 +1,161 @@
+"""
+Inférence du schéma d'une API et cache par URL
+
+Au lieu d'une liste de champs codée en dur, le schéma d'une ressource est
+déduit d'un échantillon de sa première page : champs de premier niveau
+(dans l'ordre d'apparition), chemins imbriqués (`address.geo.lat`) et types
+observés. Le schéma est mis en cache par URL (sans la query string) avec
+un TTL : les runs suivants sur la même API sautent l'inférence.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit, urlunsplit
+
+from agent.matching import KeywordMatcher
+
+# Profondeur maximale des chemins imbriqués inférés (address.geo.lat = 3)
+MAX_PATH_DEPTH = 4
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    return type(value).__name__
+
+
+class Schema:
+    """Schéma inféré : champs de premier niveau, chemins imbriqués et types observés"""
+
+    def __init__(self, fields: Sequence[str], types: Dict[str, List[str]], sample_size: int = 0):
+        self.fields: List[str] = list(fields)
+        self.types: Dict[str, List[str]] = types
+        self.sample_size = sample_size
+        self._matcher: Optional[KeywordMatcher] = None
+
+    @property
+    def paths(self) -> List[str]:
+        """Tous les chemins connus (premier niveau et imbriqués)"""
+        return list(self.types)
+
+    def has(self, field: str) -> bool:
+        return field in self.types
+
+    def is_scalar(self, field: str) -> bool:
+        return not {"object", "array"}.intersection(self.types.get(field, ()))
+
+    def default_fields(self) -> List[str]:
+        """Colonnes exportées par défaut : tous les champs de premier niveau"""
+        return self.fields[:]
+
+    def matcher(self, aliases: Optional[Dict[str, Iterable[str]]] = None) -> KeywordMatcher:
+        """Matcher des champs du schéma (nom du champ et alias connus), compilé une fois
+
+        Un chemin imbriqué scalaire est aussi trouvé par son dernier segment
+        ("city" -> `address.city`) quand ce nom n'est pas ambigu.
+        """
+        if self._matcher is None:
+            aliases = aliases or {}
+            groups = {field: [field, *aliases.get(field, ())] for field in self.fields}
+            leaves: Dict[str, List[str]] = {}
+            for path in self.types:
+                if "." in path and self.is_scalar(path):
+                    leaves.setdefault(path.rsplit(".", 1)[1], []).append(path)
+            for leaf, paths in leaves.items():
+                if len(paths) == 1 and leaf not in groups:
+                    groups[paths[0]] = [leaf]
+            self._matcher = KeywordMatcher(groups)
+        return self._matcher
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fields": self.fields, "types": self.types, "sample_size": self.sample_size}
+
+    def __repr__(self) -> str:
+        return f"Schema(fields={self.fields!r}, paths={len(self.types)})"
+
+
+def infer_schema(records: Iterable[Any], sample_size: int = 50) -> Schema:
+    """Infère le schéma des `sample_size` premiers enregistrements"""
+    fields: Dict[str, None] = {}
+    types: Dict[str, Dict[str, None]] = {}
+
+    def visit(value: Any, path: str, depth: int):
+        types.setdefault(path, {})[_type_name(value)] = None
+        if isinstance(value, dict) and depth < MAX_PATH_DEPTH:
+            for key, child in value.items():
+                visit(child, f"{path}.{key}", depth + 1)
+
+    count = 0
+    for record in records:
+        if count >= sample_size:
+            break
+        count += 1
+        if not isinstance(record, dict):
+            continue
+        for key, value in record.items():
+            fields.setdefault(key, None)
+            visit(value, key, 1)
+
+    return Schema(list(fields), {path: list(seen) for path, seen in types.items()}, count)
+
+
+def schema_key(url: str) -> str:
+    """Clé de cache d'une URL : schéma, hôte et chemin (query string ignorée)"""
+    scheme, netloc, path, _, _ = urlsplit(url)
+    return urlunsplit((scheme, netloc.lower(), path.rstrip("/"), "", ""))
+
+
+class SchemaCache:
+    """Cache des schémas par URL avec expiration (thread-safe)"""
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Schema]:
+        key = schema_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            schema, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            return schema
+
+    def put(self, url: str, schema: Schema) -> Schema:
+        with self._lock:
+            self._entries[schema_key(url)] = (schema, time.monotonic() + self.ttl)
+        return schema
+
+    def get_or_infer(self, url: str, sample: Callable[[], Iterable[Any]], sample_size: int = 50) -> Schema:
+        """Schéma en cache, ou inféré depuis `sample()` (premier échantillon de l'API) puis mis en cache"""
+        schema = self.get(url)
+        if schema is None:
+            schema = self.put(url, infer_schema(sample(), sample_size))
+        return schema
+
+    def invalidate(self, url: Optional[str] = None):
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(schema_key(url), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,314 @@
+"""
+Pool de Google Sheets pré-provisionnés
+
+Créer un sheet dans SHEETS_FOLDER_NAME et le partager coûte plusieurs
+appels Google, identiques d'un run à l'autre. Le pool garde N sheets vides,
+déjà rangés et partagés : un run en réclame un (un seul renommage Drive),
+y écrit ses données, et le pool est complété en arrière-plan.
+
+Suivi anti-fuite : chaque sheet du pool est inscrit dans un registre JSON
+(verrouillé entre processus) et porte un marqueur dans son nom tant qu'il
+n'a pas été réclamé. Le nettoyage périodique supprime les sheets prêts trop
+anciens ou provisionnés avec une autre configuration, oublie les
+réservations et réclamations jamais confirmées, et supprime les sheets
+marqués du dossier absents du registre (création interrompue).
+"""
+
+import contextlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agent import codec
+from agent.sheets import discard_sheet, provision_sheet
+
+try:
+    import fcntl
+except ImportError:
+    # Pas de verrou inter-processus (Windows) : un seul processus doit utiliser le registre
+    fcntl = None
+
+POOL_MARKER = "__pool__"
+
+# Un sheet marqué plus récent que ce délai peut être en cours d'inscription par un autre processus
+ORPHAN_GRACE_SECONDS = 600
+
+
+def _no_log(message: str):
+    pass
+
+
+def _drive_timestamp(value: Optional[str]) -> float:
+    """Horodatage RFC 3339 de Drive (createdTime) en secondes, 0 si absent"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class SheetPool:
+    """Sheets vides prêts à l'emploi, complétés en arrière-plan jusqu'à `size`"""
+
+    def __init__(self, gc_factory: Callable[[], Any], drive_factory: Callable[[], Any], folder_name: str,
+                 size: int, ledger_path: str, share_email: Optional[str] = None, share_publicly: bool = False,
+                 title_prefix: str = "API_Data", max_age: float = 7 * 86400.0, claim_timeout: float = 3600.0,
+                 interval: float = 300.0, log: Callable[[str], None] = _no_log):
+        self.gc_factory = gc_factory
+        self.drive_factory = drive_factory
+        self.folder_name = folder_name
+        self.size = size
+        self.ledger_path = ledger_path
+        self.share_email = share_email
+        self.share_publicly = share_publicly
+        self.title_prefix = title_prefix
+        self.max_age = max_age
+        self.claim_timeout = claim_timeout
+        self.interval = interval
+        self.log = log
+        self.claimed = 0
+        self.misses = 0
+        # Configuration de provisioning : un sheet prêt provisionné autrement n'est pas servi
+        self.config = {"folder": folder_name, "share_email": share_email, "share_publicly": share_publicly}
+        # Objets gspread des sheets créés par ce processus (évite open_by_key à la réclamation)
+        self._sheets: Dict[str, Any] = {}
+        self._folder_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        directory = os.path.dirname(ledger_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # ----- registre --------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _ledger(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """Entrées du registre, relues et réécrites sous verrou (threads et processus)"""
+        with self._lock, open(f"{self.ledger_path}.lock", "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.ledger_path, "rb") as f:
+                    entries = codec.loads(f.read()).get("entries", {})
+            except (OSError, ValueError):
+                entries = {}
+            yield entries
+            temporary = f"{self.ledger_path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(codec.dumps_bytes({"entries": entries}, indent=True))
+            os.replace(temporary, self.ledger_path)
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._ledger() as entries:
+            return {key: dict(entry) for key, entry in entries.items()}
+
+    def ready_count(self) -> int:
+        return sum(1 for entry in self.entries().values()
+                   if entry["state"] == "ready" and entry.get("config") == self.config)
+
+    # ----- réclamation -----------------------------------------------------
+
+    def claim(self, title: str) -> Optional[Tuple[Any, Optional[str], bool]]:
+        """Sheet prêt renommé en `title` : (sheet, folder_id, rangé dans le dossier), None si le pool est vide"""
+        with self._ledger() as entries:
+            ready = [key for key, entry in entries.items()
+                     if entry["state"] == "ready" and entry.get("config") == self.config]
+            if not ready:
+                entry = None
+            else:
+                sheet_id = min(ready, key=lambda key: entries[key]["created_at"])
+                entry = entries[sheet_id]
+                entry.update(state="claimed", claimed_at=time.time(), pid=os.getpid(), title=title)
+                entry = dict(entry)
+        self._wake.set()
+        if entry is None:
+            self.misses += 1
+            self.log("🫙 Pool de sheets vide : provisioning à la demande")
+            return None
+
+        sheet_id = entry["sheet_id"]
+        try:
+            self.drive_factory().files().update(fileId=sheet_id, body={"name": title}, fields="id").execute()
+            sheet = self._sheets.pop(sheet_id, None) or self.gc_factory().open_by_key(sheet_id)
+        except Exception as claim_error:
+            # Le sheet garde son nom marqué : le nettoyage des orphelins le supprimera
+            self.log(f"⚠️ Sheet du pool inutilisable ({sheet_id}): {claim_error}")
+            self._forget(sheet_id)
+            self.misses += 1
+            return None
+        self.claimed += 1
+        self.log(f"♻️ Sheet réclamé au pool: {title} (ID: {sheet_id})")
+        return sheet, entry.get("folder_id"), entry.get("in_folder", False)
+
+    def complete(self, sheet_id: str):
+        """Le sheet réclamé a reçu ses données : il quitte le pool"""
+        self._forget(sheet_id)
+
+    def release(self, sheet_id: str):
+        """Sheet réclamé mais resté vide : rendu au pool sous son nom marqué (supprimé en cas d'échec)"""
+        try:
+            self.drive_factory().files().update(fileId=sheet_id, body={"name": self._pool_title()},
+                                                fields="id").execute()
+        except Exception as release_error:
+            self.log(f"⚠️ Sheet non rendu au pool ({sheet_id}): {release_error}")
+            self._forget(sheet_id)
+            self._delete([sheet_id])
+            return
+        with self._ledger() as entries:
+            if sheet_id in entries:
+                entries[sheet_id].update(state="ready", claimed_at=None, pid=None, title=None)
+        self.log(f"↩️ Sheet rendu au pool: {sheet_id}")
+
+    def _forget(self, sheet_id: str):
+        with self._ledger() as entries:
+            entries.pop(sheet_id, None)
+
+    # ----- remplissage -----------------------------------------------------
+
+    def _pool_title(self) -> str:
+        return f"{self.title_prefix}{POOL_MARKER}{uuid.uuid4().hex[:12]}"
+
+    def refill(self) -> int:
+        """Complète le pool jusqu'à `size` sheets prêts ; retourne le nombre de sheets créés"""
+        created = 0
+        with self._refill_lock:
+            while not self._stop.is_set():
+                # Réservation inscrite avant la création : les autres processus la comptent
+                reservation = f"pending:{uuid.uuid4().hex}"
+                with self._ledger() as entries:
+                    available = sum(1 for entry in entries.values()
+                                    if entry["state"] in ("ready", "pending") and entry.get("config") == self.config)
+                    if available >= self.size:
+                        break
+                    entries[reservation] = {"state": "pending", "config": self.config, "created_at": time.time(),
+                                            "pid": os.getpid()}
+                # Partages exécutés ici et non par provision_sheet (qui ne fait que journaliser leurs
+                # échecs) : un sheet du pool n'est servi que si toutes ses permissions sont accordées
+                sharing: List[Callable[[], Any]] = []
+                try:
+                    sheet, folder_id, in_folder = provision_sheet(
+                        self.gc_factory(), self.drive_factory, self._pool_title(), self.folder_name,
+                        share_email=self.share_email, share_publicly=self.share_publicly, log=self.log,
+                        defer=lambda name, task: sharing.append(task)
+                    )
+                except Exception as provision_error:
+                    self.log(f"⚠️ Remplissage du pool interrompu: {provision_error}")
+                    self._forget(reservation)
+                    break
+                try:
+                    for task in sharing:
+                        task()
+                except Exception as sharing_error:
+                    self.log(f"⚠️ Sheet du pool non partagé, supprimé ({sheet.id}): {sharing_error}")
+                    self._forget(reservation)
+                    self._delete([sheet.id])
+                    break
+                self._sheets[sheet.id] = sheet
+                self._folder_id = folder_id or self._folder_id
+                with self._ledger() as entries:
+                    entries.pop(reservation, None)
+                    entries[sheet.id] = {"state": "ready", "sheet_id": sheet.id, "url": sheet.url,
+                                         "folder_id": folder_id, "in_folder": in_folder, "config": self.config,
+                                         "created_at": time.time(), "pid": os.getpid()}
+                created += 1
+        if created:
+            self.log(f"🫙 Pool de sheets complété: +{created}")
+        return created
+
+    # ----- nettoyage -------------------------------------------------------
+
+    def _delete(self, sheet_ids: List[str]):
+        if not sheet_ids:
+            return
+        drive_service = self.drive_factory()
+        for sheet_id in sheet_ids:
+            self._sheets.pop(sheet_id, None)
+            try:
+                discard_sheet(drive_service, sheet_id, self.log)
+            except Exception as delete_error:
+                self.log(f"⚠️ Sheet du pool non supprimé ({sheet_id}): {delete_error}")
+
+    def cleanup(self) -> Dict[str, int]:
+        """Supprime les sheets prêts périmés et les orphelins, oublie les réservations abandonnées"""
+        now = time.time()
+        expired: List[str] = []
+        forgotten = 0
+        with self._ledger() as entries:
+            folder_ids = {entry.get("folder_id") for entry in entries.values() if entry.get("folder_id")}
+            for key, entry in list(entries.items()):
+                if entry["state"] == "ready" and (now - entry["created_at"] > self.max_age
+                                                  or entry.get("config") != self.config):
+                    expired.append(key)
+                    del entries[key]
+                elif entry["state"] == "pending" and now - entry["created_at"] > self.claim_timeout:
+                    del entries[key]
+                    forgotten += 1
+                elif entry["state"] == "claimed" and now - entry["claimed_at"] > self.claim_timeout:
+                    # Réclamation jamais confirmée : le sheet (renommé, peut-être rempli) n'est plus suivi
+                    del entries[key]
+                    forgotten += 1
+            known = set(entries)
+        self._delete(expired)
+
+        orphans: List[str] = []
+        if self._folder_id:
+            folder_ids.add(self._folder_id)
+        for folder_id in folder_ids:
+            try:
+                listing = self.drive_factory().files().list(
+                    q=f"'{folder_id}' in parents and name contains '{POOL_MARKER}' and trashed=false",
+                    fields="files(id, name, createdTime)"
+                ).execute()
+            except Exception as list_error:
+                self.log(f"⚠️ Recherche des sheets orphelins impossible: {list_error}")
+                continue
+            for file in listing.get("files", []):
+                if (POOL_MARKER in file.get("name", "") and file["id"] not in known
+                        and now - _drive_timestamp(file.get("createdTime")) > ORPHAN_GRACE_SECONDS):
+                    orphans.append(file["id"])
+        self._delete(orphans)
+
+        if expired or orphans or forgotten:
+            self.log(f"🧹 Pool de sheets: {len(expired)} périmé(s), {len(orphans)} orphelin(s), "
+                     f"{forgotten} réservation(s) oubliée(s)")
+        return {"expired": len(expired), "orphans": len(orphans), "forgotten": forgotten}
+
+    # ----- arrière-plan ----------------------------------------------------
+
+    def _loop(self):
+        last_cleanup = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.time() - last_cleanup >= self.interval:
+                    last_cleanup = time.time()
+                    self.cleanup()
+                self.refill()
+            except Exception as pool_error:
+                self.log(f"⚠️ Pool de sheets: {pool_error}")
+            # Réveillé par une réclamation (remplissage), sinon nettoyage périodique
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self) -> "SheetPool":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name="sheet-pool", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": self.size, "ready": self.ready_count(), "claimed": self.claimed, "misses": self.misses}
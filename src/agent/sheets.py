@@ -0,0 +1,278 @@
+"""
+Provisioning et écriture des Google Sheets
+
+Étapes partagées par l'export classique (create_google_sheet) et l'export
+en flux (stream_export) : dossier Drive, création du sheet directement dans
+le dossier, partage en un batch, puis écriture des lignes par blocs. Les
+clients (gspread, Drive) sont passés en paramètre pour rester substituables
+en record/replay.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+def _no_log(message: str):
+    pass
+
+
+# Exécution d'un effet de bord post-création : defer(nom, tâche) (file d'arrière-plan ou appel immédiat)
+Defer = Callable[[str, Callable[[], Any]], Any]
+
+
+class SharingError(Exception):
+    """Permissions non accordées ; expose la réponse de la première erreur (code HTTP pour les reprises)"""
+
+    def __init__(self, label: str, failures: List[Tuple[Dict[str, Any], Exception]]):
+        super().__init__(f"{label}: " + "; ".join(f"{body['type']} ({error})" for body, error in failures))
+        self.failures = failures
+        first = failures[0][1]
+        self.response = getattr(first, "response", None)
+        self.resp = getattr(first, "resp", None)
+
+
+def _run_inline(log: Callable[[str], None]) -> Defer:
+    def defer(name: str, task: Callable[[], Any]):
+        try:
+            task()
+        except Exception as task_error:
+            log(f"⚠️ Erreur {name}: {task_error}")
+    return defer
+
+
+def sheet_permissions(share_email: Optional[str], share_publicly: bool = False) -> List[Dict[str, Any]]:
+    """Permissions d'un export : écriture pour l'email personnel, lecture publique si configurée"""
+    permissions = []
+    if share_email:
+        permissions.append({'type': 'user', 'role': 'writer', 'emailAddress': share_email})
+    if share_publicly:
+        permissions.append({'type': 'anyone', 'role': 'reader'})
+    return permissions
+
+
+def _granted(body: Dict[str, Any], target: str) -> str:
+    if body['type'] == 'anyone':
+        return f"✅ {target} partagé publiquement en lecture"
+    return f"✅ {target} partagé avec {body.get('emailAddress')}"
+
+
+def grant_permissions(drive_service, file_id: str, permissions: List[Dict[str, Any]], target: str = "Sheet",
+                      log: Callable[[str], None] = _no_log) -> List[Tuple[Dict[str, Any], Exception]]:
+    """Crée les permissions du fichier en une seule requête batch Drive ; retourne les échecs"""
+    failures: List[Tuple[Dict[str, Any], Exception]] = []
+
+    def on_response(request_id, response, exception):
+        body = permissions[int(request_id)]
+        if exception is not None:
+            failures.append((body, exception))
+        else:
+            log(_granted(body, target))
+
+    batch = drive_service.new_batch_http_request(callback=on_response)
+    for request_id, body in enumerate(permissions):
+        options = {'sendNotificationEmail': False} if body['type'] == 'user' else {}
+        batch.add(drive_service.permissions().create(fileId=file_id, body=body, fields='id', **options),
+                  request_id=str(request_id))
+    batch.execute()
+    return failures
+
+
+def grant_sheet_permissions(sheet, permissions: List[Dict[str, Any]],
+                            log: Callable[[str], None] = _no_log) -> List[Tuple[Dict[str, Any], Exception]]:
+    """Permissions via gspread (un appel par permission), sans service Drive ; retourne les échecs"""
+    failures = []
+    for body in permissions:
+        try:
+            sheet.share(body.get('emailAddress', ''), perm_type=body['type'], role=body['role'])
+            log(_granted(body, "Sheet"))
+        except Exception as share_error:
+            failures.append((body, share_error))
+    return failures
+
+
+def permissions_task(grant: Callable[[List[Dict[str, Any]]], List[Tuple[Dict[str, Any], Exception]]],
+                     permissions: List[Dict[str, Any]], label: str) -> Callable[[], None]:
+    """Tâche rejouable : chaque essai n'accorde que les permissions encore manquantes"""
+    remaining = list(permissions)
+
+    def run():
+        failures = grant(list(remaining))
+        remaining[:] = [body for body, _ in failures]
+        if failures:
+            raise SharingError(label, failures)
+    return run
+
+
+def find_or_create_folder(drive_service, folder_name: str, share_email: Optional[str] = None,
+                          log: Callable[[str], None] = _no_log, defer: Optional[Defer] = None) -> Optional[str]:
+    """ID du dossier Drive `folder_name`, créé (et partagé via `defer`) s'il n'existe pas"""
+    log(f"Recherche du dossier '{folder_name}'...")
+    search_query = f"name='{folder_name}' and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+    results = drive_service.files().list(
+        q=search_query,
+        fields="files(id, name, parents)"
+    ).execute()
+
+    folders = results.get('files', [])
+    log(f"Dossiers trouvés: {len(folders)}")
+    if folders:
+        folder_id = folders[0]['id']
+        log(f"✅ Dossier trouvé: {folder_name} (ID: {folder_id})")
+        return folder_id
+
+    log(f"🔧 Création du dossier '{folder_name}'...")
+    folder = drive_service.files().create(
+        body={'name': folder_name, 'mimeType': FOLDER_MIME_TYPE},
+        fields='id'
+    ).execute()
+    folder_id = folder.get('id')
+    log(f"✅ Dossier créé: {folder_name} (ID: {folder_id})")
+
+    # Partager le dossier avec l'email personnel
+    if share_email:
+        (defer or _run_inline(log))("partage dossier", permissions_task(
+            lambda permissions: grant_permissions(drive_service, folder_id, permissions, "Dossier", log),
+            sheet_permissions(share_email), f"partage du dossier {folder_id}"
+        ))
+    return folder_id
+
+
+def provision_sheet(gc, drive_factory: Callable[[], Any], title: str, folder_name: str,
+                    share_email: Optional[str] = None, share_publicly: bool = False,
+                    log: Callable[[str], None] = _no_log,
+                    defer: Optional[Defer] = None) -> Tuple[Any, Optional[str], bool]:
+    """Crée un sheet rangé dans son dossier et partagé : (sheet, folder_id, rangé dans le dossier)
+
+    Le sheet est créé directement dans le dossier (un seul files.create Drive,
+    mimeType spreadsheet et parents) et ses permissions partent en un batch.
+    Les partages sont confiés à `defer` (file d'arrière-plan) s'il est fourni,
+    sinon exécutés avant le retour.
+    """
+    defer = defer or _run_inline(log)
+    folder_id = None
+    drive_service = None
+    try:
+        drive_service = drive_factory()
+        log("✅ Service Drive API initialisé")
+        folder_id = find_or_create_folder(drive_service, folder_name, share_email, log, defer)
+    except ImportError:
+        log("❌ google-api-python-client non installé")
+        log("📝 Installez avec: pip install google-api-python-client")
+        drive_service = None
+    except FileNotFoundError:
+        log("❌ Fichier credentials non trouvé")
+        drive_service = None
+    except Exception as drive_error:
+        log(f"⚠️ Erreur lors de la configuration Drive API: {drive_error}")
+        log("📝 Le sheet sera créé à la racine de Drive")
+        drive_service = None
+
+    log("Création du Google Sheet...")
+    sheet = None
+    in_folder = False
+    if folder_id and drive_service:
+        try:
+            sheet = gc.create(title, folder_id=folder_id)
+            in_folder = True
+            log(f"✅ Sheet créé dans le dossier '{folder_name}': {title} (ID: {sheet.id})")
+        except Exception as create_error:
+            log(f"⚠️ Création dans le dossier impossible: {create_error}")
+            log("📝 Le sheet sera créé à la racine de Drive")
+    else:
+        if not folder_id:
+            log("⚠️ Pas de folder_id - sheet créé à la racine")
+        if not drive_service:
+            log("⚠️ Pas de drive_service - sheet créé à la racine")
+    if sheet is None:
+        sheet = gc.create(title)
+        log(f"✅ Sheet créé: {title} (ID: {sheet.id})")
+
+    permissions = sheet_permissions(share_email, share_publicly)
+    if permissions:
+        def grant(pending):
+            if drive_service:
+                return grant_permissions(drive_service, sheet.id, pending, "Sheet", log)
+            return grant_sheet_permissions(sheet, pending, log)
+
+        defer("partage sheet", permissions_task(grant, permissions, f"partage du sheet {sheet.id}"))
+    return sheet, folder_id, in_folder
+
+
+def discard_sheet(drive_service, file_id: str, log: Callable[[str], None] = _no_log):
+    """Supprime un sheet créé mais jamais rempli"""
+    drive_service.files().delete(fileId=file_id).execute()
+    log(f"🗑️ Sheet inutilisé supprimé: {file_id}")
+
+
+class ChunkWriter:
+    """Écrit des lignes dans une feuille par blocs de `chunk_rows`, en-têtes avec le premier bloc
+
+    `prepare()` lance l'ouverture du sheet (`open_sheet`) dans un thread dès
+    la première page reçue : sa création se recouvre avec le téléchargement
+    et la projection au lieu d'attendre le premier bloc complet. Sans appel
+    à `prepare()`, le sheet est ouvert au premier bloc. `flush()` écrit le
+    dernier bloc partiel, ou seulement les en-têtes si aucune ligne n'a été
+    écrite (le sheet existe toujours à la fin d'un export réussi).
+    """
+
+    def __init__(self, open_sheet: Callable[[], Any], headers: Sequence[str], chunk_rows: int = 5000):
+        self._open_sheet = open_sheet
+        self.headers = list(headers)
+        self.chunk_rows = max(1, chunk_rows)
+        self.sheet = None
+        self.rows_written = 0
+        self.chunks_written = 0
+        self._worksheet = None
+        self._opening: Optional[Future] = None
+        self._pending: List[Sequence[Any]] = []
+
+    def prepare(self):
+        """Lance l'ouverture du sheet en arrière-plan (sans effet si déjà lancée)"""
+        if self._opening is not None or self._worksheet is not None:
+            return
+        self._opening = Future()
+        threading.Thread(target=self._open, name="chunk-writer-open", daemon=True).start()
+
+    def _open(self):
+        try:
+            self._opening.set_result(self._open_sheet())
+        except BaseException as open_error:
+            self._opening.set_exception(open_error)
+
+    def opened_sheet(self) -> Any:
+        """Sheet ouvert, ou en cours d'ouverture (attendue) ; None si aucun ou en cas d'échec"""
+        if self._opening is None:
+            return self.sheet
+        try:
+            return self._opening.result()
+        except Exception:
+            return None
+
+    def write(self, rows: Iterable[Sequence[Any]]):
+        self._pending.extend(rows)
+        while len(self._pending) >= self.chunk_rows:
+            chunk = self._pending[:self.chunk_rows]
+            del self._pending[:self.chunk_rows]
+            self._append(chunk)
+
+    def flush(self):
+        if self._pending:
+            chunk, self._pending = self._pending, []
+            self._append(chunk)
+        elif self._worksheet is None:
+            # Aucune ligne : le sheet est créé avec ses seuls en-têtes
+            self._append([])
+
+    def _append(self, rows: List[Sequence[Any]]):
+        values: List[Any] = list(rows)
+        if self._worksheet is None:
+            self.sheet = self._open_sheet() if self._opening is None else self._opening.result()
+            self._worksheet = self.sheet.get_worksheet(0)
+            values.insert(0, self.headers)
+        self._worksheet.append_rows(values)
+        if rows:
+            self.rows_written += len(rows)
+            self.chunks_written += 1
@@ -0,0 +1,340 @@
+"""
+Instantanés locaux indexés des collections upstream
+
+Une collection récupérée en entier est matérialisée dans un fichier
+d'instantané : enregistrements JSON contigus, table des offsets et index
+de hachage secondaires sur les champs filtrables. Le fichier est projeté
+en mémoire (mmap, lecture seule) : plusieurs processus workers partagent
+les mêmes pages, et seuls les enregistrements lus sont décodés.
+
+Une requête filtre + limite est servie depuis l'index en O(résultat) : les
+égalités (`{"userId": 3}`, `{"id": {"in": [1, 2]}}`) donnent des positions
+candidates, vérifiées ensuite par le prédicat compilé. Les autres filtres
+parcourent l'instantané, toujours sans appel upstream.
+
+Format (little/big endian de la machine, vérifié à l'ouverture) :
+    MAGIC | longueur de l'en-tête (uint32) | en-tête JSON | sections alignées sur 8 octets
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from agent import codec
+from agent.filters import CompiledFilter, Comparison, Node
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"APISNAP1"
+FORMAT_VERSION = 1
+
+_UINT64 = (1 << 64) - 1
+_NONE_KEY = _UINT64
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def index_hash(value: Any) -> Optional[int]:
+    """Clé d'index stable (64 bits) : valeurs égales en Python -> même clé
+
+    1, 1.0 et True se confondent, comme pour l'égalité des filtres ; None
+    (champ absent ou nul) est indexé, les valeurs non scalaires et NaN ne
+    le sont pas. Des valeurs différentes peuvent partager une clé : les
+    candidats sont toujours vérifiés par le prédicat.
+    """
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if not value.is_integer():
+            return _text_key(repr(value))
+        value = int(value)
+    if isinstance(value, int):
+        return value & _UINT64
+    if isinstance(value, str):
+        return _text_key(value)
+    if value is None:
+        return _NONE_KEY
+    return None
+
+
+def _text_key(text: str) -> int:
+    data = text.encode("utf-8", "surrogatepass")
+    return (len(data) << 32 | zlib.crc32(data)) & _UINT64
+
+
+def _sorted_index(keys: List[Optional[int]]) -> Tuple[bytes, bytes]:
+    """Table (clés triées, positions) d'un champ ; positions croissantes à clé égale"""
+    positions = [pos for pos, key in enumerate(keys) if key is not None]
+    keys = [key for key in keys if key is not None]
+    if np is not None:
+        hashes = np.array(keys, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        return hashes[order].tobytes(), np.array(positions, dtype=np.uint64)[order].tobytes()
+    pairs = sorted(zip(keys, positions))
+    return array("Q", (key for key, _ in pairs)).tobytes(), array("Q", (pos for _, pos in pairs)).tobytes()
+
+
+# =============================================================================
+# ÉCRITURE
+# =============================================================================
+
+def write_snapshot(path: str, url: str, records: Sequence[Dict[str, Any]],
+                   index_fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Écrit l'instantané de `records` (remplacement atomique) ; retourne son en-tête
+
+    Sans `index_fields`, tous les champs de premier niveau dont les valeurs
+    sont scalaires sont indexés.
+    """
+    bodies: List[bytes] = []
+    offsets = array("Q", [0])
+    fields: Dict[str, bool] = {}
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError("Instantané impossible : la collection ne contient pas que des objets")
+        body = codec.dumps_bytes(record)
+        bodies.append(body)
+        offsets.append(offsets[-1] + len(body))
+        for key, value in record.items():
+            fields[key] = fields.get(key, True) and isinstance(value, _SCALAR_TYPES)
+
+    if index_fields is None:
+        index_fields = [field for field, scalar in fields.items() if scalar]
+    else:
+        index_fields = [field for field in index_fields if field in fields]
+
+    sections: Dict[str, List[int]] = {}
+    blobs: List[bytes] = []
+    position = 0
+
+    def add_section(name: str, data: bytes):
+        nonlocal position
+        padding = _align(position) - position
+        if padding:
+            blobs.append(b"\0" * padding)
+            position += padding
+        sections[name] = [position, len(data)]
+        blobs.append(data)
+        position += len(data)
+
+    add_section("records", b"".join(bodies))
+    add_section("offsets", offsets.tobytes())
+    for field in index_fields:
+        hashes, positions = _sorted_index([index_hash(record.get(field)) for record in records])
+        add_section(f"index:{field}:hashes", hashes)
+        add_section(f"index:{field}:positions", positions)
+
+    header = {
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "url": url,
+        "created_at": time.time(),
+        "count": len(bodies),
+        "fields": list(fields),
+        "indexes": index_fields,
+        "sections": sections,
+    }
+    header_bytes = codec.dumps_bytes(header)
+    prefix = MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes
+    prefix += b"\0" * (_align(len(prefix)) - len(prefix))
+
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(prefix)
+        for blob in blobs:
+            f.write(blob)
+    # Les processus qui ont déjà projeté l'ancien fichier le gardent jusqu'à leur prochain get()
+    os.replace(temporary, path)
+    return header
+
+
+# =============================================================================
+# LECTURE
+# =============================================================================
+
+class Snapshot:
+    """Instantané projeté en mémoire : accès par position, index et requêtes filtrées"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Fichier d'instantané invalide: {path}")
+        (length,) = struct.unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = codec.loads(bytes(view[start:start + length]))
+        if header.get("version") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Format d'instantané incompatible: {path}")
+
+        base = _align(start + length)
+
+        def section(name: str) -> memoryview:
+            offset, size = header["sections"][name]
+            return view[base + offset:base + offset + size]
+
+        self.header = header
+        self.url: str = header["url"]
+        self.created_at: float = header["created_at"]
+        self.fields: List[str] = header["fields"]
+        self._records = section("records")
+        self._offsets = section("offsets").cast("Q")
+        self._indexes: Dict[str, Tuple[memoryview, memoryview]] = {
+            field: (section(f"index:{field}:hashes").cast("Q"), section(f"index:{field}:positions").cast("Q"))
+            for field in header["indexes"]
+        }
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    @property
+    def indexed_fields(self) -> List[str]:
+        return list(self._indexes)
+
+    def record(self, position: int) -> Dict[str, Any]:
+        return codec.loads(self._records[self._offsets[position]:self._offsets[position + 1]])
+
+    def records(self, positions: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        """Enregistrements aux positions données (tous, dans l'ordre, par défaut)"""
+        for position in range(len(self)) if positions is None else positions:
+            yield self.record(position)
+
+    def lookup(self, field: str, values: Iterable[Any]) -> List[int]:
+        """Positions candidates (croissantes) dont `field` a l'une des `values` (collisions possibles)"""
+        hashes, positions = self._indexes[field]
+        found: List[int] = []
+        keys = {index_hash(value) for value in values} - {None}
+        for key in keys:
+            low = bisect_left(hashes, key)
+            high = bisect_right(hashes, key, low)
+            found.extend(positions[low:high].tolist())
+        return sorted(set(found)) if len(keys) > 1 else found
+
+    def candidates(self, node: Optional[Node]) -> Optional[List[int]]:
+        """Positions candidates d'un arbre de filtres via les index (None = parcours complet)"""
+        if node is None:
+            return None
+        if isinstance(node, Comparison):
+            if node.steps is None and node.op in ("eq", "in") and node.field in self._indexes:
+                return self.lookup(node.field, node.value)
+            return None
+        kind, children = node
+        if kind == "and":
+            # Conjonction : la clause indexée la plus sélective suffit, le prédicat vérifie le reste
+            best = None
+            for child in children:
+                found = self.candidates(child)
+                if found is not None and (best is None or len(found) < len(best)):
+                    best = found
+            return best
+        if kind == "or":
+            parts = [self.candidates(child) for child in children]
+            if any(part is None for part in parts):
+                return None
+            return sorted(set().union(*parts))
+        return None
+
+    def query(self, predicate: Optional[CompiledFilter] = None) -> Iterator[Dict[str, Any]]:
+        """Enregistrements satisfaisant `predicate`, dans l'ordre de la collection"""
+        positions = self.candidates(predicate.node) if predicate else None
+        for record in self.records(positions):
+            if predicate is None or predicate(record):
+                yield record
+
+
+# =============================================================================
+# MAGASIN D'INSTANTANÉS
+# =============================================================================
+
+class SnapshotStore:
+    """Instantanés par URL dans un répertoire, reconstruits au-delà de `ttl` secondes"""
+
+    def __init__(self, directory: str, ttl: float = 300.0):
+        self.directory = directory
+        self.ttl = ttl
+        self._open: Dict[str, Tuple[Tuple[int, int, int], Snapshot]] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".snap")
+
+    def get(self, url: str, allow_stale: bool = False) -> Optional[Snapshot]:
+        """Instantané frais de `url` (rouvert si un autre processus l'a reconstruit), sinon None
+
+        `allow_stale` : retourne aussi un instantané au-delà de `ttl` (son âge reste consultable).
+        """
+        path = self.path(url)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            opened = self._open.get(path)
+            if opened is None or opened[0] != signature:
+                try:
+                    opened = (signature, Snapshot(path))
+                except (OSError, ValueError):
+                    return None
+                self._open[path] = opened
+        snapshot = opened[1]
+        if snapshot.url != url:
+            return None
+        return snapshot if allow_stale or snapshot.age < self.ttl else None
+
+    def build(self, url: str, records: Sequence[Dict[str, Any]],
+              index_fields: Optional[Sequence[str]] = None) -> Snapshot:
+        write_snapshot(self.path(url), url, records, index_fields)
+        snapshot = self.get(url)
+        if snapshot is None:
+            raise OSError(f"Instantané illisible après écriture: {self.path(url)}")
+        return snapshot
+
+    def get_or_build(self, url: str, fetch: Callable[[], Sequence[Dict[str, Any]]],
+                     index_fields: Optional[Sequence[str]] = None) -> Snapshot:
+        """Instantané frais, ou collection récupérée via `fetch()` puis matérialisée"""
+        snapshot = self.get(url)
+        if snapshot is not None:
+            return snapshot
+        with self._build_lock(url):
+            # Un autre thread a pu le reconstruire pendant l'attente
+            return self.get(url) or self.build(url, fetch(), index_fields)
+
+    def refresh(self, url: str, fetch: Callable[[], Sequence[Dict[str, Any]]],
+                index_fields: Optional[Sequence[str]] = None) -> Snapshot:
+        """Reconstruit l'instantané de `url` même s'il est encore frais (préchargement)"""
+        with self._build_lock(url):
+            return self.build(url, fetch(), index_fields)
+
+    def _build_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(url, threading.Lock())
+
+    def invalidate(self, url: str):
+        with self._lock:
+            self._open.pop(self.path(url), None)
+        try:
+            os.remove(self.path(url))
+        except OSError:
+            pass
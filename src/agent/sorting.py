@@ -0,0 +1,171 @@
+"""
+Tri et top-k pour les requêtes du type "les 10 derniers posts"
+
+Le tri demandé (`extracted_params["sort"]`) est délégué à l'API upstream
+(`_sort` / `_order` de json-server) quand l'hôte le supporte. Sinon il est
+évalué localement avec un tas borné (`heapq.nsmallest` / `nlargest`) ou une
+sélection partielle NumPy : garder N lignes coûte O(n log N), sans trier
+toute la collection.
+"""
+
+import heapq
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from agent.columnar import ColumnarBatch
+from agent.projection import is_path, parse_path, resolve_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ORDER_ALIASES = {
+    "asc": "asc", "ascending": "asc", "croissant": "asc", "+": "asc",
+    "desc": "desc", "descending": "desc", "decroissant": "desc", "décroissant": "desc", "-": "desc",
+}
+
+_MISSING = object()
+
+
+def normalize_sort(spec: Any) -> Optional[Dict[str, str]]:
+    """Normalise `sort` ("id", "-id", {"field": "id", "order": "desc"}) en {"field", "order"}"""
+    if not spec:
+        return None
+    if isinstance(spec, list):
+        spec = spec[0]
+    if isinstance(spec, str):
+        field = spec.strip()
+        order = "desc" if field.startswith("-") else "asc"
+        field = field.lstrip("+-").strip()
+        return {"field": field, "order": order} if field else None
+    if isinstance(spec, dict):
+        field = spec.get("field") or spec.get("by") or spec.get("key")
+        if not isinstance(field, str) or not field.strip():
+            return None
+        order = ORDER_ALIASES.get(str(spec.get("order", "asc")).strip().lower())
+        if order is None:
+            raise ValueError(f"Ordre de tri inconnu: {spec.get('order')!r}")
+        return {"field": field.strip(), "order": order}
+    raise ValueError(f"Spécification de tri invalide: {spec!r}")
+
+
+# =============================================================================
+# DÉLÉGATION À L'API (json-server)
+# =============================================================================
+
+def supports_pushdown(url: str, hosts: Iterable[str]) -> bool:
+    """Vrai si l'hôte de l'URL accepte `_sort` / `_order` / `_limit`"""
+    host = urlparse(url).hostname or ""
+    return host in set(hosts)
+
+
+def pushdown_params(sort: Optional[Dict[str, str]], limit: Optional[int] = None) -> Dict[str, Any]:
+    """Paramètres json-server pour un tri (et une limite) côté serveur
+
+    La limite n'est déléguée qu'avec le tri, ou sans tri : un tri resté local
+    (chemin imbriqué) doit voir toutes les lignes pour que son top-k soit exact.
+    """
+    params: Dict[str, Any] = {}
+    if sort and not is_path(sort["field"]):
+        params["_sort"] = sort["field"]
+        params["_order"] = sort["order"]
+    if limit is not None and (not sort or "_sort" in params):
+        params["_limit"] = limit
+    return params
+
+
+# =============================================================================
+# TOP-K LOCAL
+# =============================================================================
+
+def sortable_value(value: Any) -> Tuple[int, Any]:
+    """Clé comparable entre types hétérogènes (nombres < textes < autres)"""
+    if isinstance(value, bool):
+        return (2, str(value))
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, str(value))
+
+
+def _key_function(descending: bool):
+    """Clé d'une valeur ; les valeurs absentes sont toujours placées en dernier"""
+    missing_key = (-1, "") if descending else (3, "")
+
+    def key(value):
+        return missing_key if value is None or value is _MISSING else sortable_value(value)
+    return key
+
+
+def _item_key(field: str, descending: bool):
+    value_key = _key_function(descending)
+    if is_path(field):
+        steps = parse_path(field)
+        return lambda item: value_key(resolve_path(item, steps, _MISSING))
+    return lambda item: value_key(item.get(field))
+
+
+def top_k(data, sort: Dict[str, str], limit: int):
+    """Les `limit` premiers éléments selon `sort` (tas borné, stable comme `sorted`)"""
+    if isinstance(data, ColumnarBatch):
+        return _columnar_top_k(data, sort, limit)
+    descending = sort["order"] == "desc"
+    select = heapq.nlargest if descending else heapq.nsmallest
+    field = sort["field"]
+    if not is_path(field) and isinstance(data, (list, tuple)):
+        # Chemin rapide : valeurs homogènes et toutes présentes (rejouable, donc pas sur un flux)
+        try:
+            return select(limit, data, key=itemgetter(field))
+        except (KeyError, TypeError):
+            pass
+    return select(limit, data, key=_item_key(field, descending))
+
+
+def _column_values(batch: ColumnarBatch, field: str):
+    """Valeurs d'un champ (chemin résolu) pour les lignes sélectionnées du lot"""
+    steps = parse_path(field) if is_path(field) else (field,)
+    root, rest = steps[0], steps[1:]
+    if root not in batch.columns:
+        return [None] * len(batch)
+    column = batch.column(root)
+    if not rest:
+        return column
+    values = column if isinstance(column, list) else column.tolist()
+    return [resolve_path(value, rest, None) for value in values]
+
+
+def _columnar_top_k(batch: ColumnarBatch, sort: Dict[str, str], limit: int) -> ColumnarBatch:
+    descending = sort["order"] == "desc"
+    values = _column_values(batch, sort["field"])
+
+    if np is not None:
+        base = np.arange(len(batch)) if batch.selection is None else np.asarray(batch.selection)
+    else:
+        base = range(len(batch)) if batch.selection is None else batch.selection
+
+    if np is not None and isinstance(values, np.ndarray) and values.dtype.kind in "if":
+        # Sélection partielle O(n) puis tri des seuls candidats ; toutes les égalités
+        # avec la k-ième clé sont gardées pour départager par position, comme `sorted`
+        keys = -values if descending else values
+        if limit < len(keys):
+            kth = np.partition(keys, limit - 1)[limit - 1]
+            candidates = np.flatnonzero(keys <= kth)
+        else:
+            candidates = np.arange(len(keys))
+        ordered = candidates[np.lexsort((candidates, keys[candidates]))][:limit]
+        return batch.with_selection(base[ordered])
+
+    # Colonnes non numériques : tas borné sur (clé, position)
+    key = _key_function(descending)
+    values = values if isinstance(values, list) else values.tolist()
+    pairs = ((key(value), position) for position, value in enumerate(values))
+    if descending:
+        # Égalités : la plus petite position d'abord, comme `sorted(..., reverse=True)`
+        chosen = heapq.nlargest(limit, pairs, key=lambda pair: (pair[0], -pair[1]))
+    else:
+        chosen = heapq.nsmallest(limit, pairs)
+    selection = [base[position] for _, position in chosen]
+    return batch.with_selection(np.asarray(selection, dtype=np.int64) if np is not None else selection)
@@ -0,0 +1,129 @@
+"""
+Pipeline producteur/consommateur à étages reliés par des files bornées
+
+Utilisé par l'export en flux : téléchargement des pages, projection des
+lignes et écriture dans Google Sheets se recouvrent. Chaque étage tourne
+dans son propre thread et les files sont bornées : la mémoire crête vaut
+quelques blocs quel que soit le nombre total de lignes, et la durée tend
+vers celle de l'étage le plus lent plutôt que vers la somme des étages.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional
+
+_DONE = object()
+
+# Intervalle de réveil des threads bloqués pour vérifier l'arrêt (secondes)
+POLL_INTERVAL = 0.1
+
+
+class _Stage:
+    """État partagé d'une exécution : arrêt coopératif et première erreur"""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.errors: List[BaseException] = []
+
+    def fail(self, error: BaseException):
+        self.errors.append(error)
+        self.stop.set()
+
+    def put(self, q: queue.Queue, item: Any) -> bool:
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self, q: queue.Queue):
+        # Le marqueur de fin doit passer même après un arrêt (consommateur en attente)
+        while True:
+            try:
+                q.put(_DONE, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                if self.stop.is_set():
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def items(self, q: queue.Queue):
+        while True:
+            try:
+                item = q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+
+def run_pipeline(source: Iterable[Any], transform: Callable[[Any], Optional[Any]],
+                 sink: Callable[[Any], None], queue_size: int = 4) -> int:
+    """Exécute source -> transform -> sink en parallèle ; retourne le nombre de blocs écrits
+
+    `source` et `transform` tournent dans des threads dédiés, `sink` dans le
+    thread appelant. Un `transform` qui retourne None ou un bloc vide ne
+    transmet rien. La première exception d'un étage arrête les autres et est
+    relevée ici.
+    """
+    stage = _Stage()
+    fetched: queue.Queue = queue.Queue(maxsize=queue_size)
+    transformed: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    def produce():
+        try:
+            for item in source:
+                if not stage.put(fetched, item):
+                    break
+        except BaseException as error:
+            stage.fail(error)
+        finally:
+            stage.close(fetched)
+
+    def process():
+        try:
+            for item in stage.items(fetched):
+                if stage.stop.is_set():
+                    continue
+                result = transform(item)
+                if result is not None and len(result):
+                    if not stage.put(transformed, result):
+                        continue
+        except BaseException as error:
+            stage.fail(error)
+            # Vider l'amont pour débloquer le producteur
+            for _ in stage.items(fetched):
+                pass
+        finally:
+            stage.close(transformed)
+
+    threads = [
+        threading.Thread(target=produce, name="pipeline-source", daemon=True),
+        threading.Thread(target=process, name="pipeline-transform", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    written = 0
+    try:
+        for chunk in stage.items(transformed):
+            if stage.stop.is_set():
+                continue
+            sink(chunk)
+            written += 1
+    except BaseException as error:
+        stage.fail(error)
+        for _ in stage.items(transformed):
+            pass
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if stage.errors:
+        raise stage.errors[0]
+    return written
@@ -0,0 +1,10 @@
+"""
+Configuration pytest : les tests importent le package `agent` depuis src/
+sans installation préalable (même principe que benchmarks/)
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
@@ -0,0 +1,95 @@
+"""Tests de l'agrégation group-by (agent.aggregation)"""
+
+import random
+from collections import defaultdict
+
+import pytest
+
+from agent.aggregation import aggregate, normalize_aggregate, required_fields
+from agent.columnar import ColumnarBatch
+
+METRICS = [
+    {"op": "count"},
+    {"op": "sum", "field": "value"},
+    {"op": "avg", "field": "value"},
+    {"op": "min", "field": "value"},
+    {"op": "max", "field": "value"},
+    {"op": "count_distinct", "field": "value"},
+]
+
+
+def synthetic(size, seed=3, missing=False):
+    rng = random.Random(seed)
+    records = []
+    for position in range(size):
+        value = rng.randint(-50, 50)
+        if missing and position % 7 == 0:
+            value = None
+        records.append({"userId": rng.randint(1, 12), "kind": rng.choice("abc"), "value": value})
+    return records
+
+
+def reference(records, group_by):
+    """Agrégation naïve : une passe Python par groupe, groupes triés par clé"""
+    groups = defaultdict(list)
+    for record in records:
+        groups[tuple(record[field] for field in group_by)].append(record["value"])
+    rows = []
+    for key in sorted(groups):
+        values = [value for value in groups[key] if value is not None]
+        rows.append({
+            **dict(zip(group_by, key)),
+            "count": len(groups[key]),
+            "sum_value": sum(values),
+            "avg_value": sum(values) / len(values) if values else None,
+            "min_value": min(values, default=None),
+            "max_value": max(values, default=None),
+            "count_distinct_value": len(set(values)),
+        })
+    return rows
+
+
+@pytest.mark.parametrize("missing", [False, True], ids=["numeric", "python"])
+@pytest.mark.parametrize("group_by", [["userId"], ["kind"], ["userId", "kind"]])
+def test_aggregate_matches_reference(group_by, missing):
+    records = synthetic(5000, missing=missing)
+    spec = normalize_aggregate({"group_by": group_by, "metrics": METRICS})
+    result = aggregate(ColumnarBatch.from_records(records), spec).to_records()
+    expected = reference(records, group_by)
+    assert [row["count"] for row in result] == [row["count"] for row in expected]
+    for row, wanted in zip(result, expected):
+        assert row.pop("avg_value") == pytest.approx(wanted.pop("avg_value"))
+        assert row == wanted
+
+
+def test_aggregate_without_group_by_and_on_selection():
+    records = synthetic(100)
+    batch = ColumnarBatch.from_records(records).where([record["kind"] == "a" for record in records])
+    result = aggregate(batch, normalize_aggregate({"metrics": ["count", {"op": "sum", "field": "value"}]}))
+    selected = [record["value"] for record in records if record["kind"] == "a"]
+    assert result.to_records() == [{"count": len(selected), "sum_value": sum(selected)}]
+    assert len(aggregate(ColumnarBatch.from_records([]), normalize_aggregate({"metrics": ["count"]}))) == 0
+
+
+def test_normalize_aggregate():
+    spec = normalize_aggregate({"by": "userId", "metrics": ["nombre", {"agg": "moyenne", "field": "id", "as": "avg"}]})
+    assert spec == {
+        "group_by": ["userId"],
+        "metrics": [{"op": "count", "field": None, "name": "count"}, {"op": "avg", "field": "id", "name": "avg"}],
+    }
+    assert normalize_aggregate({"group_by": ["userId"]})["metrics"] == [{"op": "count", "field": None, "name": "count"}]
+    assert normalize_aggregate(None) is None
+    assert required_fields(normalize_aggregate({"group_by": ["userId"], "metrics": [{"op": "sum", "field": "id"}]})) == [
+        "userId", "id"
+    ]
+
+
+@pytest.mark.parametrize("spec", [
+    ["userId"],
+    {"group_by": "userId", "metrics": [{"op": "median", "field": "id"}]},
+    {"group_by": "userId", "metrics": [{"op": "sum"}]},
+    {"group_by": [3]},
+])
+def test_normalize_aggregate_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        normalize_aggregate(spec)
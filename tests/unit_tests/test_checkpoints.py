@@ -0,0 +1,139 @@
+"""Tests du checkpointer SQLite des runs (agent.checkpoints)"""
+
+import operator
+import time
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langgraph.checkpoint.base import empty_checkpoint  # noqa: E402
+from langgraph.graph import END, START, StateGraph  # noqa: E402
+
+from agent.checkpoints import ZLIB_SUFFIX, CompactSerializer, SqliteCheckpointer  # noqa: E402
+from agent.columnar import ColumnarBatch  # noqa: E402
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SqliteCheckpointer(str(tmp_path / "checkpoints.sqlite"), CompactSerializer(compress_min_bytes=256))
+
+
+def config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def checkpoint(values, versions):
+    stored = empty_checkpoint()
+    stored["channel_values"] = values
+    stored["channel_versions"] = versions
+    return stored
+
+
+def test_compact_serializer_round_trip():
+    serde = CompactSerializer(compress_min_bytes=64)
+    small = {"id": 1}
+    large = {"rows": [{"id": i, "title": "sunt aut facere"} for i in range(100)]}
+    assert not serde.dumps_typed(small)[0].endswith(ZLIB_SUFFIX)
+    type_, payload = serde.dumps_typed(large)
+    assert type_.endswith(ZLIB_SUFFIX)
+    assert serde.loads_typed((type_, payload)) == large
+    batch = serde.loads_typed(serde.dumps_typed(ColumnarBatch.from_records(large["rows"])))
+    assert batch.to_records() == large["rows"]
+
+
+def test_put_get_list_round_trip(saver):
+    rows = [{"id": i, "body": "x" * 20} for i in range(200)]
+    first = checkpoint({"query": "posts", "rows": rows}, {"query": "1", "rows": "1"})
+    saved = saver.put(config("run-1"), first, {"step": 1, "source": "loop"}, {"query": "1", "rows": "1"})
+    second = checkpoint({"query": "posts", "rows": rows, "url": "https://sheet"},
+                        {"query": "1", "rows": "1", "url": "2"})
+    second_config = saver.put(saved, second, {"step": 2, "source": "loop"}, {"url": "2"})
+
+    latest = saver.get_tuple(config("run-1"))
+    assert latest.config["configurable"]["checkpoint_id"] == second["id"]
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["id"]
+    assert latest.checkpoint["channel_values"] == {"query": "posts", "rows": rows, "url": "https://sheet"}
+    assert latest.metadata["step"] == 2
+
+    assert saver.get_tuple(saved).checkpoint["channel_values"] == {"query": "posts", "rows": rows}
+    assert [item.metadata["step"] for item in saver.list(config("run-1"))] == [2, 1]
+    assert [item.metadata["step"] for item in saver.list(None, filter={"step": 1})] == [1]
+    assert [item.metadata["step"] for item in saver.list(config("run-1"), before=second_config)] == [1]
+    assert len(list(saver.list(config("run-1"), limit=1))) == 1
+    assert saver.get_tuple(config("other")) is None
+
+
+def test_unchanged_values_stored_once(saver):
+    rows = [{"id": i} for i in range(500)]
+    saved = saver.put(config("run-1"), checkpoint({"rows": rows}, {"rows": "1"}), {}, {"rows": "1"})
+    saver.put(saved, checkpoint({"rows": list(rows)}, {"rows": "2"}), {}, {"rows": "2"})
+    saver.put(config("run-2"), checkpoint({"rows": rows}, {"rows": "1"}), {}, {"rows": "1"})
+    (payloads,) = saver._connection().execute("SELECT COUNT(*) FROM payloads").fetchone()
+    assert payloads == 1
+
+
+def test_pending_writes_and_delete_thread(saver):
+    stored = checkpoint({"query": "posts"}, {"query": "1"})
+    saved = saver.put(config("run-1"), stored, {}, {"query": "1"})
+    saver.put_writes(saved, [("rows", [1, 2]), ("url", "u")], task_id="task-a")
+    saver.put_writes(saved, [("rows", [3])], task_id="task-b")
+    writes = saver.get_tuple(config("run-1")).pending_writes
+    assert writes == [("task-a", "rows", [1, 2]), ("task-a", "url", "u"), ("task-b", "rows", [3])]
+
+    saver.put(config("run-2"), checkpoint({"query": "users"}, {"query": "1"}), {}, {"query": "1"})
+    saver.delete_thread("run-1")
+    assert saver.get_tuple(config("run-1")) is None
+    assert saver.get_tuple(config("run-2")).checkpoint["channel_values"] == {"query": "users"}
+    (payloads,) = saver._connection().execute("SELECT COUNT(*) FROM payloads").fetchone()
+    assert payloads == 1
+
+
+def test_purge_removes_expired_runs(saver):
+    saver.put(config("old"), checkpoint({"q": "a"}, {"q": "1"}), {}, {"q": "1"})
+    saver._connection().execute("UPDATE checkpoints SET created_at = ?", (time.time() - 3600,))
+    saver.put(config("new"), checkpoint({"q": "b"}, {"q": "1"}), {}, {"q": "1"})
+    assert saver.purge(60) == 1
+    assert saver.get_tuple(config("old")) is None and saver.get_tuple(config("new")) is not None
+
+
+class State(TypedDict):
+    steps: Annotated[List[str], operator.add]
+
+
+def test_graph_resumes_from_last_successful_step(saver):
+    calls = {"fetch": 0, "write": 0}
+    failing = [True]
+
+    def fetch(state):
+        calls["fetch"] += 1
+        return {"steps": ["fetch"]}
+
+    def write(state):
+        calls["write"] += 1
+        if failing[0]:
+            raise RuntimeError("quota")
+        return {"steps": ["write"]}
+
+    workflow = StateGraph(State)
+    workflow.add_node("fetch", fetch)
+    workflow.add_node("write", write)
+    workflow.add_edge(START, "fetch")
+    workflow.add_edge("fetch", "write")
+    workflow.add_edge("write", END)
+    graph = workflow.compile(checkpointer=saver)
+
+    run = {"configurable": {"thread_id": "run-1"}}
+    with pytest.raises(RuntimeError):
+        graph.invoke({"steps": []}, run)
+    assert graph.get_state(run).next == ("write",)
+
+    # Nouveau checkpointer sur la même base : le run reprend à l'étape en échec
+    graph = workflow.compile(checkpointer=SqliteCheckpointer(saver.path))
+    failing[0] = False
+    assert graph.invoke(None, run) == {"steps": ["fetch", "write"]}
+    assert calls == {"fetch": 1, "write": 2}
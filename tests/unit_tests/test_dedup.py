@@ -0,0 +1,60 @@
+"""Tests de la déduplication et des empreintes de lignes (agent.dedup)"""
+
+import pytest
+
+from agent.columnar import ColumnarBatch
+from agent.dedup import (Deduplicator, dedup_batch, dedup_records, normalize_dedup_key, record_fingerprint,
+                         row_fingerprint)
+
+
+def test_fingerprint_is_stable_and_column_order_independent():
+    digest = row_fingerprint((1, "a", None), ["id", "title", "body"])
+    assert digest == row_fingerprint(("a", None, 1), ["title", "body", "id"])
+    assert len(digest) == 32
+    assert digest != row_fingerprint((1, "a", None), ["id", "body", "title"])
+    assert digest != row_fingerprint(("1", "a", None), ["id", "title", "body"])
+
+
+def test_fingerprint_of_nested_values_ignores_key_order():
+    assert row_fingerprint(({"a": 1, "b": [1, 2]},), ["x"]) == row_fingerprint(({"b": [1, 2], "a": 1},), ["x"])
+    assert record_fingerprint({"id": 1, "tags": ["a"]}) == record_fingerprint({"tags": ["a"], "id": 1})
+    assert record_fingerprint({"id": 1, "address": {"city": "P"}}, ["address.city"]) == \
+        record_fingerprint({"id": 2, "address": {"city": "P"}}, ["address.city"])
+
+
+def test_deduplicator_keeps_first_occurrence():
+    rows = [(1, "a"), (2, "b"), (1, "a"), (3, "a"), (2, "b")]
+    deduplicator = Deduplicator(["id", "title"])
+    assert list(deduplicator.unique(rows)) == [(1, "a"), (2, "b"), (3, "a")]
+    assert deduplicator.duplicates == 2
+    # L'état est partagé entre pages successives
+    assert deduplicator.is_new((4, "d")) and not deduplicator.is_new((3, "a"))
+    assert deduplicator.duplicates == 3
+
+
+def test_dedup_records_on_declared_key():
+    records = [{"id": 1, "v": "x"}, {"id": 2, "v": "y"}, {"id": 1, "v": "z"}, {"v": "w"}, {"v": "k"}]
+    assert [record["v"] for record in dedup_records(records, ["id"])] == ["x", "y", "w"]
+
+
+@pytest.mark.parametrize("key, expected", [(None, [0, 1, 3]), (["id"], [0, 1])])
+def test_dedup_batch(key, expected):
+    records = [{"id": 1, "v": "a"}, {"id": 2, "v": "b"}, {"id": 1, "v": "a"}, {"id": 1, "v": "c"}]
+    batch = dedup_batch(ColumnarBatch.from_records(records), key)
+    assert batch.to_records() == [records[position] for position in expected]
+
+
+@pytest.mark.parametrize("spec, expected", [
+    (None, None),
+    (True, None),
+    ("id", ["id"]),
+    ("id, userId", ["id", "userId"]),
+    (["id", " "], ["id"]),
+])
+def test_normalize_dedup_key(spec, expected):
+    assert normalize_dedup_key(spec) == expected
+
+
+def test_normalize_dedup_key_rejects_invalid_specs():
+    with pytest.raises(ValueError):
+        normalize_dedup_key({"id": 1})
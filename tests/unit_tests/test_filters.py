@@ -0,0 +1,88 @@
+"""Tests du moteur de filtres compilé (agent.filters)"""
+
+import pytest
+
+from agent.columnar import ColumnarBatch
+from agent.filters import FilterError, compile_filter, parse_filter
+
+RECORDS = [
+    {"id": 1, "userId": 1, "title": "sunt aut facere", "address": {"city": "Paris", "geo": {"lat": "48.85"}}},
+    {"id": 2, "userId": 1, "title": "qui est esse", "address": {"city": "Lyon", "geo": {"lat": "45.76"}}},
+    {"id": 3, "userId": 2, "title": "ea molestias", "email": "a@x.org"},
+    {"id": 4, "userId": "2", "title": None, "address": {"city": "Paris"}},
+    {"id": 5, "userId": 3, "title": "Qui dolorem", "tags": ["a", "b"]},
+]
+
+
+def ids(spec, records=RECORDS, **kwargs):
+    return [record["id"] for record in compile_filter(spec, **kwargs).apply(records)]
+
+
+def columnar_ids(spec, records=RECORDS):
+    batch = compile_filter(spec).apply(ColumnarBatch.from_records(records))
+    return [record["id"] for record in batch.to_records()]
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ({}, [1, 2, 3, 4, 5]),
+    ({"userId": 1}, [1, 2]),
+    ({"userId": "2"}, [3, 4]),
+    ({"userId": [1, 3]}, [1, 2, 5]),
+    ({"id": {"gte": 2, "lt": 4}}, [2, 3]),
+    ({"id": {">": "3"}}, [4, 5]),
+    # Seule une valeur de filtre textuelle a aussi sa forme numérique ("2" stocké ne vaut pas 2)
+    ({"userId": {"nin": [1, 2]}}, [4, 5]),
+    ({"title": {"contains": "QUI"}}, [2, 5]),
+    ({"title": {"regex": "^sunt"}}, [1]),
+    ({"email": {"exists": True}}, [3]),
+    ({"address.city": "Paris"}, [1, 4]),
+    ({"address": {"city": "Lyon"}}, [2]),
+    ({"address.geo.lat": {"gt": 46}}, [1]),
+    ({"or": [{"userId": 3}, {"id": 1}]}, [1, 5]),
+    ({"not": {"userId": 1}}, [3, 4, 5]),
+    ([{"userId": 1}, {"id": {"ne": 1}}], [2]),
+])
+def test_filter_semantics(spec, expected):
+    assert ids(spec) == expected
+    assert columnar_ids(spec) == expected
+
+
+@pytest.mark.parametrize("spec, expected", [
+    # Champ absent du premier enregistrement (ou de tous) : évalué comme null, jamais retiré
+    ({"email": {"contains": "x"}}, [3]),
+    ({"nope": 2}, []),
+    ({"nope": {"contains": "x"}}, []),
+    ({"userId": 1, "nope": 2}, []),
+    ({"not": {"nope": 2}}, [1, 2, 3, 4, 5]),
+    ({"not": {"email": {"contains": "x"}}}, [1, 2, 4, 5]),
+])
+def test_unknown_fields_fail_closed(spec, expected):
+    first_keys = RECORDS[0].keys()
+    assert ids(spec, known_fields=first_keys) == expected
+    assert columnar_ids(spec) == expected
+
+
+def test_unknown_fields_are_reported_not_pruned():
+    predicate = compile_filter({"email": {"contains": "x"}, "id": 1}, known_fields=["id", "title"])
+    assert predicate.unknown == ["email"]
+    assert predicate.node is not None
+    assert compile_filter({"id": 1}, known_fields=["id"]).unknown == []
+
+
+def test_empty_filter_is_falsy():
+    predicate = compile_filter({})
+    assert not predicate
+    assert predicate.apply(RECORDS) is RECORDS
+    assert parse_filter(None) is None
+
+
+@pytest.mark.parametrize("spec", [
+    "userId = 1",
+    {"id": {"gte": 1, "bogus": 2}},
+    {"or": {"id": 1}},
+    {"id": {"gt": [1]}},
+    {"title": {"regex": "("}},
+])
+def test_invalid_specs_raise(spec):
+    with pytest.raises(FilterError):
+        compile_filter(spec)
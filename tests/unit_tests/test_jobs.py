@@ -0,0 +1,106 @@
+"""Tests de la file persistante des exports (agent.jobs)"""
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from agent.jobs import JobQueue, _owner_alive
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite")
+
+
+def queue(path, runner=lambda job: {"query": job["query"]}, **kwargs):
+    return JobQueue(path, runner, workers=1, poll_interval=0.05, **kwargs)
+
+
+def test_submit_claim_finish_round_trip(path):
+    jobs = queue(path)
+    low = jobs.submit("export posts", priority=0)
+    high = jobs.submit("export users", priority=5)
+    assert jobs.position(high) == 1 and jobs.position(low) == 2
+    assert jobs.counts() == {"queued": 2}
+
+    job = jobs._claim()
+    assert job["id"] == high and job["status"] == "running" and job["attempts"] == 1
+    assert job["owner"] == jobs.owner
+    jobs._finish(job["id"], result={"rows": 3})
+    done = jobs.get(high)
+    assert done["status"] == "done" and done["result"] == {"rows": 3} and done["owner"] is None
+
+    job = jobs._claim()
+    jobs._finish(job["id"], error="boom")
+    assert jobs.get(low)["status"] == "failed" and jobs.get(low)["error"] == "boom"
+    assert jobs._claim() is None
+    # Les jobs survivent à la réouverture de la base
+    assert queue(path).get(high)["result"] == {"rows": 3}
+
+
+def test_workers_run_jobs(path):
+    finished = threading.Event()
+
+    def runner(job):
+        finished.set()
+        return {"query": job["query"]}
+
+    jobs = queue(path, runner).start()
+    try:
+        job_id = jobs.submit("export comments")
+        assert finished.wait(5)
+        deadline = time.time() + 5
+        while jobs.get(job_id)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.02)
+        assert jobs.get(job_id)["result"] == {"query": "export comments"}
+    finally:
+        jobs.stop(5)
+
+
+def test_owner_is_unique_per_instance(path):
+    first, second = queue(path), queue(path)
+    assert first.owner != second.owner
+    assert first.owner.startswith(f"{socket.gethostname()}:")
+    assert _owner_alive(first.owner)
+
+
+def test_restarted_process_with_same_pid_recovers_its_stale_jobs(path):
+    crashed = queue(path, lease_seconds=0.1)
+    job_id = crashed.submit("export posts")
+    crashed._claim()
+
+    # Même hôte, même pid (conteneur redémarré) : seul le bail expiré signale l'abandon
+    restarted = queue(path, lease_seconds=0.1)
+    restarted.heartbeat()
+    time.sleep(0.15)
+    assert restarted.recover() == 1
+    assert restarted.get(job_id)["status"] == "queued"
+    assert restarted._claim()["attempts"] == 2
+
+
+def test_jobs_of_dead_process_recovered_at_once_then_failed(path):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    dead_owner = f"{socket.gethostname()}:{process.pid}:0123abcd"
+    jobs = queue(path, max_attempts=2)
+    job_id = jobs.submit("export albums")
+
+    for attempt in (1, 2):
+        jobs._claim()
+        jobs._connection().execute("UPDATE jobs SET owner = ? WHERE id = ?", (dead_owner, job_id))
+        assert jobs.recover() == 1
+    job = jobs.get(job_id)
+    assert job["status"] == "failed" and "2 essai(s)" in job["error"]
+
+
+def test_live_foreign_owner_keeps_its_lease(path):
+    jobs = queue(path)
+    job_id = jobs.submit("export todos")
+    jobs._claim()
+    jobs._connection().execute("UPDATE jobs SET owner = 'other-host:1:ff' WHERE id = ?", (job_id,))
+    assert jobs.recover() == 0
+    assert jobs.get(job_id)["status"] == "running"
@@ -0,0 +1,66 @@
+"""Tests de l'enrichissement multi-sources (agent.joins)"""
+
+import pytest
+
+from agent.joins import hash_join, normalize_joins, resolve_join_keys, resource_name, source_url
+
+USERS = [{"id": 1, "name": "Leanne"}, {"id": 2, "name": "Ervin"}, {"id": 3, "name": "Clementine"}]
+POSTS = [
+    {"id": 10, "userId": 2},
+    {"id": 11, "userId": "1"},
+    {"id": 12, "userId": 9},
+    {"id": 13, "userId": 2},
+    {"id": 14},
+]
+
+
+def joined_pairs(rows):
+    return [(row["id"], row["users"] and row["users"]["name"]) for row in rows]
+
+
+@pytest.mark.parametrize("users", [USERS, USERS * 5], ids=["index-right", "index-left"])
+def test_hash_join_is_a_left_join_in_left_order(users):
+    # Les deux stratégies (index sur le plus petit côté) donnent le même résultat
+    rows = hash_join(POSTS, users[:3], "userId", "id", "users")
+    assert joined_pairs(rows) == [(10, "Ervin"), (11, "Leanne"), (12, None), (13, "Ervin"), (14, None)]
+    assert rows[0] == {"id": 10, "userId": 2, "users": {"id": 2, "name": "Ervin"}}
+
+
+def test_hash_join_both_index_sides_agree_with_duplicates():
+    right = [{"id": 2, "name": "a"}, {"id": 2, "name": "b"}]
+    small_left = hash_join(POSTS[:1], right, "userId", "id", "users")
+    large_left = hash_join(POSTS, right, "userId", "id", "users")
+    assert joined_pairs(small_left) == [(10, "a"), (10, "b")]
+    assert joined_pairs(large_left) == [(10, "a"), (10, "b"), (11, None), (12, None), (13, "a"), (13, "b"), (14, None)]
+
+
+@pytest.mark.parametrize("right_size", [1, 10])
+def test_missing_keys_never_match(right_size):
+    left = [{"id": 1, "userId": None}, {"id": 2}]
+    right = ([{"id": None, "name": "x"}, {"name": "y"}] * right_size)
+    assert joined_pairs(hash_join(left, right, "userId", "id", "users")) == [(1, None), (2, None)]
+
+
+def test_resource_urls():
+    assert resource_name("https://api.example.com/posts?userId=1") == "posts"
+    assert resource_name("https://api.example.com/v1/posts/") == "posts"
+    assert source_url("https://api.example.com/v1/posts?x=1", "users") == "https://api.example.com/v1/users"
+
+
+def test_normalize_joins():
+    assert normalize_joins(None) == []
+    assert normalize_joins("users") == [{"resource": "users", "left_on": None, "right_on": None}]
+    assert normalize_joins([{"source": "/users/", "left_on": "userId", "right_on": "id"}]) == [
+        {"resource": "users", "left_on": "userId", "right_on": "id"}
+    ]
+    with pytest.raises(ValueError):
+        normalize_joins([{"left_on": "userId"}])
+    with pytest.raises(ValueError):
+        normalize_joins([3])
+
+
+def test_resolve_join_keys():
+    relations = {("posts", "users"): ("userId", "id")}
+    assert resolve_join_keys({"resource": "users"}, "posts", relations) == ("userId", "id")
+    assert resolve_join_keys({"resource": "users", "left_on": "a", "right_on": "b"}, "posts", relations) == ("a", "b")
+    assert resolve_join_keys({"resource": "albums"}, "posts", relations) is None
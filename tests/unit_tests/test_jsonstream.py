@@ -0,0 +1,61 @@
+"""Tests du parsing JSON incrémental (agent.jsonstream)"""
+
+import json
+
+import pytest
+
+from agent import jsonstream
+from agent.jsonstream import _iter_stdlib, iter_json_items
+
+BOM = b"\xef\xbb\xbf"
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.fixture(params=["stdlib", "ijson"])
+def backend(request, monkeypatch):
+    if request.param == "ijson":
+        pytest.importorskip("ijson")
+        monkeypatch.setattr(jsonstream, "IJSON_AVAILABLE", True)
+    else:
+        monkeypatch.setattr(jsonstream, "IJSON_AVAILABLE", False)
+    return request.param
+
+
+@pytest.mark.parametrize("size", [1, 3, 1024])
+def test_array_items_across_chunk_boundaries(backend, size):
+    items = [{"id": 1, "title": "é"}, {"id": 2, "score": 1e-07}, [1, 2], "x", None]
+    assert list(iter_json_items(split(json.dumps(items).encode(), size))) == items
+
+
+@pytest.mark.parametrize("size", [1, 2, 1024])
+def test_utf8_bom_is_skipped(backend, size):
+    assert list(iter_json_items(split(BOM + b' [{"a":1}, {"a":2}]', size))) == [{"a": 1}, {"a": 2}]
+
+
+def test_stdlib_scanner_skips_a_bom_split_across_chunks():
+    assert list(_iter_stdlib([BOM[:1], BOM[1:] + b"[1,", b"2]"])) == [1, 2]
+
+
+@pytest.mark.parametrize("body, expected", [
+    (b'{"a": 1}', [{"a": 1}]),
+    (BOM + b'{"a": 1}', [{"a": 1}]),
+    (b"", []),
+])
+def test_non_array_documents_are_decoded_whole(backend, body, expected):
+    assert list(iter_json_items([body])) == expected
+
+
+def test_items_are_yielded_before_the_stream_ends():
+    def chunks():
+        yield b'[{"id": 1}, '
+        raise AssertionError("bloc suivant lu trop tôt")
+
+    assert next(iter_json_items(chunks())) == {"id": 1}
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        list(_iter_stdlib([b'[{"id": 1}, {"id"']))
@@ -0,0 +1,57 @@
+"""Tests de la projection compilée (agent.projection)"""
+
+import pytest
+
+from agent.projection import compile_projection, flatten_value, parse_path
+
+
+def test_flatten_value_rules():
+    assert flatten_value(3) == 3
+    assert flatten_value(None) is None
+    assert flatten_value(["a", 1, None]) == "a, 1, "
+    assert flatten_value({"k": [1, 2]}) == '{"k":[1,2]}'
+    assert flatten_value([{"a": 1}]) == '[{"a":1}]'
+
+
+def test_parse_path():
+    assert parse_path("$.address.geo.lat") == ("address", "geo", "lat")
+    assert parse_path("tags[0]") == ("tags", 0)
+    assert parse_path("comments[*].id") == ("comments", "*", "id")
+    assert parse_path("a['b.c']") == ("a", "b.c")
+    with pytest.raises(ValueError):
+        parse_path("$")
+
+
+@pytest.mark.parametrize("sample", [None, {"id": 1, "tags": None, "meta": "x"}, {"id": 1}])
+def test_non_scalar_values_flattened_whatever_the_sample(sample):
+    # L'échantillon ne montre que des scalaires : les lignes suivantes restent aplaties
+    projection = compile_projection(["id", "tags", "meta"], sample=sample)
+    rows = projection.rows([
+        {"id": 1, "tags": None, "meta": "x"},
+        {"id": 2, "tags": ["a", "b"], "meta": {"k": 1}},
+        {"id": 3, "tags": [[1]], "meta": 2.5},
+    ])
+    assert rows == [(1, None, "x"), (2, "a, b", '{"k":1}'), (3, "[[1]]", 2.5)]
+
+
+def test_non_scalar_sample_then_scalar_rows():
+    projection = compile_projection(["tags"], sample={"tags": ["a"]})
+    assert projection.rows([{"tags": ["a"]}, {"tags": "b"}, {"tags": None}, {}]) == [("a",), ("b",), (None,), ("",)]
+
+
+def test_scalar_type_changes_after_the_sample():
+    projection = compile_projection(["id", "title"], sample={"id": 1, "title": "a"})
+    rows = projection.rows([{"id": "2", "title": 3.5}, {"id": True, "title": None}, {"id": [1, 2], "title": {"k": 1}}])
+    assert rows == [("2", 3.5), (True, None), ("1, 2", '{"k":1}')]
+
+
+def test_paths_wildcards_and_missing_keys():
+    projection = compile_projection(["id", "address.geo.lat", "comments[*].id", "tags[0]", "absent"])
+    item = {"id": 7, "address": {"geo": {"lat": "1.5"}}, "comments": [{"id": 1}, {"x": 0}, {"id": 3}], "tags": ["t"]}
+    assert projection.headers == ["id", "address.geo.lat", "comments[*].id", "tags[0]", "absent"]
+    assert projection.row(item) == (7, "1.5", "1, 3", "t", "")
+    assert projection.row({}) == ("", "", "", "", "")
+
+
+def test_empty_projection():
+    assert compile_projection([]).rows([{"id": 1}, {}]) == [(), ()]
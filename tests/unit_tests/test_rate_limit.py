@@ -0,0 +1,97 @@
+"""Tests des reprises du limiteur de quotas Google (agent.rate_limit)"""
+
+import json
+
+import pytest
+
+from agent.rate_limit import QuotaLimiter, RateLimitedHttp, is_retryable, rate_limited_http_client
+
+
+def limiter():
+    return QuotaLimiter({}, max_attempts=3, base_delay=0.0)
+
+
+@pytest.mark.parametrize("status, detail, method, expected", [
+    (429, "", "POST", True),
+    (429, "", "GET", True),
+    (503, "", "GET", True),
+    (500, "", "put", True),
+    (503, "", "POST", False),
+    (500, "", "post", False),
+    (403, b'{"reason": "userRateLimitExceeded"}', "POST", True),
+    (403, "insufficientPermissions", "GET", False),
+    (404, "", "GET", False),
+])
+def test_is_retryable(status, detail, method, expected):
+    assert is_retryable(status, detail, method) is expected
+
+
+class FakeResponse(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+
+
+class FakeHttp:
+    """Client httplib2 qui rejoue une suite de statuts"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.calls.append(method)
+        return FakeResponse(self.statuses.pop(0)), b"{}"
+
+
+@pytest.mark.parametrize("method, statuses, calls, final", [
+    ("GET", [503, 200], 2, 200),
+    ("POST", [503, 200], 1, 503),
+    ("POST", [429, 429, 200], 3, 200),
+    ("DELETE", [500, 500, 500, 200], 3, 500),
+])
+def test_drive_http_retries(method, statuses, calls, final):
+    http = FakeHttp(statuses)
+    response, _ = RateLimitedHttp(http, limiter()).request("https://www.googleapis.com/drive/v3/files", method)
+    assert len(http.calls) == calls
+    assert response.status == final
+
+
+def _response(status):
+    requests = pytest.importorskip("requests")
+    response = requests.models.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {"code": status, "message": "x", "status": "X"}}).encode()
+    return response
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = []
+
+    def request(self, method, url=None, **kwargs):
+        self.calls.append(method)
+        return _response(self.statuses.pop(0))
+
+
+@pytest.mark.parametrize("method, statuses, calls", [
+    ("get", [503, 200], 2),
+    ("put", [500, 200], 2),
+    ("post", [429, 200], 2),
+])
+def test_gspread_client_retries(method, statuses, calls):
+    pytest.importorskip("gspread")
+    session = FakeSession(statuses)
+    client = rate_limited_http_client(limiter())(None, session=session)
+    assert client.request(method, "https://sheets.googleapis.com/v4/spreadsheets/x").status_code == 200
+    assert len(session.calls) == calls
+
+
+def test_gspread_append_is_not_replayed_after_server_error():
+    gspread = pytest.importorskip("gspread")
+    session = FakeSession([503, 200])
+    client = rate_limited_http_client(limiter())(None, session=session)
+    with pytest.raises(gspread.exceptions.APIError):
+        client.request("post", "https://sheets.googleapis.com/v4/spreadsheets/x/values/A1:append")
+    assert session.calls == ["post"]
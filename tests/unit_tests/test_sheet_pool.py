@@ -0,0 +1,155 @@
+"""Tests du pool de Google Sheets pré-provisionnés (agent.sheet_pool)"""
+
+import time
+
+from agent.sheet_pool import ORPHAN_GRACE_SECONDS, POOL_MARKER, SheetPool
+
+
+class FakeRequest:
+    def __init__(self, result=None):
+        self.result = result
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class FakeBatch:
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            if self.drive.sharing_error is not None:
+                self.callback(request_id, None, self.drive.sharing_error)
+            else:
+                self.drive.permissions_granted.append(request.result)
+                self.callback(request_id, {"id": "permission"}, None)
+
+
+class FakeDrive:
+    """Service Drive minimal : un dossier existant, fichiers listés, renommés et supprimés"""
+
+    def __init__(self, folder_id="folder-1"):
+        self.folder_id = folder_id
+        self.listed = []
+        self.renamed = {}
+        self.deleted = []
+        self.permissions_granted = []
+        self.sharing_error = None
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return self
+
+    def list(self, q, fields):
+        if "mimeType" in q:
+            return FakeRequest({"files": [{"id": self.folder_id, "name": "Exports"}]})
+        return FakeRequest({"files": list(self.listed)})
+
+    def update(self, fileId, body, fields):
+        self.renamed[fileId] = body["name"]
+        return FakeRequest({"id": fileId})
+
+    def delete(self, fileId):
+        self.deleted.append(fileId)
+        return FakeRequest({})
+
+    def create(self, fileId, body, fields, **options):
+        return FakeRequest((fileId, body))
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+class FakeSheet:
+    def __init__(self, sheet_id, title):
+        self.id = sheet_id
+        self.title = title
+        self.url = f"https://docs.google.com/spreadsheets/d/{sheet_id}"
+
+
+class FakeGspread:
+    def __init__(self):
+        self.created = []
+
+    def create(self, title, folder_id=None):
+        sheet = FakeSheet(f"sheet-{len(self.created) + 1}", title)
+        self.created.append(sheet)
+        return sheet
+
+    def open_by_key(self, key):
+        return next(sheet for sheet in self.created if sheet.id == key)
+
+
+class SharingFailure(Exception):
+    pass
+
+
+def make_pool(tmp_path, size=2, **kwargs):
+    gc, drive = FakeGspread(), FakeDrive()
+    pool = SheetPool(lambda: gc, lambda: drive, "Exports", size, str(tmp_path / "pool.json"),
+                     share_email="me@example.com", **kwargs)
+    return pool, gc, drive
+
+
+def test_refill_creates_shared_sheets_up_to_size(tmp_path):
+    pool, gc, drive = make_pool(tmp_path, size=2)
+    assert pool.refill() == 2
+    assert pool.refill() == 0
+    assert pool.ready_count() == 2
+    assert [file_id for file_id, _ in drive.permissions_granted] == ["sheet-1", "sheet-2"]
+    assert all(POOL_MARKER in sheet.title for sheet in gc.created)
+
+
+def test_refill_discards_sheets_whose_sharing_failed(tmp_path):
+    pool, gc, drive = make_pool(tmp_path, size=2)
+    drive.sharing_error = SharingFailure("HTTP 500")
+    assert pool.refill() == 0
+    assert pool.entries() == {}
+    assert drive.deleted == ["sheet-1"]
+    assert pool.claim("Export") is None
+
+
+def test_claim_renames_the_oldest_ready_sheet(tmp_path):
+    pool, gc, drive = make_pool(tmp_path, size=2)
+    pool.refill()
+    sheet, folder_id, in_folder = pool.claim("Export")
+    assert (sheet.id, folder_id, in_folder) == ("sheet-1", "folder-1", True)
+    assert drive.renamed == {"sheet-1": "Export"}
+    assert pool.entries()["sheet-1"]["state"] == "claimed"
+    pool.complete("sheet-1")
+    assert set(pool.entries()) == {"sheet-2"}
+
+
+def test_release_returns_the_sheet_under_a_pool_title(tmp_path):
+    pool, gc, drive = make_pool(tmp_path, size=1)
+    pool.refill()
+    pool.claim("Export")
+    pool.release("sheet-1")
+    assert POOL_MARKER in drive.renamed["sheet-1"]
+    assert pool.ready_count() == 1
+
+
+def test_cleanup_removes_expired_and_orphaned_sheets(tmp_path):
+    pool, gc, drive = make_pool(tmp_path, size=1, max_age=60)
+    pool.refill()
+    with pool._ledger() as entries:
+        entries["sheet-1"]["created_at"] -= 120
+        entries["pending:abandoned"] = {"state": "pending", "config": pool.config,
+                                        "created_at": time.time() - 2 * pool.claim_timeout}
+    old = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 2 * ORPHAN_GRACE_SECONDS))
+    recent = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    drive.listed = [{"id": "orphan", "name": f"API_Data{POOL_MARKER}x", "createdTime": old},
+                    {"id": "in-progress", "name": f"API_Data{POOL_MARKER}y", "createdTime": recent}]
+    assert pool.cleanup() == {"expired": 1, "orphans": 1, "forgotten": 1}
+    assert drive.deleted == ["sheet-1", "orphan"]
+    assert pool.entries() == {}
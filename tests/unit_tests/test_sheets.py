@@ -0,0 +1,76 @@
+"""Tests de l'écriture par blocs des Google Sheets (agent.sheets.ChunkWriter)"""
+
+import threading
+
+import pytest
+
+from agent.sheets import ChunkWriter
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.appends = []
+
+    def append_rows(self, values):
+        self.appends.append(values)
+
+
+class FakeSheet:
+    id = "sheet-1"
+    url = "https://docs.google.com/spreadsheets/d/sheet-1"
+
+    def __init__(self):
+        self.worksheet = FakeWorksheet()
+
+    def get_worksheet(self, index):
+        return self.worksheet
+
+
+def test_rows_written_in_chunks_with_headers_first():
+    sheet = FakeSheet()
+    writer = ChunkWriter(lambda: sheet, ["id", "title"], chunk_rows=2)
+    writer.write([(1, "a"), (2, "b"), (3, "c")])
+    writer.write([(4, "d")])
+    writer.flush()
+    assert sheet.worksheet.appends == [[["id", "title"], (1, "a"), (2, "b")], [(3, "c"), (4, "d")]]
+    assert (writer.rows_written, writer.chunks_written) == (4, 2)
+
+
+def test_prepare_opens_the_sheet_before_the_first_chunk():
+    opened = threading.Event()
+    sheet = FakeSheet()
+
+    def open_sheet():
+        opened.set()
+        return sheet
+
+    writer = ChunkWriter(open_sheet, ["id"], chunk_rows=1000)
+    writer.prepare()
+    writer.prepare()
+    assert opened.wait(5)
+    assert writer.opened_sheet() is sheet
+    writer.write([(1,)])
+    assert sheet.worksheet.appends == []
+    writer.flush()
+    assert writer.sheet is sheet and sheet.worksheet.appends == [[["id"], (1,)]]
+
+
+def test_zero_rows_still_creates_the_sheet_with_headers():
+    sheet = FakeSheet()
+    writer = ChunkWriter(lambda: sheet, ["id", "title"])
+    writer.write([])
+    writer.flush()
+    assert writer.sheet is sheet
+    assert sheet.worksheet.appends == [[["id", "title"]]]
+    assert (writer.rows_written, writer.chunks_written) == (0, 0)
+
+
+def test_open_error_surfaces_on_first_write():
+    def open_sheet():
+        raise RuntimeError("quota")
+
+    writer = ChunkWriter(open_sheet, ["id"], chunk_rows=1)
+    writer.prepare()
+    assert writer.opened_sheet() is None
+    with pytest.raises(RuntimeError, match="quota"):
+        writer.write([(1,)])
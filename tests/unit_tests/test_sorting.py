@@ -0,0 +1,93 @@
+"""Tests du tri et du top-k (agent.sorting)"""
+
+import random
+
+import pytest
+
+from agent.columnar import ColumnarBatch
+from agent.sorting import normalize_sort, pushdown_params, top_k
+
+
+def reference(records, field, order, limit):
+    """`sorted(...)[:k]` : valeurs absentes en dernier, égalités dans l'ordre d'origine"""
+    steps = field.split(".")
+
+    def value(record):
+        for step in steps:
+            record = record.get(step) if isinstance(record, dict) else None
+        return record
+
+    present = [record for record in records if value(record) is not None]
+    missing = [record for record in records if value(record) is None]
+    return (sorted(present, key=value, reverse=order == "desc") + missing)[:limit]
+
+
+def synthetic(size, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for position in range(size):
+        record = {"id": position, "score": rng.randint(0, 50), "name": rng.choice("abcdefghij") * rng.randint(1, 3)}
+        if rng.random() < 0.1:
+            record["score"] = None
+        if rng.random() < 0.9:
+            record["address"] = {"geo": {"lat": round(rng.uniform(-90, 90), 1) if rng.random() < 0.8 else None}}
+        records.append(record)
+    return records
+
+
+RECORDS = synthetic(20_000)
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("field", ["id", "score", "name", "address.geo.lat", "absent"])
+@pytest.mark.parametrize("limit", [1, 10, 500, 25_000])
+def test_top_k_matches_sorted(field, order, limit):
+    sort = {"field": field, "order": order}
+    expected = [record["id"] for record in reference(RECORDS, field, order, limit)]
+    assert [record["id"] for record in top_k(RECORDS, sort, limit)] == expected
+    assert [record["id"] for record in top_k(iter(RECORDS), sort, limit)] == expected
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("field", ["id", "score", "name", "address.geo.lat"])
+@pytest.mark.parametrize("limit", [1, 10, 500])
+def test_columnar_top_k_matches_sorted(field, order, limit):
+    sort = {"field": field, "order": order}
+    expected = [record["id"] for record in reference(RECORDS, field, order, limit)]
+    batch = top_k(ColumnarBatch.from_records(RECORDS), sort, limit)
+    assert [record["id"] for record in batch.to_records()] == expected
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_ties_keep_original_order(order):
+    records = [{"id": position, "group": position % 3} for position in range(3000)]
+    sort = {"field": "group", "order": order}
+    expected = [record["id"] for record in reference(records, "group", order, 50)]
+    assert [record["id"] for record in top_k(records, sort, 50)] == expected
+    batch = top_k(ColumnarBatch.from_records(records), sort, 50)
+    assert [record["id"] for record in batch.to_records()] == expected
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("id", {"field": "id", "order": "asc"}),
+    ("-id", {"field": "id", "order": "desc"}),
+    ({"field": "title", "order": "décroissant"}, {"field": "title", "order": "desc"}),
+    ([{"by": "id"}], {"field": "id", "order": "asc"}),
+    (None, None),
+    ("", None),
+])
+def test_normalize_sort(spec, expected):
+    assert normalize_sort(spec) == expected
+
+
+def test_normalize_sort_rejects_unknown_order():
+    with pytest.raises(ValueError):
+        normalize_sort({"field": "id", "order": "sideways"})
+
+
+def test_pushdown_params():
+    assert pushdown_params({"field": "id", "order": "desc"}, 10) == {"_sort": "id", "_order": "desc", "_limit": 10}
+    assert pushdown_params(None, 10) == {"_limit": 10}
+    assert pushdown_params({"field": "id", "order": "asc"}) == {"_sort": "id", "_order": "asc"}
+    # Tri imbriqué évalué localement : la limite ne doit pas tronquer les données upstream
+    assert pushdown_params({"field": "address.geo.lat", "order": "desc"}, 10) == {}